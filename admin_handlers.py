@@ -4,20 +4,23 @@ from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-# --- TUZATISH: config.py o'rniga os dan foydalanish ---
-# from config import ADMIN_ID # Bu qatorni o'chiring
-import os # os kutubxonasini qo'shing
-# --------------------------------------------------------
-
-import sheets_api
+import sheets_async
+import export
+from roles import HasRole, ROLE_ADMIN
 import logging
+import os
+from datetime import date, timedelta
 
 from aiogram import Dispatcher, types, F, Router # Router ni import qiling
-from aiogram.filters import CommandStart
+from aiogram.filters import Command, CommandStart
 # ... qolgan importlar ...
 
 # Routerni e'lon qilish
 admin_router = Router()
+# Router faqat adminlar uchun: rol RoleMiddleware da bir marta aniqlanadi (roles.py),
+# boshqa foydalanuvchilarning updatelari (masalan, /start) sotuvchi routeriga o'tadi
+admin_router.message.filter(HasRole(ROLE_ADMIN))
+admin_router.callback_query.filter(HasRole(ROLE_ADMIN))
 
 # --- I. FSM HOLATLARI BO'LIMI ---
 class ProductForm(StatesGroup):
@@ -36,16 +39,33 @@ class StockIssueForm(StatesGroup):
     waiting_for_new_product_price = State() # Tovar yangi bo'lsa, narxi
     waiting_for_quantity = State() # Tovar soni
 
-# Yordamchi funksiya: Ruxsatni tekshirish
-# --- II. ASOSIY NAVIGATSIYA (START) BO'LIMI ---
+class SalesReportForm(StatesGroup):
+    """Savdo hisobotining ixtiyoriy sana oralig'ini kiritish holati."""
+    waiting_for_range = State() # "YYYY-MM-DD YYYY-MM-DD"
+
+# --- SAHIFALASH YORDAMCHISI ---
+
+def page_nav_row(page, prefix):
+    """Sahifa ostidagi ◀️ n/m ▶️ tugmalari qatori. callback_data: "{prefix}:{kursor}"."""
+    row = []
+    if page.prev_cursor:
+        row.append(types.InlineKeyboardButton(text="◀️", callback_data=f"{prefix}:{page.prev_cursor}"))
+    row.append(types.InlineKeyboardButton(text=f"{page.number}/{page.pages}", callback_data="page_info"))
+    if page.next_cursor:
+        row.append(types.InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:{page.next_cursor}"))
+    return row
+
+def page_cursor(callback_data):
+    """Callback ma'lumotidan ("prefix:kursor") kursorni ajratadi (birinchi sahifa uchun None)."""
+    _, _, cursor = callback_data.partition(":")
+    return cursor or None
+
+@admin_router.callback_query(F.data == "page_info")
+async def page_info(callback: types.CallbackQuery):
+    """Sahifa raqami tugmasi hech narsa qilmaydi."""
+    await callback.answer()
 
-# Yordamchi funksiya: Ruxsatni tekshirish
-def is_admin(user_id):
-    # ADMIN_IDS ro'yxati Env Variablesdan olinadi (run.py da o'rnatilgan). 
-    # Xavfsizlik uchun, har safar tekshirish yaxshi.
-    admin_ids_str = os.environ.get('ADMIN_IDS', '').split(',')
-    admin_ids = [int(i.strip()) for i in admin_ids_str if i.strip().isdigit()]
-    return user_id in admin_ids
+# --- II. ASOSIY NAVIGATSIYA (START) BO'LIMI ---
 
 # admin_handlers.py
 # ... boshqa funksiyalar va FSMlar
@@ -54,12 +74,6 @@ def is_admin(user_id):
 @admin_router.message(CommandStart())
 async def command_start_handler(message: types.Message):
     """/start buyrug'i uchun ishlov beruvchi."""
-    if not is_admin(message.from_user.id):
-        await message.answer("Siz administrator emassiz. Ruxsat yo'q.")
-        return
-
-    # ... qolgan mantiq
-
     keyboard = types.ReplyKeyboardMarkup(
         keyboard=[
             [
@@ -77,7 +91,6 @@ async def command_start_handler(message: types.Message):
 @admin_router.message(F.text == "/mahsulot")
 async def handle_mahsulot(message: types.Message):
     """/mahsulot buyrug'i uchun ishlov beruvchi."""
-    if not is_admin(message.from_user.id): return
     # ... qolgan mantiq
     mahsulot_keyboard = types.InlineKeyboardMarkup(
         inline_keyboard=[
@@ -88,19 +101,23 @@ async def handle_mahsulot(message: types.Message):
     await message.answer("Mahsulotlar bo'limi:", reply_markup=mahsulot_keyboard)
 
 @admin_router.callback_query(F.data == "list_products")
+@admin_router.callback_query(F.data.startswith("products_page:"))
 async def list_products(callback: types.CallbackQuery):
-    # ... funksiya mantiqi ...
-    """Mahsulotlar ro'yxatini Sheetsdan olib chiqarish."""
-    if not is_admin(callback.from_user.id): return
+    """Mahsulotlar ro'yxatini nomi bo'yicha sahifalab chiqarish.
+    Birinchi sahifa yangi xabar bo'lib chiqadi, keyingilari shu xabarni tahrirlaydi."""
 
-    products = sheets_api.get_all_products()
+    page = await sheets_async.get_products_page(page_cursor(callback.data))
     
-    if products:
+    if page.rows:
         response_text = "📋 **Barcha Mahsulotlar Ro'yxati:**\n\n"
-        for row in products:
+        for row in page.rows:
             if len(row) >= 3:
                  response_text += f"*{row[1]}*: {row[2]} so'm\n"
-        await callback.message.answer(response_text, parse_mode="Markdown")
+        keyboard = types.InlineKeyboardMarkup(inline_keyboard=[page_nav_row(page, "products_page")])
+        if callback.data == "list_products":
+            await callback.message.answer(response_text, reply_markup=keyboard, parse_mode="Markdown")
+        else:
+            await callback.message.edit_text(response_text, reply_markup=keyboard, parse_mode="Markdown")
     else:
         await callback.message.answer("⚠️ Mahsulotlar bazasi bo'sh yoki ulanishda xato.")
 
@@ -108,13 +125,18 @@ async def list_products(callback: types.CallbackQuery):
 
 @admin_router.callback_query(F.data == "add_new_product") # <-- BU QATORNI QO'SHING
 async def start_add_product(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin(callback.from_user.id): return
     await callback.message.answer("Yangi mahsulot nomini kiriting:")
     await state.set_state(ProductForm.waiting_for_product_name)
     await callback.answer()
 
 @admin_router.message(ProductForm.waiting_for_product_name)
 async def process_product_name(message: types.Message, state: FSMContext):
+    existing = await sheets_async.get_product_by_name(message.text)
+    if existing:
+        # Dublikat mahsulot yaratilmaydi
+        await message.answer(f"⚠️ '{existing[1]}' mahsuloti bazada allaqachon bor (narxi: {existing[2]} so'm).")
+        await state.clear()
+        return
     await state.update_data(product_name=message.text)
     await message.answer(f"'{message.text}' uchun narxni (faqat raqamda) kiriting:")
     await state.set_state(ProductForm.waiting_for_product_price)
@@ -130,7 +152,7 @@ async def process_product_price(message: types.Message, state: FSMContext):
     user_data = await state.get_data()
     product_name = user_data.get("product_name")
 
-    if sheets_api.add_product(product_name, price):
+    if await sheets_async.add_product(product_name, price):
         await message.answer(f"✅ Yangi mahsulot muvaffaqiyatli qo'shildi:\n"
                              f"Nomi: **{product_name}**\n"
                              f"Narxi: **{price}** so'm", parse_mode="Markdown")
@@ -145,12 +167,12 @@ async def process_product_price(message: types.Message, state: FSMContext):
 @admin_router.message(F.text == "/sotuvchi")
 async def handle_sotuvchi(message: types.Message):
     """/sotuvchi buyrug'i uchun ishlov beruvchi."""
-    if not is_admin(message.from_user.id): return
 
     sotuvchi_keyboard = types.InlineKeyboardMarkup(
         inline_keyboard=[
             [types.InlineKeyboardButton(text="🛒 Sotuvchilardagi Mahsulotlar", callback_data="seller_stock_list")],
             [types.InlineKeyboardButton(text="👥 Sotuvchilar", callback_data="list_all_sellers_menu")],
+            [types.InlineKeyboardButton(text="📈 Barcha Sotuvchilar Savdosi", callback_data="all_sales_report")],
             [types.InlineKeyboardButton(text="➕ Yangi Sotuvchi Qo'shish", callback_data="add_new_seller")]
         ]
     )
@@ -161,7 +183,6 @@ async def handle_sotuvchi(message: types.Message):
 
 @admin_router.callback_query(F.data == "add_new_seller") # <- O'zgardi
 async def start_add_seller(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin(callback.from_user.id): return
     await callback.message.answer("Yangi sotuvchining **Ismi/Familiyasini** kiriting:")
     await state.set_state(SellerForm.waiting_for_name)
     await callback.answer()
@@ -194,7 +215,7 @@ async def process_seller_password(message: types.Message, state: FSMContext):
     await state.update_data(seller_password=message.text)
     user_data = await state.get_data()
     
-    if sheets_api.add_seller(user_data): 
+    if await sheets_async.add_seller(user_data): 
         await message.answer(f"✅ Yangi sotuvchi muvaffaqiyatli qo'shildi:\n"
                              f"Ismi: **{user_data['seller_name']}**\n"
                              f"Paroli: **{user_data['seller_password']}** (Parolni yodda tuting!)", 
@@ -209,7 +230,6 @@ async def process_seller_password(message: types.Message, state: FSMContext):
 @admin_router.callback_query(F.data.startswith("issue_stock:"))
 async def start_issue_stock(callback: types.CallbackQuery, state: FSMContext):
     """Sotuvchiga tovar berish jarayonini boshlash."""
-    if not is_admin(callback.from_user.id): return
     
     # callback_data dan sotuvchi ID sini ajratib olish
     seller_sheet_id = callback.data.split(":")[1]
@@ -217,10 +237,24 @@ async def start_issue_stock(callback: types.CallbackQuery, state: FSMContext):
     # Joriy sotuvchi ID sini FSM ga saqlash
     await state.update_data(current_seller_id=seller_sheet_id)
     
-    await callback.message.answer("Sotuvchiga beriladigan **Tovar Nomini** kiriting:")
+    await callback.message.answer("Sotuvchiga beriladigan **Tovar Nomini** kiriting yoki qidiruvdan tanlang:",
+                                  reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
+                                      [types.InlineKeyboardButton(text="🔎 Mahsulotni qidirish",
+                                                                  switch_inline_query_current_chat="")]
+                                  ]))
     await state.set_state(StockIssueForm.waiting_for_product_name)
     await callback.answer()
 
+async def select_stock_product(message: types.Message, state: FSMContext, product_data):
+    """Mahsulot bazada mavjud ([ID, Nomi, Narxi]): narxni so'ramasdan miqdorga o'tish."""
+    await state.update_data(current_product_name=product_data[1])
+    await state.update_data(product_id=product_data[0]) # IDni saqlash
+    await state.update_data(product_price=product_data[2]) # Narxni saqlash
+    await state.update_data(is_new_product=False)
+    await message.answer(f"Mahsulot bazadan topildi. Narxi: **{product_data[2]}** so'm.\n"
+                         f"Endi bu mahsulotning **Sonini (miqdorini)** kiriting:")
+    await state.set_state(StockIssueForm.waiting_for_quantity)
+
 @admin_router.message(StockIssueForm.waiting_for_product_name)
 async def process_stock_name(message: types.Message, state: FSMContext):
     """Tovar nomini qabul qilish va bazada tekshirish."""
@@ -229,23 +263,53 @@ async def process_stock_name(message: types.Message, state: FSMContext):
     
     # ------------------------------------------------------------
     # sheets_api dan mahsulotni ism bo'yicha topish
-    product_data = sheets_api.get_product_by_name(product_name) 
+    product_data = await sheets_async.get_product_by_name(product_name) 
     # ------------------------------------------------------------
     
-    await state.update_data(current_product_name=product_name)
-    
     if product_data:
-        # Mahsulot bazada mavjud (Narxni so'ramaymiz)
-        await state.update_data(product_id=product_data[0]) # IDni saqlash
-        await state.update_data(product_price=product_data[2]) # Narxni saqlash
-        await message.answer(f"Mahsulot bazadan topildi. Narxi: **{product_data[2]}** so'm.\n"
-                             f"Endi bu mahsulotning **Sonini (miqdorini)** kiriting:")
-        await state.set_state(StockIssueForm.waiting_for_quantity)
-        
-    else:
-        # Mahsulot bazada mavjud emas (Narxni so'rash kerak)
-        await message.answer(f"Mahsulot bazadan topilmadi. '{product_name}' ni yangi mahsulot sifatida qo'shish uchun **Narxini (faqat raqamda)** kiriting:")
-        await state.set_state(StockIssueForm.waiting_for_new_product_price)
+        await select_stock_product(message, state, product_data)
+        return
+
+    await state.update_data(current_product_name=product_name)
+
+    # Nom xato yozilgan bo'lsa, dublikat mahsulot yaratmaslik uchun avval o'xshashlarini taklif qilish
+    suggestions = await sheets_async.find_similar_products(product_name)
+    if suggestions:
+        keyboard_rows = [
+            [types.InlineKeyboardButton(text=f"{row[1]} ({row[2]} so'm)", callback_data=f"stock_product:{row[0]}")]
+            for row in suggestions if len(row) >= 3
+        ]
+        keyboard_rows.append([types.InlineKeyboardButton(text=f"➕ Yangi mahsulot: {product_name}",
+                                                         callback_data="stock_product_new")])
+        await message.answer(f"'{product_name}' bazadan topilmadi. O'xshash mahsulotlardan birini tanlang, "
+                             f"yangi mahsulot sifatida qo'shing yoki nomni qayta kiriting:",
+                             reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard_rows))
+        return
+
+    # Mahsulot bazada mavjud emas (Narxni so'rash kerak)
+    await message.answer(f"Mahsulot bazadan topilmadi. '{product_name}' ni yangi mahsulot sifatida qo'shish uchun **Narxini (faqat raqamda)** kiriting:")
+    await state.set_state(StockIssueForm.waiting_for_new_product_price)
+
+@admin_router.callback_query(StockIssueForm.waiting_for_product_name, F.data.startswith("stock_product:"))
+async def choose_stock_product(callback: types.CallbackQuery, state: FSMContext):
+    """Taklif qilingan mavjud mahsulot tanlanganda."""
+    product_data = await sheets_async.get_product_by_id(callback.data.split(":")[1])
+    if not product_data:
+        await callback.answer("Mahsulot topilmadi.", show_alert=True)
+        return
+
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await select_stock_product(callback.message, state, product_data)
+    await callback.answer()
+
+@admin_router.callback_query(StockIssueForm.waiting_for_product_name, F.data == "stock_product_new")
+async def confirm_new_stock_product(callback: types.CallbackQuery, state: FSMContext):
+    """Admin kiritilgan nomni ataylab yangi mahsulot sifatida qo'shmoqchi."""
+    product_name = (await state.get_data()).get('current_product_name')
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.message.answer(f"'{product_name}' ni yangi mahsulot sifatida qo'shish uchun **Narxini (faqat raqamda)** kiriting:")
+    await state.set_state(StockIssueForm.waiting_for_new_product_price)
+    await callback.answer()
 
 
 @admin_router.message(StockIssueForm.waiting_for_new_product_price)
@@ -259,22 +323,13 @@ async def process_new_product_price(message: types.Message, state: FSMContext):
 
     user_data = await state.get_data()
     product_name = user_data.get('current_product_name')
-    
-    # ------------------------------------------------------------
-    # Yangi mahsulotni Sheetsga qo'shish
-    product_id = sheets_api.add_product_and_get_id(product_name, new_price) 
-    # ------------------------------------------------------------
 
-    if product_id:
-        # ID ni saqlab, Sonini so'rashga o'tish
-        await state.update_data(product_id=product_id)
-        await state.update_data(product_price=new_price)
-        await message.answer(f"✅ Yangi mahsulot **{product_name}** narxi **{new_price}** so'm bilan bazaga kiritildi.\n"
-                             f"Endi bu mahsulotning **Sonini (miqdorini)** kiriting:")
-        await state.set_state(StockIssueForm.waiting_for_quantity)
-    else:
-        await message.answer("⚠️ Mahsulotni Sheetsga yozishda xato yuz berdi. Jarayon bekor qilindi.")
-        await state.clear()
+    # Yangi mahsulot hozir yozilmaydi: u miqdor kiritilgach stok bilan
+    # birga bitta so'rovda Sheetsga qo'shiladi (process_stock_quantity).
+    await state.update_data(product_id=None, product_price=new_price, is_new_product=True)
+    await message.answer(f"Yangi mahsulot **{product_name}** narxi **{new_price}** so'm.\n"
+                         f"Endi bu mahsulotning **Sonini (miqdorini)** kiriting:")
+    await state.set_state(StockIssueForm.waiting_for_quantity)
 
 
 @admin_router.message(StockIssueForm.waiting_for_quantity)
@@ -294,8 +349,13 @@ async def process_stock_quantity(message: types.Message, state: FSMContext):
     price = user_data.get('product_price')
 
     # ------------------------------------------------------------
-    # Sotuvchi hisobiga tovar qo'shish
-    if sheets_api.add_stock_to_seller(seller_id, product_id, quantity, price):
+    # Sotuvchi hisobiga tovar qo'shish (yangi mahsulot bo'lsa, u ham shu so'rovda qo'shiladi)
+    if user_data.get('is_new_product'):
+        issued = await sheets_async.issue_new_product_stock(seller_id, product_name, price, quantity) is not None
+    else:
+        issued = await sheets_async.add_stock_to_seller(seller_id, product_id, quantity, price)
+
+    if issued:
         await message.answer(f"✅ Sotuvchiga tovar berildi!\n"
                              f"Tovar: **{product_name}**\n"
                              f"Soni: **{quantity}** dona\n"
@@ -312,7 +372,6 @@ async def process_stock_quantity(message: types.Message, state: FSMContext):
 @admin_router.callback_query(F.data == "list_all_sellers_menu")
 async def list_all_sellers_menu(callback: types.CallbackQuery):
     """Sotuvchilar ro'yxati uchun ichki menyuni chiqarish."""
-    if not is_admin(callback.from_user.id): return
 
     sellers_menu_keyboard = types.InlineKeyboardMarkup(
         inline_keyboard=[
@@ -325,42 +384,46 @@ async def list_all_sellers_menu(callback: types.CallbackQuery):
     await callback.answer()
 
 @admin_router.callback_query(F.data == "list_all_passwords")
+@admin_router.callback_query(F.data.startswith("passwords_page:"))
 async def list_all_passwords(callback: types.CallbackQuery):
-    """Barcha sotuvchilarning parollarini chiqarish."""
-    if not is_admin(callback.from_user.id): return
+    """Barcha sotuvchilarning parollarini sahifalab chiqarish."""
     
-    sellers = sheets_api.get_all_sellers()
+    page = await sheets_async.get_sellers_page(page_cursor(callback.data))
     
-    if sellers:
+    if page.rows:
         response_text = "🔑 **Barcha Sotuvchilar Parollari:**\n\n"
-        for row in sellers:
-            if len(row) >= 6:
-                name = row[2]
-                password = row[5]
+        # [ID, Ism, Tuman, Telefon, Parol, Sana]
+        for row in page.rows:
+            if len(row) >= 5:
+                name = row[1]
+                password = row[4]
                 response_text += f"*{name}*: `{password}`\n"
 
-        await callback.message.answer(response_text, parse_mode="Markdown")
+        keyboard = types.InlineKeyboardMarkup(inline_keyboard=[page_nav_row(page, "passwords_page")])
+        if callback.data == "list_all_passwords":
+            await callback.message.answer(response_text, reply_markup=keyboard, parse_mode="Markdown")
+        else:
+            await callback.message.edit_text(response_text, reply_markup=keyboard, parse_mode="Markdown")
     else:
         await callback.message.answer("Sotuvchilar bazasi bo'sh.")
     await callback.answer()
 
 
 @admin_router.callback_query(F.data == "list_all_sellers")
+@admin_router.callback_query(F.data.startswith("sellers_page:"))
 async def list_all_sellers(callback: types.CallbackQuery):
-    """Barcha sotuvchilarni alifbo tartibida Inline Button sifatida chiqarish."""
-    if not is_admin(callback.from_user.id): return
+    """Barcha sotuvchilarni alifbo tartibida Inline Button sifatida, sahifalab chiqarish."""
     
-    sellers = sheets_api.get_all_sellers()
+    # Ism bo'yicha saralangan indeksdan faqat shu sahifa olinadi
+    page = await sheets_async.get_sellers_page(page_cursor(callback.data))
     
-    if sellers:
-        # Ism bo'yicha saralash
-        sellers.sort(key=lambda x: x[2]) 
-        
+    if page.rows:
         keyboard_rows = []
-        for seller in sellers:
+        for seller in page.rows:
             seller_id = seller[0] 
-            seller_name = seller[2]
+            seller_name = seller[1] if len(seller) > 1 else str(seller_id)
             keyboard_rows.append([types.InlineKeyboardButton(text=seller_name, callback_data=f"view_seller:{seller_id}")])
+        keyboard_rows.append(page_nav_row(page, "sellers_page"))
 
         all_sellers_keyboard = types.InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
         await callback.message.edit_text("👥 **Barcha Sotuvchilar Ro'yxati (Alifbo bo'yicha):**", reply_markup=all_sellers_keyboard)
@@ -372,21 +435,21 @@ async def list_all_sellers(callback: types.CallbackQuery):
 @admin_router.callback_query(F.data.startswith("view_seller:"))
 async def view_seller_details(callback: types.CallbackQuery):
     """Tanlangan sotuvchi uchun maxsus menyu chiqarish."""
-    if not is_admin(callback.from_user.id): return
     
     seller_sheet_id = callback.data.split(":")[1]
-    seller_data = sheets_api.get_seller_by_id(seller_sheet_id) 
+    seller_data = await sheets_async.get_seller_by_id(seller_sheet_id) 
 
     if not seller_data:
         await callback.message.answer("Sotuvchi topilmadi.")
         return
         
-    seller_name = seller_data[2]
+    seller_name = seller_data[1]
     
     seller_details_keyboard = types.InlineKeyboardMarkup(
         inline_keyboard=[
             [types.InlineKeyboardButton(text="🛍️ Mahsulotlari va Narxlari", callback_data=f"seller_stock:{seller_sheet_id}")],
             [types.InlineKeyboardButton(text="➕ Sotuvchiga Yangi Tovar Berish", callback_data=f"issue_stock:{seller_sheet_id}")],
+            [types.InlineKeyboardButton(text="📊 Savdo Hisoboti", callback_data=f"sales_report:{seller_sheet_id}")],
             [types.InlineKeyboardButton(text="🔑 Sotuvchi Paroli", callback_data=f"seller_password_view:{seller_sheet_id}")]
         ]
     )
@@ -398,14 +461,13 @@ async def view_seller_details(callback: types.CallbackQuery):
 @admin_router.callback_query(F.data.startswith("seller_password_view:"))
 async def view_single_password(callback: types.CallbackQuery):
     """Tanlangan sotuvchining parolini chiqarish."""
-    if not is_admin(callback.from_user.id): return
     seller_sheet_id = callback.data.split(":")[1]
     
-    seller_data = sheets_api.get_seller_by_id(seller_sheet_id) 
+    seller_data = await sheets_async.get_seller_by_id(seller_sheet_id) 
     
-    if seller_data and len(seller_data) >= 6:
-        name = seller_data[2]
-        password = seller_data[5]
+    if seller_data and len(seller_data) >= 5:
+        name = seller_data[1]
+        password = seller_data[4]
         await callback.message.answer(f"**{name}** ning paroli: `{password}`", parse_mode="Markdown")
     else:
         await callback.message.answer("Sotuvchi topilmadi yoki ma'lumot bazasida xato.")
@@ -429,25 +491,20 @@ def setup_admin_handlers(dp: Dispatcher):
 @admin_router.callback_query(F.data.startswith("seller_stock:"))
 async def view_seller_stock(callback: types.CallbackQuery):
     """Sotuvchining jami stokini Sheetsdan olib chiqarish."""
-    if not is_admin(callback.from_user.id): return
     
     seller_sheet_id = callback.data.split(":")[1]
     
     # ------------------------------------------------------------
-    # sheets_api dan sotuvchi stokini olish
-    grouped_stock = sheets_api.get_seller_stock(seller_sheet_id)
-    seller_data = sheets_api.get_seller_by_id(seller_sheet_id)
-    seller_name = seller_data[2] if seller_data else "Noma'lum sotuvchi"
+    # sheets_api dan sotuvchi stokini tayyor ko'rinishda olish (nomlari bilan birga)
+    stock_view = await sheets_async.get_seller_stock_view(seller_sheet_id)
+    seller_name = stock_view['seller_name'] if stock_view else "Noma'lum sotuvchi"
     # ------------------------------------------------------------
 
-    if grouped_stock:
+    if stock_view and stock_view['items']:
         response_text = f"🛍️ **{seller_name}** dagi Jami Stok:\n\n"
-        
-        # Stokdagi har bir mahsulotni hisoblab chiqarish
-        for product_id, (quantity, price) in grouped_stock.items():
-            # Mahsulot IDsi orqali nomini olish
-            product_name = sheets_api.get_product_name_by_id(product_id) 
-            
+
+        # Stokdagi har bir mahsulotni chiqarish
+        for product_name, quantity, price in stock_view['items']:
             response_text += f"**{product_name}**:\n"
             response_text += f"   - Soni: `{quantity}` dona\n"
             response_text += f"   - Narxi: `{price}` so'm\n"
@@ -457,7 +514,186 @@ async def view_seller_stock(callback: types.CallbackQuery):
         await callback.message.answer(f"**{seller_name}** hisobida hozircha tovarlar mavjud emas.")
 
     await callback.answer()
-    
+
+
+# C. Sotuvchi Savdo Hisoboti (bugun / hafta / oy / ixtiyoriy oraliq)
+
+def _report_period(period):
+    """Davr nomidan (today/week/month) boshlanish va tugash sanasini qaytaradi."""
+    today = date.today()
+    if period == "week":
+        return today - timedelta(days=today.weekday()), today
+    if period == "month":
+        return today.replace(day=1), today
+    return today, today
+
+async def _send_sales_report(message: types.Message, seller_sheet_id, start, end):
+    """Sotuvchining berilgan oraliqdagi jami tushumi va kilogrammini yuborish."""
+    summary = await sheets_async.get_seller_sales_summary(seller_sheet_id, start.isoformat(), end.isoformat())
+    seller_name = await sheets_async.get_seller_name_by_id(seller_sheet_id)
+
+    period_text = start.isoformat() if start == end else f"{start.isoformat()} — {end.isoformat()}"
+    await message.answer(f"📊 **{seller_name}** savdo hisoboti ({period_text}):\n"
+                         f"   - Sotildi: `{summary['total_quantity']}` dona\n"
+                         f"   - Tushum: `{summary['total_revenue']:,.2f}` so'm", parse_mode="Markdown")
+
+@admin_router.callback_query(F.data.startswith("sales_report:"))
+async def choose_sales_report_period(callback: types.CallbackQuery):
+    """Savdo hisoboti uchun davrni tanlash menyusi."""
+    seller_sheet_id = callback.data.split(":")[1]
+
+    period_keyboard = types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                types.InlineKeyboardButton(text="Bugun", callback_data=f"sales_period:{seller_sheet_id}:today"),
+                types.InlineKeyboardButton(text="Shu hafta", callback_data=f"sales_period:{seller_sheet_id}:week"),
+                types.InlineKeyboardButton(text="Shu oy", callback_data=f"sales_period:{seller_sheet_id}:month"),
+            ],
+            [types.InlineKeyboardButton(text="📅 Boshqa oraliq", callback_data=f"sales_period:{seller_sheet_id}:custom")]
+        ]
+    )
+    await callback.message.answer("Hisobot davrini tanlang:", reply_markup=period_keyboard)
+    await callback.answer()
+
+@admin_router.callback_query(F.data.startswith("sales_period:"))
+async def show_sales_report(callback: types.CallbackQuery, state: FSMContext):
+    """Tanlangan davr bo'yicha hisobotni chiqarish yoki ixtiyoriy oraliqni so'rash."""
+    _, seller_sheet_id, period = callback.data.split(":")
+
+    if period == "custom":
+        await state.update_data(report_seller_id=seller_sheet_id)
+        await callback.message.answer("Sana oralig'ini kiriting (masalan: `2026-10-01 2026-10-15`):", parse_mode="Markdown")
+        await state.set_state(SalesReportForm.waiting_for_range)
+    else:
+        start, end = _report_period(period)
+        await _send_sales_report(callback.message, seller_sheet_id, start, end)
+    await callback.answer()
+
+@admin_router.message(SalesReportForm.waiting_for_range)
+async def process_sales_report_range(message: types.Message, state: FSMContext):
+    """Ixtiyoriy sana oralig'ini qabul qilish va hisobotni chiqarish."""
+    try:
+        start_text, end_text = message.text.split()
+        start, end = date.fromisoformat(start_text), date.fromisoformat(end_text)
+        if start > end: raise ValueError
+    except ValueError:
+        await message.answer("Sana noto'g'ri kiritildi. Iltimos, `YYYY-MM-DD YYYY-MM-DD` ko'rinishida kiriting:", parse_mode="Markdown")
+        return
+
+    user_data = await state.get_data()
+    await _send_sales_report(message, user_data.get('report_seller_id'), start, end)
+    await state.clear()
+
     # Yangi sotuvchilar funksiyalari shu yerga qo'shiladi...
 
 
+# D. Barcha sotuvchilar bo'yicha hisobotlar (ustunli jurnaldan, bitta o'tishda)
+
+async def _answer_lines(message: types.Message, lines, limit=3500):
+    """Uzun ro'yxatni Telegram xabar chegarasidan oshmaydigan bir nechta xabar qilib yuborish."""
+    chunk = ""
+    for line in lines:
+        if chunk and len(chunk) + len(line) > limit:
+            await message.answer(chunk, parse_mode="Markdown")
+            chunk = ""
+        chunk += line + "\n"
+    if chunk:
+        await message.answer(chunk, parse_mode="Markdown")
+
+@admin_router.callback_query(F.data == "seller_stock_list")
+async def all_sellers_stock(callback: types.CallbackQuery):
+    """Barcha sotuvchilardagi mahsulot qoldiqlari (musbatlari)."""
+    report = await sheets_async.get_stock_report(("seller", "product"))
+
+    by_seller = {}
+    for (seller_name, product_name), (quantity, _) in sorted(report.items()):
+        if quantity > 0:
+            by_seller.setdefault(seller_name, []).append(f"   - {product_name}: `{quantity}` dona")
+
+    if by_seller:
+        lines = ["🛒 **Sotuvchilardagi Mahsulotlar:**"]
+        for seller_name, product_lines in by_seller.items():
+            lines.append(f"\n**{seller_name}**")
+            lines.extend(product_lines)
+        await _answer_lines(callback.message, lines)
+    else:
+        await callback.message.answer("Sotuvchilarda hozircha tovarlar mavjud emas.")
+    await callback.answer()
+
+@admin_router.callback_query(F.data == "all_sales_report")
+async def choose_all_sales_period(callback: types.CallbackQuery):
+    """Barcha sotuvchilar savdo hisoboti uchun davrni tanlash."""
+    period_keyboard = types.InlineKeyboardMarkup(
+        inline_keyboard=[[
+            types.InlineKeyboardButton(text="Bugun", callback_data="all_sales_period:today"),
+            types.InlineKeyboardButton(text="Shu hafta", callback_data="all_sales_period:week"),
+            types.InlineKeyboardButton(text="Shu oy", callback_data="all_sales_period:month"),
+        ]]
+    )
+    await callback.message.answer("Hisobot davrini tanlang:", reply_markup=period_keyboard)
+    await callback.answer()
+
+@admin_router.callback_query(F.data.startswith("all_sales_period:"))
+async def show_all_sales_report(callback: types.CallbackQuery):
+    """Har bir sotuvchining tanlangan davrdagi savdosi (tushum bo'yicha kamayish tartibida)."""
+    start, end = _report_period(callback.data.split(":")[1])
+    report = await sheets_async.get_sales_report(("seller",), start.isoformat(), end.isoformat())
+    seller_names, _ = await sheets_async.resolve_names(seller_ids=[seller_id for (seller_id,) in report])
+
+    period_text = start.isoformat() if start == end else f"{start.isoformat()} — {end.isoformat()}"
+    lines = [f"📈 **Barcha sotuvchilar savdosi** ({period_text}):\n"]
+    total_quantity, total_revenue = 0, 0.0
+    for (seller_id,), (quantity, revenue) in sorted(report.items(), key=lambda item: -item[1][1]):
+        lines.append(f"**{seller_names[seller_id]}**: `{quantity}` dona, `{revenue:,.2f}` so'm")
+        total_quantity += quantity
+        total_revenue += revenue
+    lines.append(f"\nJami: `{total_quantity}` dona, `{total_revenue:,.2f}` so'm")
+
+    await _answer_lines(callback.message, lines)
+    await callback.answer()
+
+
+# E. Jurnallarni CSV qilib eksport qilish
+
+EXPORT_USAGE = ("Foydalanish: `/eksport stok|savdo [sotuvchi ID] [YYYY-MM-DD [YYYY-MM-DD]] [gz]`\n"
+                "Masalan: `/eksport savdo 3 2026-10-01 2026-10-15 gz`")
+
+def _parse_export_args(args):
+    """'/eksport' argumentlaridan (tur, sotuvchi ID, boshlanish, tugash, gzip) ni ajratadi.
+    Noto'g'ri bo'lsa ValueError."""
+    if not args or args[0].lower() not in export.EXPORT_LEDGERS:
+        raise ValueError
+    seller_id, dates, compress = None, [], False
+    for arg in args[1:]:
+        if arg.lower() == "gz":
+            compress = True
+        elif arg.isdigit() and seller_id is None:
+            seller_id = arg
+        else:
+            dates.append(date.fromisoformat(arg)) # Sana bo'lmasa ValueError
+    if len(dates) > 2: raise ValueError
+    start = dates[0] if dates else None
+    end = dates[1] if len(dates) == 2 else None
+    if start and end and start > end: raise ValueError
+    return args[0].lower(), seller_id, start, end, compress
+
+@admin_router.message(Command("eksport"))
+async def export_ledger_command(message: types.Message):
+    """Stok yoki Savdolar jurnalini (filtrlar bilan) CSV hujjat sifatida yuborish."""
+    try:
+        kind, seller_id, start, end, compress = _parse_export_args(message.text.split()[1:])
+    except ValueError:
+        await message.answer(EXPORT_USAGE, parse_mode="Markdown")
+        return
+
+    await message.answer("⏳ Eksport tayyorlanmoqda...")
+    result = await sheets_async.run_sync(export.export_ledger, kind, seller_id, start, end, compress)
+    if result is None:
+        await message.answer("⚠️ Eksportda xato yuz berdi. Konsolni tekshiring.")
+        return
+
+    path, filename, count = result
+    try:
+        await message.answer_document(types.FSInputFile(path, filename=filename), caption=f"{count} ta qator")
+    finally:
+        os.remove(path)
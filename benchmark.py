@@ -0,0 +1,117 @@
+# benchmark.py
+# Botning Sheets bilan ishlash tezligini fake_sheets yordamida internetsiz o'lchaydi.
+# Har bir ssenariy uchun: umumiy vaqt, bitta amal vaqti (p50/p95/max) va qancha
+# API so'rovi (o'qish/yozish) hamda 429 xatolari bo'lgani chiqariladi.
+#
+# Misol:
+#   python benchmark.py --latency 0.15 --sales-rows 50000 --ops 200 --concurrency 20
+#   STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python benchmark.py
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+import fake_sheets
+import scheduler
+import sheets_api
+import sheets_async
+from storage import get_backend
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _run_scenario(client, name, make_call, ops, concurrency):
+    """make_call(i) qaytargan korutinani ops marta, bir vaqtda concurrency tadan bajaradi."""
+    client.reset_stats()
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await make_call(i)
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    total = time.perf_counter() - started
+    stats = client.stats()
+    print(f"{name:<22} {ops:>5} {total:>8.2f}s {statistics.median(timings) * 1000:>8.1f} "
+          f"{_percentile(timings, 0.95) * 1000:>8.1f} {max(timings) * 1000:>8.1f} "
+          f"{stats['reads']:>6} {stats['writes']:>6} {stats['errors'].get(429, 0):>5}")
+
+
+async def main(args):
+    data = fake_sheets.seed_data(sellers=args.sellers, products=args.products,
+                                 stock_rows=args.stock_rows, sales_rows=args.sales_rows, seed=args.seed)
+    client = fake_sheets.FakeClient(data, latency=args.latency, jitter=args.jitter,
+                                    read_quota=args.read_quota, write_quota=args.write_quota, seed=args.seed)
+    scheduler.configure(read_quota=args.sheets_read_quota, write_quota=args.sheets_write_quota)
+    sheets_api.use_spreadsheet(client.open_by_key("benchmark"))
+    rng = random.Random(args.seed)
+
+    def seller_id():
+        return str(rng.randint(1, args.sellers))
+
+    def product_id():
+        return str(rng.randint(1, args.products))
+
+    print(f"{'ssenariy':<22} {'amal':>5} {'jami':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+          f"{'o`qish':>6} {'yozish':>6} {'429':>5}")
+
+    async def warm_up(i):
+        await sheets_async.run_sync(get_backend().warm_up)
+    await _run_scenario(client, "warm_up", warm_up, 1, 1)
+
+    async def login(i):
+        await sheets_async.get_seller_by_password(f"parol{rng.randint(1, args.sellers)}")
+    await _run_scenario(client, "parol bilan kirish", login, args.ops, args.concurrency)
+
+    async def stock_view(i):
+        await sheets_async.get_seller_stock_view(seller_id())
+    await _run_scenario(client, "stok ko'rinishi", stock_view, args.ops, args.concurrency)
+
+    async def sales_summary(i):
+        await sheets_async.get_seller_sales_summary(seller_id(), "2026-02-01", "2026-02-28")
+    await _run_scenario(client, "savdo hisoboti", sales_summary, args.ops, args.concurrency)
+
+    async def record_sale(i):
+        await sheets_async.record_sale(seller_id(), product_id(), 1, 1000)
+    await _run_scenario(client, "savdo (record_sale)", record_sale, args.ops, args.concurrency)
+
+    async def add_sale(i):
+        await sheets_async.add_sale(seller_id(), product_id(), 1, 1000)
+    await _run_scenario(client, "savdo (add_sale)", add_sale, args.ops, args.concurrency)
+
+    async def issue_stock(i):
+        await sheets_async.add_stock_to_seller(seller_id(), product_id(), 5, 1000)
+    await _run_scenario(client, "stok berish", issue_stock, args.ops, args.concurrency)
+
+    sheets_async.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sheets bilan ishlash tezligini fake_sheets da o'lchash")
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--stock-rows", type=int, default=2000)
+    parser.add_argument("--sales-rows", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.1, help="Har bir API so'rovi kechikishi (soniya)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--read-quota", type=int, default=None, help="Daqiqasiga o'qish so'rovlari chegarasi")
+    parser.add_argument("--write-quota", type=int, default=None, help="Daqiqasiga yozish so'rovlari chegarasi")
+    parser.add_argument("--sheets-read-quota", type=int, default=0,
+                        help="Bot tomonidagi o'qish kvotasi (scheduler), 0 - cheklovsiz")
+    parser.add_argument("--sheets-write-quota", type=int, default=0,
+                        help="Bot tomonidagi yozish kvotasi (scheduler), 0 - cheklovsiz")
+    parser.add_argument("--ops", type=int, default=100, help="Har bir ssenariydagi amallar soni")
+    parser.add_argument("--concurrency", type=int, default=10, help="Bir vaqtdagi foydalanuvchilar soni")
+    parser.add_argument("--seed", type=int, default=0)
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+# export.py
+# Stok va Savdolar jurnallarini admin uchun CSV fayl (ixtiyoriy gzip) qilib eksport qilish.
+# Qatorlar ombordan EXPORT_CHUNK_ROWS qatorlik bo'laklar bilan generator orqali o'qiladi va
+# darhol vaqtinchalik faylga yoziladi, shuning uchun jurnal qanchalik katta bo'lmasin,
+# xotirada bir vaqtda faqat bitta bo'lak turadi.
+# Stok ixchamlangan bo'lsa, eksportda QOLDIQ qatorlari o'rniga Stok_arxiv dagi asl qatorlar
+# beriladi (ular fayl boshida, keyin davr varaqlaridagi qatorlar).
+
+import csv
+import gzip
+import logging
+import os
+import tempfile
+from datetime import date
+
+import scheduler
+import sheets_api
+from storage import get_backend
+
+# --- ENV VARIABLES dan yuklash ---
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 2000))
+
+# Eksport turi -> (varaq nomi, sarlavha, sotuvchi ustuni sotuvchi IDsimi yoki ismimi)
+EXPORT_LEDGERS = {
+    "stok": (sheets_api.SHEET_NAMES["STOCK"], sheets_api.STOCK_HEADER, "name"),
+    "savdo": (sheets_api.SHEET_NAMES["SALES"], sheets_api.SALES_HEADER, "id"),
+}
+
+
+def _row_date(row):
+    """Qatorning Sana ustunidan (6-indeks) sanani oladi, o'qib bo'lmasa None."""
+    try:
+        return date.fromisoformat(str(row[6]).strip().split(' ')[0])
+    except (ValueError, IndexError):
+        return None
+
+def filter_rows(rows, seller_key=None, start=None, end=None):
+    """Sotuvchi (1-ustun) va sana oralig'i bo'yicha filtrlaydigan generator.
+    Sana oralig'i berilganda sanasi o'qilmagan qatorlar tashlab yuboriladi."""
+    for row in rows:
+        if not row: continue
+        if seller_key is not None and (len(row) < 2 or str(row[1]).strip() != seller_key):
+            continue
+        if start or end:
+            row_date = _row_date(row)
+            if row_date is None: continue
+            if start and row_date < start: continue
+            if end and row_date > end: continue
+        yield row
+
+def export_ledger(kind, seller_id=None, start=None, end=None, compress=False):
+    """Jurnalni vaqtinchalik CSV (yoki .csv.gz) faylga yozadi.
+    (fayl yo'li, fayl nomi, qatorlar soni) qaytaradi, xato bo'lsa None; faylni chaqiruvchi o'chiradi."""
+    sheet_name, header, seller_column = EXPORT_LEDGERS[kind]
+    backend = get_backend()
+
+    seller_key = None
+    if seller_id is not None:
+        # Stok qatorlarida sotuvchi ismi, Savdolar qatorlarida esa IDsi saqlanadi
+        seller_key = backend.get_seller_name_by_id(seller_id) if seller_column == "name" else str(seller_id)
+
+    parts = [kind]
+    if seller_id is not None: parts.append(f"sotuvchi{seller_id}")
+    if start or end: parts.append(f"{start or ''}_{end or ''}")
+    filename = "_".join(parts) + (".csv.gz" if compress else ".csv")
+
+    fd, path = tempfile.mkstemp(suffix=".csv.gz" if compress else ".csv")
+    os.close(fd)
+    count = 0
+    try:
+        # utf-8-sig: Excel o'zbekcha harflarni to'g'ri ochishi uchun
+        opener = gzip.open if compress else open
+        with opener(path, "wt", encoding="utf-8-sig", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            # Eksport uzoq davom etadi: savdo va sotuvchi so'rovlari undan oldin o'tadi
+            with scheduler.priority(scheduler.PRIORITY_ADMIN):
+                rows = backend.iter_ledger_rows(sheet_name, EXPORT_CHUNK_ROWS, start, end)
+                for row in filter_rows(rows, seller_key, start, end):
+                    writer.writerow(row)
+                    count += 1
+    except Exception as e:
+        logging.error(f"'{sheet_name}' ni eksport qilishda xato: {e}")
+        os.remove(path)
+        return None
+    logging.info(f"'{sheet_name}' eksport qilindi: {count} qator ({filename}).")
+    return path, filename, count
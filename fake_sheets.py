@@ -0,0 +1,362 @@
+# fake_sheets.py
+# Google Sheets o'rniga ishlatiladigan mahalliy (jarayon ichidagi) gspread o'xshashi.
+# sheets_api ishlatadigan chaqiruvlarni amalga oshiradi: open_by_key, worksheet,
+# add_worksheet, get_all_values, append_row(s), batch_get / values_batch_get, batch_update.
+# Sun'iy kechikish, kvota (429) xatolari va oldindan to'ldirilgan ma'lumot hajmlari
+# sozlanadi, shuning uchun botning tezligini internet va haqiqiy kvotasiz o'lchash mumkin.
+#
+# Foydalanish:
+#   client = fake_sheets.FakeClient(fake_sheets.seed_data(sales_rows=20000), latency=0.15)
+#   sheets_api.use_spreadsheet(client.open_by_key("fake"))
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import gspread
+from gspread.exceptions import APIError
+
+import sheets_api
+
+SHEET_NAMES = sheets_api.SHEET_NAMES
+SELLERS_HEADER = ["ID", "Ism", "Tuman", "Telefon", "Parol", "Sana"]
+
+# Qaysi chaqiruv kvotaning qaysi turiga kiradi (Sheets API "read" va "write" so'rovlari)
+_READ_CALLS = {"open_by_key", "worksheet", "worksheets", "get_all_values", "batch_get", "values_batch_get"}
+_WRITE_CALLS = {"add_worksheet", "append_row", "append_rows", "batch_update"}
+
+
+# ==============================================================================
+# I. YORDAMCHI FUNKSIYALAR
+# ==============================================================================
+
+def _display(value):
+    """Katak qiymatini Sheets FORMATTED_VALUE ko'rinishida qaytaradi (1000.0 -> '1000')."""
+    if value is None: return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _column_index(letters):
+    """'A' -> 1, 'G' -> 7, 'AA' -> 27."""
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index
+
+_CELL_RANGE = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+def _parse_range(range_name, default_title=None):
+    """"'Varaq'!A2:G" ko'rinishidagi oraliqni (varaq, 1-qator, oxirgi qator, 1-ustun, oxirgi ustun)
+    ga ajratadi. Berilmagan chegaralar None bo'ladi."""
+    title, _, cells = range_name.rpartition("!")
+    if not title:
+        # Faqat varaq nomi ('Stok') yoki faqat kataklar ('A2:G') berilgan
+        if default_title is None or not _CELL_RANGE.match(cells):
+            title, cells = cells, ""
+        else:
+            title = default_title
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+
+    match = _CELL_RANGE.match(cells)
+    if match is None:
+        raise ValueError(f"Noto'g'ri oraliq: {range_name}")
+    first_col, first_row, last_col, last_row = match.groups()
+    if last_col is None and last_row is None:
+        # Bitta katak ('A1') yoki butun varaq ('')
+        last_col, last_row = first_col, first_row
+    return (title,
+            int(first_row) if first_row else None, int(last_row) if last_row else None,
+            _column_index(first_col) if first_col else None, _column_index(last_col) if last_col else None)
+
+class _FakeResponse:
+    """APIError uchun requests.Response o'rnini bosuvchi obyekt."""
+    def __init__(self, status_code, message, status):
+        self.status_code = status_code
+        self.text = message
+        self._error = {"code": status_code, "message": message, "status": status}
+
+    def json(self):
+        return {"error": self._error}
+
+
+# ==============================================================================
+# II. SOXTA KLIENT, JADVAL VA VARAQ
+# ==============================================================================
+
+class FakeClient:
+    """gspread.Client o'rnini bosadi. Barcha so'rovlar shu obyekt orqali o'lchanadi.
+
+    data:        {varaq nomi: [[sarlavha], [qator], ...]} (seed_data() ga qarang)
+    latency:     har bir API so'rovi uchun kechikish (soniya)
+    jitter:      kechikishga qo'shiladigan tasodifiy qism (0..jitter soniya)
+    read_quota:  daqiqasiga ruxsat etilgan o'qish so'rovlari (None - cheklovsiz)
+    write_quota: daqiqasiga ruxsat etilgan yozish so'rovlari (None - cheklovsiz)
+    seed:        jitter uchun tasodifiy sonlar urug'i (natijalar qayta takrorlanishi uchun)"""
+
+    def __init__(self, data=None, latency=0.0, jitter=0.0, read_quota=None, write_quota=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {"read": deque(), "write": deque()}
+        self._fail_next = []
+        self.calls = {}
+        self.errors = {}
+        self.spreadsheet = FakeSpreadsheet(self, data or {})
+
+    # --- Kvota, kechikish va hisoblagichlar ---
+    def _request(self, call):
+        """Har bir API so'rovidan oldin chaqiriladi: hisoblaydi, kvotani tekshiradi, kutadi."""
+        kind = "read" if call in _READ_CALLS else "write"
+        with self._lock:
+            self.calls[call] = self.calls.get(call, 0) + 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            error = self._fail_next.pop(0) if self._fail_next else None
+            if error is None:
+                error = self._check_quota(kind)
+            if error is not None:
+                self.errors[error[0]] = self.errors.get(error[0], 0) + 1
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            raise APIError(_FakeResponse(*error))
+
+    def _check_quota(self, kind):
+        quota = self.quotas[kind]
+        if quota is None: return None
+        window = self._windows[kind]
+        now = time.monotonic()
+        while window and now - window[0] >= 60:
+            window.popleft()
+        if len(window) >= quota:
+            return (429, f"Quota exceeded for quota metric '{kind.capitalize()} requests' "
+                         f"and limit '{kind.capitalize()} requests per minute per user'", "RESOURCE_EXHAUSTED")
+        window.append(now)
+        return None
+
+    def fail_next(self, count=1, status_code=429):
+        """Keyingi count ta so'rovni berilgan xato bilan qaytaradi (qayta urinishlarni sinash uchun)."""
+        status = "RESOURCE_EXHAUSTED" if status_code == 429 else "UNAVAILABLE"
+        with self._lock:
+            self._fail_next.extend([(status_code, "Injected error", status)] * count)
+
+    def stats(self):
+        """{'calls': {chaqiruv: soni}, 'reads': n, 'writes': n, 'errors': {kod: soni}}."""
+        with self._lock:
+            calls = dict(self.calls)
+            errors = dict(self.errors)
+        return {
+            "calls": calls,
+            "reads": sum(n for call, n in calls.items() if call in _READ_CALLS),
+            "writes": sum(n for call, n in calls.items() if call in _WRITE_CALLS),
+            "errors": errors,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            for window in self._windows.values():
+                window.clear()
+
+    # --- gspread.Client ---
+    def open_by_key(self, key):
+        self._request("open_by_key")
+        return self.spreadsheet
+
+
+class FakeSpreadsheet:
+    """gspread.Spreadsheet o'rnini bosadi. Ma'lumotlar xotirada saqlanadi."""
+
+    def __init__(self, client, data):
+        self.client = client
+        self.id = "fake-spreadsheet"
+        self._lock = threading.RLock()
+        self._worksheets = {}
+        for title, rows in data.items():
+            self._create(title, rows)
+
+    def _create(self, title, rows=()):
+        worksheet = FakeWorksheet(self, len(self._worksheets), title, [list(row) for row in rows])
+        self._worksheets[title] = worksheet
+        return worksheet
+
+    def worksheet(self, title):
+        self.client._request("worksheet")
+        with self._lock:
+            if title not in self._worksheets:
+                raise gspread.WorksheetNotFound(title)
+            return self._worksheets[title]
+
+    def worksheets(self):
+        self.client._request("worksheets")
+        with self._lock:
+            return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows=100, cols=20, index=None):
+        self.client._request("add_worksheet")
+        with self._lock:
+            if title in self._worksheets:
+                raise APIError(_FakeResponse(400, f"A sheet with the name \"{title}\" already exists.", "INVALID_ARGUMENT"))
+            return self._create(title)
+
+    def _read(self, range_name, default_title=None):
+        title, first_row, last_row, first_col, last_col = _parse_range(range_name, default_title)
+        with self._lock:
+            if title not in self._worksheets:
+                raise APIError(_FakeResponse(400, f"Unable to parse range: {range_name}", "INVALID_ARGUMENT"))
+            rows = self._worksheets[title]._rows
+            start = (first_row or 1) - 1
+            stop = last_row if last_row else len(rows)
+            values = []
+            for row in rows[start:stop]:
+                cells = row[(first_col or 1) - 1:last_col]
+                cells = [_display(v) for v in cells]
+                while cells and cells[-1] == "":
+                    cells.pop()
+                values.append(cells)
+        # Sheets oxiridagi bo'sh qatorlarni qaytarmaydi
+        while values and not values[-1]:
+            values.pop()
+        value_range = {"range": range_name, "majorDimension": "ROWS"}
+        if values:
+            value_range["values"] = values
+        return value_range
+
+    def values_batch_get(self, ranges, params=None):
+        self.client._request("values_batch_get")
+        return {"spreadsheetId": self.id, "valueRanges": [self._read(r) for r in ranges]}
+
+    def batch_update(self, body):
+        """appendCells, updateCells, insertDimension va deleteDimension (faqat ROWS) so'rovlari
+        qo'llab-quvvatlanadi. Haqiqiy API kabi atomar: biror so'rov noto'g'ri bo'lsa, hech narsa yozilmaydi."""
+        self.client._request("batch_update")
+
+        def cells(grid_rows):
+            return [[next(iter(cell.get("userEnteredValue", {"stringValue": ""}).values()))
+                     for cell in row.get("values", [])]
+                    for row in grid_rows]
+
+        def invalid(message):
+            return APIError(_FakeResponse(400, message, "INVALID_ARGUMENT"))
+
+        with self._lock:
+            # Varaqlar ro'yxati so'rov sifatida hisoblanmaydi (haqiqiy API sheetId ni o'zi biladi)
+            by_id = {worksheet.id: worksheet for worksheet in self._worksheets.values()}
+            # So'rovlar nusxada bajariladi va faqat hammasi to'g'ri bo'lsa saqlanadi
+            copies = {}
+            for request in body.get("requests", []):
+                kind, = request
+                spec = request[kind]
+                target = spec.get("range") or spec.get("start") or spec
+                sheet_id = target.get("sheetId")
+                if sheet_id not in by_id:
+                    raise invalid(f"No grid with id: {sheet_id}")
+                rows = copies.setdefault(sheet_id, [list(row) for row in by_id[sheet_id]._rows])
+                if kind == "appendCells":
+                    rows.extend(cells(spec.get("rows", [])))
+                elif kind == "updateCells":
+                    start = target.get("rowIndex", 0)
+                    if target.get("columnIndex", 0) != 0:
+                        raise invalid("Only columnIndex 0 is supported")
+                    for offset, row in enumerate(cells(spec.get("rows", []))):
+                        while len(rows) <= start + offset:
+                            rows.append([])
+                        rows[start + offset] = row + rows[start + offset][len(row):]
+                elif kind in ("insertDimension", "deleteDimension") and target.get("dimension") == "ROWS":
+                    first, last = target["startIndex"], target["endIndex"]
+                    if not 0 <= first <= last or (kind == "deleteDimension" and last > len(rows)):
+                        raise invalid(f"Invalid range: {first}..{last}")
+                    if kind == "insertDimension":
+                        rows[first:first] = [[] for _ in range(last - first)]
+                    else:
+                        del rows[first:last]
+                else:
+                    raise invalid(f"Unsupported request: {kind}")
+            for sheet_id, rows in copies.items():
+                by_id[sheet_id]._rows[:] = rows
+        return {"spreadsheetId": self.id, "replies": [{} for _ in body.get("requests", [])]}
+
+
+class FakeWorksheet:
+    """gspread.Worksheet o'rnini bosadi."""
+
+    def __init__(self, spreadsheet, sheet_id, title, rows):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.id = sheet_id
+        self.title = title
+        self._rows = rows
+
+    @property
+    def row_count(self):
+        return len(self._rows)
+
+    def get_all_values(self, **kwargs):
+        self.client._request("get_all_values")
+        return self.spreadsheet._read(f"'{self.title}'").get("values", [])
+
+    def batch_get(self, ranges, **kwargs):
+        self.client._request("batch_get")
+        return [self.spreadsheet._read(r, default_title=self.title).get("values", []) for r in ranges]
+
+    def append_row(self, values, value_input_option=None, **kwargs):
+        self.client._request("append_row")
+        with self.spreadsheet._lock:
+            self._rows.append(list(values))
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        self.client._request("append_rows")
+        with self.spreadsheet._lock:
+            self._rows.extend(list(row) for row in values)
+
+
+# ==============================================================================
+# III. NAMUNAVIY MA'LUMOTLAR
+# ==============================================================================
+
+def seed_data(sellers=20, products=100, stock_rows=2000, sales_rows=10000, days=90, seed=0):
+    """Bot formatidagi to'rt varaq uchun tasodifiy (lekin qayta takrorlanadigan) ma'lumot.
+    Stok qatorlari avval har bir sotuvchiga mahsulot berish, keyin sotilganlarni ayirishdan iborat.
+    Sotuvchi i ning paroli 'parol{i}'."""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, 9, 0)
+
+    def moment(index, total):
+        # Qatorlar vaqt bo'yicha o'sib boradi (jurnal kabi)
+        return (start + timedelta(days=days * index / max(total, 1), minutes=rng.randint(0, 59))).strftime("%Y-%m-%d %H:%M")
+
+    seller_rows = [[i, f"Sotuvchi {i}", f"Tuman {i % 7 + 1}", f"+99890{i:07d}", f"parol{i}", moment(0, 1)]
+                   for i in range(1, sellers + 1)]
+    product_rows = [[i, f"Mahsulot {i}", rng.randint(5, 200) * 1000] for i in range(1, products + 1)]
+    prices = {row[0]: row[2] for row in product_rows}
+
+    stock = []
+    for index in range(stock_rows):
+        seller_id, product_id = rng.randint(1, sellers), rng.randint(1, products)
+        quantity = rng.randint(1, 50) if index % 3 else -rng.randint(1, 10)
+        price = prices[product_id]
+        stock.append(["", f"Sotuvchi {seller_id}", f"Mahsulot {product_id}", quantity, price,
+                      quantity * price, moment(index, stock_rows)])
+
+    sales = []
+    for index in range(sales_rows):
+        seller_id, product_id = rng.randint(1, sellers), rng.randint(1, products)
+        quantity = rng.randint(1, 10)
+        price = prices[product_id]
+        sales.append(["", seller_id, product_id, quantity, price, quantity * price, moment(index, sales_rows)])
+
+    return {
+        SHEET_NAMES["SELLERS"]: [SELLERS_HEADER] + seller_rows,
+        SHEET_NAMES["PRODUCTS"]: [sheets_api.PRODUCTS_HEADER] + product_rows,
+        SHEET_NAMES["STOCK"]: [sheets_api.STOCK_HEADER] + stock,
+        SHEET_NAMES["SALES"]: [sheets_api.SALES_HEADER] + sales,
+    }
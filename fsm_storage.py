@@ -0,0 +1,226 @@
+# fsm_storage.py
+# Bot qayta ishga tushganda ham saqlanib qoladigan FSM ombori.
+# Standart MemoryStorage har deploy/restartda hamma sotuvchilarni tizimdan chiqarib
+# yuboradi (seller_id FSM ma'lumotida). Bu yerda:
+#   - SqliteStorage: mahalliy SQLite fayli (WAL rejimi)
+#   - Redis: REDIS_URL berilsa aiogram RedisStorage (redis paketi o'rnatilgan bo'lsa)
+#   - CoalescingStorage: yuqoridagilar ustidagi xotira qatlami. O'qishlar xotiradan,
+#     yozuvlar esa FSM_FLUSH_DELAY soniyada bir marta, har bir kalit uchun bitta yozuv
+#     bo'lib (bir qadamdagi bir nechta update_data birlashadi) omborga tushadi.
+# Qaysi ombor ishlatilishi FSM_STORAGE ENV o'zgaruvchisi bilan tanlanadi.
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+# --- ENV VARIABLES dan yuklash ---
+FSM_STORAGE = os.environ.get('FSM_STORAGE', 'sqlite') # 'sqlite', 'redis' yoki 'memory'
+FSM_SQLITE_PATH = os.environ.get('FSM_SQLITE_PATH', 'fsm.db')
+REDIS_URL = os.environ.get('REDIS_URL')
+# Yozuvlarni to'plash muddati (soniya)
+FSM_FLUSH_DELAY = float(os.environ.get('FSM_FLUSH_DELAY', 0.5))
+# Xotirada saqlanadigan kalitlar (foydalanuvchi/chat) soni; eng uzoq ishlatilmagan va
+# omborga yozib bo'lingan kalitlar chiqarib yuboriladi
+FSM_CACHE_SIZE = int(os.environ.get('FSM_CACHE_SIZE', 10000))
+
+
+class SqliteStorage(BaseStorage):
+    """FSM holati va ma'lumotlarini SQLite jadvalida saqlaydi (kalit -> holat, JSON ma'lumot).
+    sqlite3 sinxron, shuning uchun har bir murojaat alohida threadda bajariladi."""
+
+    def __init__(self, path=FSM_SQLITE_PATH):
+        self.path = path
+        self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True,
+                                              with_destiny=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL)")
+        self._conn.commit()
+        # Bitta ulanish ishlatiladi, shuning uchun murojaatlar ketma-ket
+        self._db_lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        async with self._db_lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _read(self, key):
+        row = self._conn.execute("SELECT state, data FROM fsm WHERE key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, {})
+
+    def _write_many(self, records):
+        """records: [(kalit, holat, ma'lumot), ...]. Bo'sh yozuvlar (holat yo'q, ma'lumot yo'q) o'chiriladi."""
+        with self._conn:
+            for key, state, data in records:
+                if state is None and not data:
+                    self._conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+                else:
+                    self._conn.execute("INSERT OR REPLACE INTO fsm (key, state, data) VALUES (?, ?, ?)",
+                                       (key, state, json.dumps(data, ensure_ascii=False)))
+
+    async def read_record(self, key: StorageKey):
+        """(holat, ma'lumot) ni bitta so'rov bilan o'qiydi."""
+        return await self._run(self._read, self._key_builder.build(key))
+
+    async def write_records(self, records):
+        """[(StorageKey, holat, ma'lumot), ...] ni bitta tranzaksiyada yozadi."""
+        await self._run(self._write_many, [(self._key_builder.build(key), state, data)
+                                           for key, state, data in records])
+
+    async def set_state(self, key: StorageKey, state=None):
+        _, data = await self.read_record(key)
+        await self.write_records([(key, state.state if isinstance(state, State) else state, data)])
+
+    async def get_state(self, key: StorageKey):
+        return (await self.read_record(key))[0]
+
+    async def set_data(self, key: StorageKey, data):
+        state, _ = await self.read_record(key)
+        await self.write_records([(key, state, dict(data))])
+
+    async def get_data(self, key: StorageKey):
+        return (await self.read_record(key))[1]
+
+    async def close(self):
+        self._conn.close()
+
+
+class CoalescingStorage(BaseStorage):
+    """Istalgan FSM ombori ustidagi xotira qatlami (write-behind).
+    Har bir kalit birinchi murojaatda ombordan bir marta o'qiladi, keyin xotiradan beriladi.
+    O'zgargan kalitlar FSM_FLUSH_DELAY dan keyin birgalikda yoziladi; close() da
+    qolganlari darhol yoziladi. Xotirada ko'pi bilan cache_size ta kalit turadi (LRU)."""
+
+    def __init__(self, inner, flush_delay=FSM_FLUSH_DELAY, cache_size=FSM_CACHE_SIZE):
+        self.inner = inner
+        self.flush_delay = flush_delay
+        self.cache_size = cache_size
+        self._records = OrderedDict() # StorageKey -> [holat, ma'lumot] (oxirgi ishlatilgani oxirida)
+        self._loading = {}   # StorageKey -> asyncio.Task (bir vaqtda bir marta o'qish uchun)
+        self._dirty = set()
+        self._flushing = set() # hozir omborga yozilayotgan kalitlar
+        self._flush_handle = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _record(self, key):
+        record = self._records.get(key)
+        if record is not None:
+            self._records.move_to_end(key)
+            return record
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.ensure_future(self._load(key))
+        try:
+            record = await task
+        finally:
+            self._loading.pop(key, None)
+        # Kutish paytida boshqa kalitning o'qilishi yozuvni keshdan chiqarib yuborgan bo'lishi
+        # mumkin (u dirty emas, ya'ni ombordagi bilan bir xil): qaytarib qo'yiladi
+        return self._records.setdefault(key, record)
+
+    async def _load(self, key):
+        if hasattr(self.inner, "read_record"):
+            state, data = await self.inner.read_record(key)
+        else:
+            state, data = await self.inner.get_state(key), await self.inner.get_data(key)
+        # O'qish paytida yozilgan bo'lsa, xotiradagi yangiroq
+        record = self._records.setdefault(key, [state, dict(data)])
+        self._evict()
+        return record
+
+    def _evict(self):
+        """Chegaradan oshgan eng eski kalitlarni chiqaradi. Hali yozilmagan (dirty) yoki
+        o'qilayotgan kalitlar qoldiriladi (ular keyingi safar chiqariladi). Yozilayotgan
+        kalit ham qoldiriladi, aks holda u ombordan eski holatda qayta o'qilishi mumkin."""
+        excess = len(self._records) - self.cache_size
+        if excess <= 0: return
+        for key in list(self._records):
+            if excess <= 0: break
+            if key in self._dirty or key in self._loading or key in self._flushing: continue
+            del self._records[key]
+            excess -= 1
+
+    def _mark_dirty(self, key):
+        self._dirty.add(key)
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        """O'zgargan kalitlarni omborga yozadi."""
+        async with self._flush_lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            if not self._dirty: return
+            keys, self._dirty = self._dirty, set()
+            records = [(key, self._records[key][0], dict(self._records[key][1])) for key in keys]
+            self._flushing = keys
+            try:
+                if hasattr(self.inner, "write_records"):
+                    await self.inner.write_records(records)
+                else:
+                    for key, state, data in records:
+                        await self.inner.set_state(key, state)
+                        await self.inner.set_data(key, data)
+            except Exception as e:
+                logging.error(f"FSM ma'lumotlarini saqlashda xato (keyinroq qayta urinamiz): {e}")
+                self._dirty |= set(keys)
+                if self._flush_handle is None:
+                    self._flush_handle = asyncio.get_running_loop().call_later(
+                        self.flush_delay * 4, lambda: asyncio.ensure_future(self.flush()))
+            finally:
+                self._flushing = set()
+
+    async def set_state(self, key: StorageKey, state=None):
+        record = await self._record(key)
+        record[0] = state.state if isinstance(state, State) else state
+        self._mark_dirty(key)
+
+    async def get_state(self, key: StorageKey):
+        return (await self._record(key))[0]
+
+    async def set_data(self, key: StorageKey, data):
+        record = await self._record(key)
+        record[1] = dict(data)
+        self._mark_dirty(key)
+
+    async def get_data(self, key: StorageKey):
+        return dict((await self._record(key))[1])
+
+    async def update_data(self, key: StorageKey, data):
+        record = await self._record(key)
+        record[1].update(data)
+        self._mark_dirty(key)
+        return dict(record[1])
+
+    async def close(self):
+        await self.flush()
+        await self.inner.close()
+
+
+def create_storage():
+    """FSM_STORAGE bo'yicha Dispatcher uchun FSM omborini yaratadi."""
+    if FSM_STORAGE == 'memory':
+        return MemoryStorage()
+
+    if FSM_STORAGE == 'redis':
+        if not REDIS_URL:
+            logging.error("FSM_STORAGE=redis, lekin REDIS_URL topilmadi. SQLite ishlatiladi.")
+        else:
+            try:
+                from aiogram.fsm.storage.redis import RedisStorage
+                return CoalescingStorage(RedisStorage.from_url(REDIS_URL))
+            except ImportError:
+                logging.error("Redis uchun 'redis' paketi o'rnatilmagan. SQLite ishlatiladi.")
+    elif FSM_STORAGE != 'sqlite':
+        logging.warning(f"Noma'lum FSM_STORAGE='{FSM_STORAGE}', SQLite ishlatiladi.")
+
+    return CoalescingStorage(SqliteStorage())
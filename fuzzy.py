@@ -0,0 +1,106 @@
+# fuzzy.py
+# Mahsulot nomlari bo'yicha noaniq (xato yozilgan) qidiruv uchun xotiradagi indeks.
+# Nomlar trigrammalarga bo'linadi (trigramma -> nomlar ro'yxati) va qo'shimcha ravishda
+# saralangan ro'yxatda saqlanadi (prefiks bo'yicha qidirish uchun). So'rov faqat
+# umumiy trigrammasi bor nomlarni ko'rib chiqadi, eng yaxshilari esa tahrir masofasi
+# (difflib) bilan qayta baholanadi.
+
+import bisect
+import difflib
+import os
+from collections import Counter
+
+# Topilmaganda nechta o'xshash nom taklif qilinadi
+FUZZY_SUGGESTIONS = int(os.environ.get('FUZZY_SUGGESTIONS', 5))
+# Bundan past o'xshashlikdagi (0..1) nomlar taklif qilinmaydi
+FUZZY_MIN_SCORE = float(os.environ.get('FUZZY_MIN_SCORE', 0.4))
+
+
+# O'zbekcha o'/g' dagi tutuq belgisining turli yozilishlari bitta belgiga keltiriladi
+_APOSTROPHES = str.maketrans({c: "'" for c in "\u2018\u2019\u02bb\u02bc\u0060\u00b4"})
+
+def normalize(name):
+    """Nomlarni solishtirish uchun yagona ko'rinish: katta-kichik harfsiz (casefold), tutuq
+    belgilari bir xil va ortiqcha bo'shliqlarsiz. Aniq qidiruv (sheets_api, SQLite) ham
+    shundan foydalanadi, shuning uchun avtoto'ldirishda topilgan nom qidiruvda ham topiladi."""
+    return " ".join(str(name).translate(_APOSTROPHES).casefold().split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """Qatorlar ([ID, Nomi, ...]) ustidagi trigramma va prefiks indeksi."""
+
+    def __init__(self, rows, name_column=1):
+        self.entries = [] # (normallashtirilgan nom, trigrammalar, qator)
+        self.postings = {} # trigramma -> entries dagi o'rinlar
+        seen = set()
+        for row in rows:
+            if len(row) <= name_column or not str(row[name_column]).strip(): continue
+            name = normalize(row[name_column])
+            if name in seen: continue # Bir xil nomdan birinchisi (lookup dagi kabi)
+            seen.add(name)
+            grams = trigrams(name)
+            position = len(self.entries)
+            self.entries.append((name, grams, row))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(position)
+        self.sorted_names = sorted((name, position) for position, (name, _, _) in enumerate(self.entries))
+        # Avtoto'ldirish natijalari: (prefiks, limit) -> qatorlar. Indeks jadval o'zgarganda
+        # yangidan quriladi, shuning uchun bu kesh ham u bilan birga yangilanadi.
+        self._completions = {}
+
+    def _prefix_positions(self, query, limit):
+        start = bisect.bisect_left(self.sorted_names, (query,))
+        positions = []
+        for name, position in self.sorted_names[start:start + limit]:
+            if not name.startswith(query): break
+            positions.append(position)
+        return positions
+
+    def prefix(self, query, limit=FUZZY_SUGGESTIONS):
+        """Nomi query bilan boshlanadigan qatorlar (alifbo tartibida)."""
+        return [self.entries[position][2] for position in self._prefix_positions(normalize(query), limit)]
+
+    def search(self, query, limit=FUZZY_SUGGESTIONS, min_score=FUZZY_MIN_SCORE):
+        """query ga eng o'xshash limit ta qator (o'xshashlik kamayish tartibida)."""
+        query = normalize(query)
+        if not query: return []
+        query_grams = trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+
+        # Trigramma o'xshashligi (Dice) bo'yicha dastlabki saralash
+        scores = {}
+        for position, common in shared.items():
+            scores[position] = 2 * common / (len(query_grams) + len(self.entries[position][1]))
+        # Prefiks mosliklari har doim nomzod bo'ladi
+        for position in self._prefix_positions(query, limit):
+            scores[position] = 1.0
+
+        shortlist = sorted(scores, key=lambda p: -scores[p])[:limit * 3]
+        ranked = []
+        for position in shortlist:
+            name = self.entries[position][0]
+            score = max(scores[position], difflib.SequenceMatcher(None, query, name).ratio())
+            if score >= min_score:
+                ranked.append((-score, name, position))
+        ranked.sort()
+        return [self.entries[position][2] for _, _, position in ranked[:limit]]
+
+    def complete(self, query, limit=FUZZY_SUGGESTIONS):
+        """Avtoto'ldirish: avval nomi query bilan boshlanadiganlar, joy qolsa o'xshash nomlar.
+        Natija har bir prefiks uchun bir marta hisoblanadi."""
+        key = (normalize(query), limit)
+        result = self._completions.get(key)
+        if result is None:
+            result = self.prefix(key[0], limit)
+            if len(result) < limit and key[0]:
+                seen = {id(row) for row in result}
+                result += [row for row in self.search(key[0], limit) if id(row) not in seen][:limit - len(result)]
+            if len(self._completions) >= 1000: self._completions.clear() # Xotira cheklangan bo'lsin
+            self._completions[key] = result
+        return result
@@ -0,0 +1,335 @@
+# metrics.py
+# Prometheus matn formatidagi (/metrics) o'lchovlar: hisoblagichlar, gistogrammalar va
+# ko'rsatkichlar. Tashqi kutubxonasiz; barcha yozuvlar thread-safe, chunki Sheets
+# chaqiruvlari thread-pool ichida bajariladi.
+#
+# Nima o'lchanadi:
+#   - ombor (sheets_api / storage) funksiyalari: soni, xatolari, davomiyligi
+#   - Google API so'rovlari: soni, HTTP xato kodi (429 - kvota), davomiyligi
+#   - handlerlar bo'yicha update ishlash vaqti va bir vaqtda ishlanayotgan updatelar
+#   - jadval keshi va jurnal holatlari bo'yicha hit/miss (va hit ulushi)
+#   - event loop kechikishi (lag)
+#
+# /metrics ochiq emas: webhook serverida u faqat METRICS_TOKEN bilan
+# (Authorization: Bearer <token>) ishlaydi, METRICS_PORT berilsa esa alohida portda
+# (standart bo'yicha faqat 127.0.0.1 da) ham ochiladi - polling rejimida ham.
+
+import asyncio
+import hmac
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from aiogram import BaseMiddleware
+from aiohttp import web
+
+# Gistogramma chegaralari (soniya)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Event loop kechikishini necha soniyada bir o'lchash
+LOOP_LAG_INTERVAL = 0.5
+# /metrics uchun maxfiy token (berilmasa webhook serverida /metrics ochilmaydi)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# /metrics uchun alohida port (0 - alohida server yo'q) va manzil
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+
+_lock = threading.Lock()
+
+
+# ==============================================================================
+# I. O'LCHOV TURLARI
+# ==============================================================================
+
+def _label_text(names, values):
+    if not names: return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+    return "{" + pairs + "}"
+
+def _number(value):
+    if value == float("inf"): return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}"]
+
+    def value(self, **labels):
+        with _lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_value(self, key, value):
+        bucket_counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), key + (_number(bound),))} {cumulative}")
+        lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(round(total, 6))}")
+        lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+    def value(self, **labels):
+        with _lock:
+            state = self._values.get(self._key(labels))
+            return (state[2], state[1]) if state else (0, 0.0)
+
+
+_registry = []
+
+
+# ==============================================================================
+# II. BOT O'LCHOVLARI
+# ==============================================================================
+
+storage_calls = Counter("sellerbot_storage_calls_total",
+                        "Ombor (sheets_api/storage) funksiyalari chaqiruvlari", ("function", "status"))
+storage_seconds = Histogram("sellerbot_storage_call_seconds",
+                            "Ombor funksiyalari davomiyligi", ("function",))
+
+google_api_calls = Counter("sellerbot_google_api_calls_total",
+                           "Google Sheets API so'rovlari (status: ok yoki HTTP kodi)", ("call", "status"))
+google_api_seconds = Histogram("sellerbot_google_api_call_seconds",
+                               "Google Sheets API so'rovlari davomiyligi", ("call",))
+
+google_api_retries = Counter("sellerbot_google_api_retries_total",
+                             "Kvota (429) yoki vaqtinchalik xato sabab qayta urinishlar", ("call", "status"))
+scheduler_waiting = Gauge("sellerbot_scheduler_waiting", "Kvota navbatida kutayotgan so'rovlar", ("kind",))
+scheduler_wait_seconds = Histogram("sellerbot_scheduler_wait_seconds",
+                                   "So'rovning kvota navbatida kutgan vaqti", ("kind", "priority"))
+
+cache_requests = Counter("sellerbot_cache_requests_total",
+                         "Kesh murojaatlari (result: hit, stale, tail, miss)", ("cache", "result"))
+cache_hit_ratio = Gauge("sellerbot_cache_hit_ratio",
+                        "Kesh murojaatlarining tarmoqqa chiqmasdan javob berilgan ulushi", ("cache",))
+
+update_seconds = Histogram("sellerbot_handler_seconds",
+                           "Handler bo'yicha update ishlash vaqti", ("event", "handler"))
+updates_total = Counter("sellerbot_updates_total", "Qabul qilingan updatelar", ("status",))
+updates_in_flight = Gauge("sellerbot_updates_in_flight", "Hozir ishlanayotgan updatelar soni")
+updates_in_flight.set(0)
+
+loop_lag = Gauge("sellerbot_event_loop_lag_seconds", "Oxirgi o'lchangan event loop kechikishi")
+loop_lag_seconds = Histogram("sellerbot_event_loop_lag_hist_seconds", "Event loop kechikishi taqsimoti",
+                             buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+
+@contextmanager
+def track_api_call(call):
+    """Google API so'rovini o'lchaydi. Xato bo'lsa uning HTTP kodi (masalan 429) yoziladi."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        response = getattr(e, "response", None)
+        google_api_calls.inc(call=call, status=str(getattr(response, "status_code", type(e).__name__)))
+        raise
+    else:
+        google_api_calls.inc(call=call, status="ok")
+    finally:
+        google_api_seconds.observe(time.perf_counter() - started, call=call)
+
+def track_storage_call(function, func, *args, **kwargs):
+    """Ombor funksiyasini bajaradi va o'lchaydi."""
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        storage_calls.inc(function=function, status="error")
+        raise
+    else:
+        # Yozuv funksiyalari xatoni False qaytarish orqali bildiradi
+        storage_calls.inc(function=function, status="error" if result is False else "ok")
+        return result
+    finally:
+        storage_seconds.observe(time.perf_counter() - started, function=function)
+
+def record_cache(cache, result):
+    """Kesh murojaati natijasini yozadi: 'hit', 'stale' (eski nusxa berildi), 'tail'
+    (faqat yangi qatorlar o'qildi) yoki 'miss' (to'liq o'qildi)."""
+    cache_requests.inc(cache=cache, result=result)
+
+
+def _update_cache_ratios():
+    with _lock:
+        totals = {}
+        for (cache, result), count in cache_requests._values.items():
+            served, total = totals.get(cache, (0, 0))
+            totals[cache] = (served + (count if result in ("hit", "stale") else 0), total + count)
+    for cache, (served, total) in totals.items():
+        cache_hit_ratio.set(round(served / total, 4) if total else 0, cache=cache)
+
+def render():
+    """Barcha o'lchovlarni Prometheus matn formatida qaytaradi."""
+    _update_cache_ratios()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==============================================================================
+# III. AIOGRAM VA AIOHTTP BILAN ULASH
+# ==============================================================================
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer middleware (dp.update): updatelar soni va bir vaqtda ishlanayotganlar."""
+    async def __call__(self, handler, event, data):
+        updates_in_flight.inc()
+        try:
+            result = await handler(event, data)
+        except Exception:
+            updates_total.inc(status="error")
+            raise
+        else:
+            updates_total.inc(status="ok")
+            return result
+        finally:
+            updates_in_flight.dec()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: qaysi handler qancha vaqt ishlaganini yozadi."""
+    def __init__(self, event_name):
+        self.event_name = event_name
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        with update_seconds.time(event=self.event_name, handler=name):
+            return await handler(event, data)
+
+
+def setup_dispatcher(dp):
+    """Dispatcherga o'lchov middlewarelarini ulaydi (ichki routerlarga ham tarqaladi)."""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    for event_name in ("message", "callback_query", "inline_query"):
+        dp.observers[event_name].middleware(HandlerMetricsMiddleware(event_name))
+
+
+async def monitor_event_loop():
+    """Event loop kechikishini o'lchaydi: LOOP_LAG_INTERVAL ga uxlab, qancha kech uyg'onganini yozadi."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - started - LOOP_LAG_INTERVAL)
+        loop_lag.set(round(lag, 6))
+        loop_lag_seconds.observe(lag)
+
+_monitor_task = None
+
+def start_event_loop_monitor():
+    global _monitor_task
+    if _monitor_task is None or _monitor_task.done():
+        _monitor_task = asyncio.get_running_loop().create_task(monitor_event_loop())
+
+
+def _authorized(request):
+    if not METRICS_TOKEN: return True
+    header = request.headers.get("Authorization", "")
+    return hmac.compare_digest(header.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+async def metrics_handler(request):
+    if not _authorized(request):
+        return web.Response(status=401, text="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+def setup_application(app):
+    """Webhook ilovasiga GET /metrics yo'lini qo'shadi (faqat METRICS_TOKEN bo'lsa:
+    webhook serveri internetga ochiq)."""
+    if not METRICS_TOKEN:
+        logging.warning("METRICS_TOKEN o'rnatilmagan: webhook serverida /metrics ochilmadi.")
+        return
+    app.router.add_get("/metrics", metrics_handler)
+    logging.info("O'lchovlar /metrics manzilida (token bilan).")
+
+async def start_metrics_server():
+    """METRICS_PORT berilsa, /metrics ni alohida portda ochadi. AppRunner (to'xtatishda
+    cleanup() uchun) yoki None qaytaradi."""
+    if not METRICS_PORT: return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    logging.info(f"O'lchovlar http://{METRICS_HOST}:{METRICS_PORT}/metrics manzilida.")
+    return runner
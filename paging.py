@@ -0,0 +1,43 @@
+# paging.py
+# Ro'yxatlarni sahifalab ko'rsatish uchun oldindan saralangan indeks.
+# Indeks jadval o'zgargandagina qayta quriladi; bitta sahifani olish esa faqat
+# sahifa hajmiga bog'liq (butun ro'yxatni saralash yoki xabarga yig'ish kerak emas).
+#
+# Kursor - sahifaning birinchi qatori IDsi. Yangi qator qo'shilsa ham kursor o'sha
+# qatorga bog'langanligicha qoladi (offsetdagidek siljib ketmaydi).
+
+import os
+from collections import namedtuple
+
+# Bitta sahifadagi qatorlar soni (Telegram tugmalari va 4096 belgilik xabar chegarasi uchun)
+LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 10))
+
+Page = namedtuple("Page", "rows prev_cursor next_cursor number pages")
+
+
+class SortedIndex:
+    """Qatorlarning sort_key bo'yicha saralangan nusxasi va ID -> o'rin lug'ati."""
+
+    def __init__(self, rows, sort_key):
+        self.rows = sorted((row for row in rows if row and str(row[0]).strip()), key=sort_key)
+        self.positions = {}
+        for position, row in enumerate(self.rows):
+            self.positions.setdefault(str(row[0]), position)
+
+    def page(self, cursor=None, size=LIST_PAGE_SIZE):
+        """cursor IDli qatordan boshlanadigan sahifa (cursor yo'q/topilmasa - birinchi sahifa)."""
+        size = max(1, size)
+        start = self.positions.get(str(cursor), 0) if cursor else 0
+        end = start + size
+        total = len(self.rows)
+        return Page(
+            rows=self.rows[start:end],
+            prev_cursor=str(self.rows[max(0, start - size)][0]) if start > 0 else None,
+            next_cursor=str(self.rows[end][0]) if end < total else None,
+            number=start // size + 1,
+            pages=max(1, -(-total // size)),
+        )
+
+
+def empty_page():
+    return Page(rows=[], prev_cursor=None, next_cursor=None, number=1, pages=1)
@@ -0,0 +1,136 @@
+# roles.py
+# Foydalanuvchi rolini har bir update uchun bir marta aniqlovchi middleware.
+# Admin - ADMIN_IDS dan bir marta tuzilgan frozenset dan, sotuvchi - Telegram user ID ->
+# sotuvchi sessiyasi keshidan. Natija handlerlarga `role` va `seller` argumentlari
+# sifatida beriladi, routerlar esa HasRole filtri bilan rol bo'yicha ajratiladi.
+# Sotuvchi sessiyasi FSM dan tiklanganda va keyin har SESSION_CHECK_INTERVAL soniyada
+# Sotuvchilar jadvali (kesh) bilan solishtiriladi: sotuvchi o'chirilgan yoki paroli
+# o'zgargan bo'lsa, sessiya bekor qilinadi.
+
+import hashlib
+import hmac
+import logging
+import os
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.filters import BaseFilter
+
+import sheets_async
+
+# --- ENV VARIABLES dan yuklash (bir marta) ---
+ADMIN_IDS = frozenset(int(i.strip()) for i in os.environ.get('ADMIN_IDS', '').split(',') if i.strip().isdigit())
+# Sotuvchi sessiyasi necha soniyada bir marta Sotuvchilar jadvali bilan qayta tekshiriladi
+SESSION_CHECK_INTERVAL = float(os.environ.get('SESSION_CHECK_INTERVAL', 300))
+# Parol izini (HMAC) hisoblash uchun server siri. Berilmasa BOT_TOKEN ishlatiladi.
+# O'zgartirilsa, saqlangan barcha sotuvchi sessiyalari bekor bo'ladi.
+SESSION_SECRET = (os.environ.get('SESSION_SECRET') or os.environ.get('BOT_TOKEN') or '').encode()
+
+ROLE_ADMIN = "admin"
+ROLE_SELLER = "seller"
+ROLE_GUEST = "guest"
+
+# Telegram user ID -> {'seller_id': ..., 'seller_name': ..., 'seller_key': parol izi,
+# 'checked_at': oxirgi tekshiruv vaqti} yoki None (tizimga kirmagan).
+# Kalit yo'q bo'lsa, foydalanuvchining FSM ma'lumotidan bir marta o'qiladi
+# (bot qayta ishga tushgandan keyin sessiya FSM omborida saqlanib qolgan bo'ladi).
+_seller_sessions = {}
+
+
+def password_key(password):
+    """Parolning server siri bilan olingan HMAC izi: sessiya va FSM da parolning o'zi
+    saqlanmaydi, FSM ombori sizib chiqsa ham izdan parolni tanlab topib bo'lmaydi."""
+    return hmac.new(SESSION_SECRET, str(password).strip().encode(), hashlib.sha256).hexdigest()
+
+def login_seller(user_id, seller_id, seller_name, seller_key=None):
+    """Sotuvchi tizimga kirganda chaqiriladi. Sessiyani qaytaradi."""
+    session = {'seller_id': seller_id, 'seller_name': seller_name,
+               'seller_key': seller_key, 'checked_at': time.monotonic()}
+    _seller_sessions[user_id] = session
+    return session
+
+def logout_seller(user_id):
+    _seller_sessions[user_id] = None
+
+
+async def _check_session(session):
+    """Sotuvchi hali Sotuvchilar jadvalida bormi va paroli o'zgarmaganmi.
+    Jadvalni o'qib bo'lmasa sessiya saqlanadi - vaqtinchalik xato hamma sotuvchini
+    tizimdan chiqarib yubormasligi uchun. Muvaffaqiyatli o'qishda sotuvchi topilmasa
+    sessiya bekor qilinadi."""
+    try:
+        # Sotuvchi qatori: [ID, Ism, Tuman, Telefon, Parol, Sana]
+        row = await sheets_async.find_seller_by_id(session['seller_id'])
+    except Exception as e:
+        logging.warning(f"Sotuvchi {session['seller_id']} sessiyasini tekshirishda xato (sessiya saqlandi): {e}")
+        return True
+    if row is None: return False
+    current_key = password_key(row[4]) if len(row) > 4 else None
+    if len(row) > 1: session['seller_name'] = row[1]
+    if session.get('seller_key') is None:
+        # Parol izi saqlanmagan eski sessiya: joriy parolga bog'lanadi
+        session['seller_key'] = current_key
+        return True
+    return current_key is not None and hmac.compare_digest(session['seller_key'], current_key)
+
+async def _seller_session(user_id, state):
+    if user_id in _seller_sessions:
+        session = _seller_sessions[user_id]
+    else:
+        session = None
+        if state is not None:
+            user_data = await state.get_data()
+            if user_data.get('seller_id'):
+                session = {'seller_id': user_data['seller_id'], 'seller_name': user_data.get('seller_name'),
+                           'seller_key': user_data.get('seller_key'), 'checked_at': None}
+        _seller_sessions[user_id] = session
+    if session is None: return None
+
+    if session['checked_at'] is None or time.monotonic() - session['checked_at'] >= SESSION_CHECK_INTERVAL:
+        had_key = session.get('seller_key') is not None
+        if not await _check_session(session):
+            logging.info(f"Foydalanuvchi {user_id} sessiyasi bekor qilindi: sotuvchi {session['seller_id']} "
+                         f"o'chirilgan yoki paroli o'zgargan.")
+            _seller_sessions[user_id] = None
+            if state is not None:
+                await state.clear()
+            return None
+        session['checked_at'] = time.monotonic()
+        if not had_key and state is not None:
+            await state.update_data(seller_key=session['seller_key'])
+    return session
+
+
+class RoleMiddleware(BaseMiddleware):
+    """Outer middleware: data['role'] (admin/seller/guest) va data['seller'] (sessiya yoki None)."""
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        seller = None
+        if user is None:
+            role = ROLE_GUEST
+        elif user.id in ADMIN_IDS:
+            role = ROLE_ADMIN
+        else:
+            seller = await _seller_session(user.id, data.get("state"))
+            role = ROLE_SELLER if seller else ROLE_GUEST
+        data["role"] = role
+        data["seller"] = seller
+        return await handler(event, data)
+
+
+class HasRole(BaseFilter):
+    """Handler yoki router faqat berilgan roldagi foydalanuvchilar uchun ishlaydi."""
+    def __init__(self, *roles):
+        self.roles = frozenset(roles)
+
+    async def __call__(self, event, role=ROLE_GUEST) -> bool:
+        return role in self.roles
+
+
+def setup_role_middleware(dp):
+    """Rol middlewareini barcha foydalanuvchi eventlariga ulaydi (ichki routerlar ham ko'radi)."""
+    middleware = RoleMiddleware()
+    for event_name in ("message", "callback_query", "inline_query"):
+        dp.observers[event_name].outer_middleware(middleware)
+    if not ADMIN_IDS:
+        logging.warning("ADMIN_IDS bo'sh: hech kim admin sifatida tanilmaydi.")
@@ -9,7 +9,12 @@ from aiogram.types import BotCommand
 # Handlerlar va API dan importlar
 from admin_handlers import setup_admin_handlers
 from seller_handlers import setup_seller_handlers # Sotuvchi handlerlarini qo'shing
-from sheets_api import setup_gspread_credentials 
+from sheets_api import setup_gspread_credentials
+from storage import get_backend 
+import sheets_async
+import metrics
+from fsm_storage import create_storage
+from roles import setup_role_middleware
 
 # Loglarni sozlash
 logging.basicConfig(level=logging.INFO, 
@@ -31,7 +36,8 @@ if not ADMIN_IDS:
 # --- II. BOT VA DISPATCHERNI YARATISH (Faqat bir marta) ---
 if BOT_TOKEN:
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    # FSM ombori restartdan keyin ham saqlanadi (sotuvchilar tizimdan chiqib ketmaydi)
+    dp = Dispatcher(storage=create_storage())
 else:
     # Agar token bo'lmasa, bot obyekti yaratilmaydi
     bot = None
@@ -41,6 +47,10 @@ else:
 if dp:
     setup_admin_handlers(dp)
     setup_seller_handlers(dp) # Sotuvchi handlerlari ulandi
+    # Foydalanuvchi rolini (admin/sotuvchi) har bir update uchun bir marta aniqlash
+    setup_role_middleware(dp)
+    # Handlerlar ishlash vaqti va bir vaqtdagi updatelar o'lchovlari
+    metrics.setup_dispatcher(dp)
 
 
 # --- IV. ASOSIY ISHGA TUSHIRISH FUNKSIYASI ---
@@ -58,6 +68,14 @@ async def main():
         return 
     
     logging.info("Credentials muvaffaqiyatli sozlandi.")
+
+    # Event loop kechikishini o'lchash va /metrics (METRICS_PORT berilsa, alohida portda)
+    metrics.start_event_loop_monitor()
+    metrics_runner = await metrics.start_metrics_server()
+
+    # 2. Omborni tayyorlash (Sheets: kesh va ID hisoblagichlari; SQLite: import va eksport)
+    # Sheetsni o'qiydi (sinxron): event loop bloklanmasligi uchun thread-pool da
+    await sheets_async.run_sync(get_backend().warm_up)
     logging.info(f"Bot ishga tushirildi (Admin IDs: {ADMIN_IDS_STR})")
     
     # Buyruqlarni sozlash
@@ -65,12 +83,22 @@ async def main():
         BotCommand(command="start", description="Botni ishga tushirish"),
         BotCommand(command="mahsulot", description="Admin: Mahsulotlar bo'limi"),
         BotCommand(command="sotuvchi", description="Admin: Sotuvchilar bo'limi"),
+        BotCommand(command="eksport", description="Admin: Stok/Savdolarni CSV qilib olish"),
         BotCommand(command="stok", description="Sotuvchi: Stokni ko'rish"), 
         BotCommand(command="savdo", description="Sotuvchi: Savdo kiritish"), 
     ])
 
     # Long Polling rejimida ishga tushirish
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Navbatdagi FSM yozuvlarini saqlash
+        await dp.storage.close()
+        # Navbatdagi Stok/Savdolar yozuvlarini yozish, fon ishlarini (eksport, ixchamlash)
+        # to'xtatish va Sheets thread-pool ni yopish (server.py dagi on_shutdown kabi)
+        sheets_async.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+# scheduler.py
+# Google Sheets API so'rovlarining markaziy navbati (kvotani hisobga oladi).
+# Google daqiqasiga o'qish va yozish so'rovlari sonini cheklaydi. Har bir so'rov shu
+# yerdan o'tadi:
+#   - o'qish va yozish uchun alohida token bucket (daqiqalik kvotaga teng tezlik)
+#   - ustuvorlik: sotuvchining savdo yozuvi > oddiy so'rovlar > admin ro'yxatlari > fon yangilashlari
+#   - 429 (kvota tugadi) javobida xato qaytarish o'rniga eksponensial kutish va qayta urinish
+# Ustuvorlik contextvars orqali beriladi (sheets_async uni thread ichiga ham o'tkazadi).
+
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# --- ENV VARIABLES dan yuklash ---
+# Daqiqasiga ruxsat etilgan so'rovlar (0 - cheklovsiz). Google standarti: foydalanuvchi uchun 60
+SHEETS_READ_QUOTA = int(os.environ.get('SHEETS_READ_QUOTA', 60))
+SHEETS_WRITE_QUOTA = int(os.environ.get('SHEETS_WRITE_QUOTA', 60))
+# Bucket sig'imi: bo'sh turgandan keyin ketma-ket yuborish mumkin bo'lgan so'rovlar
+SHEETS_QUOTA_BURST = int(os.environ.get('SHEETS_QUOTA_BURST', 10))
+# 429 da qayta urinishlar soni va kutish chegaralari (soniya)
+SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES', 6))
+SHEETS_BACKOFF_BASE = float(os.environ.get('SHEETS_BACKOFF_BASE', 1))
+SHEETS_BACKOFF_MAX = float(os.environ.get('SHEETS_BACKOFF_MAX', 64))
+
+# Ustuvorlik darajalari (kichik son - oldinroq)
+PRIORITY_SALE = 0        # sotuvchining savdo yozuvi
+PRIORITY_INTERACTIVE = 1 # foydalanuvchi kutayotgan boshqa so'rovlar
+PRIORITY_ADMIN = 2       # admin ro'yxatlari va hisobotlari
+PRIORITY_BACKGROUND = 3  # fon yangilashlari, eksport, oldindan yuklash
+
+READ_CALLS = {"open_by_key", "worksheet", "worksheets", "values_batch_get"}
+WRITE_CALLS = {"add_worksheet", "append_row", "append_rows", "batch_update"}
+
+# Qayta urinish mumkin bo'lgan HTTP kodlar. Yozuvlar faqat 429 da qayta yuboriladi:
+# 5xx da so'rov bajarilgan bo'lishi mumkin va qator ikki marta qo'shilib qoladi.
+_RETRY_READ_STATUS = {429, 500, 502, 503, 504}
+_RETRY_WRITE_STATUS = {429}
+
+_priority = contextvars.ContextVar("sheets_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Shu blok ichidagi (va undan chaqirilgan) Sheets so'rovlarining ustuvorligi."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority():
+    return _priority.get()
+
+
+class _PriorityBucket:
+    """Ustuvorlik navbatli token bucket. Token bo'shaganda navbatdagi eng ustuvor
+    (teng bo'lsa eng oldin kelgan) so'rov o'tkaziladi."""
+
+    def __init__(self, kind, per_minute, burst):
+        self.kind = kind
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = [] # [(ustuvorlik, tartib raqami), ...] - heap
+        self._sequence = itertools.count()
+
+    def _refill(self, now):
+        if self.rate <= 0:
+            # Cheklovsiz: faqat 429 dan keyingi to'xtash (pause) amal qiladi
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, level):
+        """Token olinguncha kutadi. Kutilgan vaqtni (soniya) qaytaradi."""
+        if self.rate <= 0 and time.monotonic() >= self.paused_until: return 0.0
+        started = time.monotonic()
+        ticket = (level, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            metrics.scheduler_waiting.set(len(self._waiting), kind=self.kind)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] == ticket:
+                        if now >= self.paused_until and self.tokens >= 1:
+                            heapq.heappop(self._waiting)
+                            self.tokens -= 1
+                            return now - started
+                        delay = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 0)
+                    else:
+                        delay = None # Navbat boshi o'zgarganda uyg'otiladi
+                    self._cond.wait(delay)
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                metrics.scheduler_waiting.set(len(self._waiting), kind=self.kind)
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        """429 dan keyin hamma so'rovlarni seconds davomida to'xtatib turadi."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+            self._cond.notify_all()
+
+
+_buckets = {}
+
+def configure(read_quota=SHEETS_READ_QUOTA, write_quota=SHEETS_WRITE_QUOTA, burst=SHEETS_QUOTA_BURST):
+    """Kvota chegaralarini o'rnatadi (daqiqasiga so'rovlar, 0 - cheklovsiz).
+    Ishga tushganda ENV qiymatlari bilan chaqiriladi; benchmark.py boshqa qiymat berishi mumkin."""
+    _buckets["read"] = _PriorityBucket("read", read_quota, burst)
+    _buckets["write"] = _PriorityBucket("write", write_quota, burst)
+
+configure()
+
+def _status_code(error):
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+def _backoff(attempt):
+    """Eksponensial kutish (tasodifiy qo'shimcha bilan, hamma bir vaqtda qaytmasligi uchun)."""
+    delay = min(SHEETS_BACKOFF_MAX, SHEETS_BACKOFF_BASE * 2 ** attempt)
+    return delay + random.uniform(0, delay / 2)
+
+def call(name, func, *args, **kwargs):
+    """Google API so'rovini kvota navbati orqali bajaradi.
+    name: so'rov turi ('values_batch_get', 'append_rows', ...), u o'qish/yozishni belgilaydi.
+    429 (va o'qishlarda 5xx) bo'lsa kutib qayta uradi; urinishlar tugasa xatoni ko'taradi."""
+    kind = "write" if name in WRITE_CALLS else "read"
+    retry_status = _RETRY_WRITE_STATUS if kind == "write" else _RETRY_READ_STATUS
+    bucket = _buckets[kind]
+    level = _priority.get()
+
+    attempt = 0
+    while True:
+        waited = bucket.acquire(level)
+        metrics.scheduler_wait_seconds.observe(waited, kind=kind, priority=str(level))
+        try:
+            with metrics.track_api_call(name):
+                return func(*args, **kwargs)
+        except Exception as e:
+            status = _status_code(e)
+            if status not in retry_status or attempt >= SHEETS_MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            attempt += 1
+            metrics.google_api_retries.inc(call=name, status=str(status))
+            logging.warning(f"Sheets '{name}' so'rovi {status} qaytardi, {delay:.1f} soniyadan keyin "
+                            f"qayta urinish ({attempt}/{SHEETS_MAX_RETRIES}).")
+            if status == 429:
+                # Kvota hamma uchun umumiy: boshqa so'rovlar ham kutib tursin
+                bucket.pause(delay)
+            else:
+                time.sleep(delay)
@@ -4,8 +4,15 @@ from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-import sheets_api
+import sheets_async
+import roles
+from roles import HasRole, ROLE_ADMIN, ROLE_SELLER
 import logging
+import os
+
+# Inline qidiruv (@bot <nom>) sozlamalari
+INLINE_RESULTS_LIMIT = int(os.environ.get('INLINE_RESULTS_LIMIT', 20)) # Telegram ko'pi bilan 50 ta
+INLINE_CACHE_TIME = int(os.environ.get('INLINE_CACHE_TIME', 60)) # Telegram natijani shuncha soniya eslab qoladi
 
 # Routerni e'lon qilish
 router = Router()
@@ -23,32 +30,18 @@ class SaleForm(StatesGroup):
     waiting_for_product_name = State() # Sotilgan mahsulot nomi
     waiting_for_quantity = State()     # Sotilgan mahsulot soni
 
-# ==============================================================================
-# II. YORDAMCHI FUNKSIYALAR
-# ==============================================================================
-
-async def is_seller_authenticated(user_id, state: FSMContext) -> bool:
-    """Foydalanuvchi sotuvchi sifatida tizimga kirganligini tekshiradi."""
-    user_data = await state.get_data()
-    # FSMContextda 'seller_id' mavjud bo'lsa, tizimga kirgan hisoblanadi.
-    if user_data.get('seller_id'):
-        return True
-    return False
-
-
 # ==============================================================================
 # III. ASOSIY NAVIGATSIYA (START) BO'LIMI
 # ==============================================================================
 
 @router.message(CommandStart())
-async def command_start_handler(message: types.Message, state: FSMContext):
-    """/start buyrug'i uchun ishlov beruvchi (Birlamchi kirish)."""
+async def command_start_handler(message: types.Message, state: FSMContext, seller=None):
+    """/start buyrug'i uchun ishlov beruvchi (Birlamchi kirish).
+    seller - RoleMiddleware bergan sotuvchi sessiyasi (tizimga kirmagan bo'lsa None)."""
     
     # 1. Tizimga kirilganmi?
-    if await is_seller_authenticated(message.from_user.id, state):
-        
-        user_data = await state.get_data()
-        seller_name = user_data.get('seller_name', "Sotuvchi")
+    if seller:
+        seller_name = seller.get('seller_name') or "Sotuvchi"
         
         keyboard = types.ReplyKeyboardMarkup(
             keyboard=[
@@ -81,19 +74,21 @@ async def process_password(message: types.Message, state: FSMContext):
     password = message.text.strip()
     
     # Parolni tekshirish uchun sheets_api.py dagi funksiyadan foydalanamiz
-    seller_data = sheets_api.get_seller_by_password(password)
+    seller_data = await sheets_async.get_seller_by_password(password)
     
     if seller_data:
         # Tizimga muvaffaqiyatli kirish
         seller_id = seller_data[0]
-        seller_name = seller_data[2]
+        seller_name = seller_data[1] # [ID, Ism, Tuman, Telefon, Parol, Sana]
         
-        # FSM ga ma'lumotlarni saqlash
-        await state.update_data(seller_id=seller_id, seller_name=seller_name)
+        # FSM ga ma'lumotlarni saqlash (holat tugaydi, lekin seller_id qoladi) va rol keshini yangilash
+        seller_key = roles.password_key(password) # Parol o'zgarsa sessiya bekor bo'lishi uchun
+        await state.update_data(seller_id=seller_id, seller_name=seller_name, seller_key=seller_key)
+        await state.set_state(None)
+        seller = roles.login_seller(message.from_user.id, seller_id, seller_name, seller_key)
         
         # Asosiy menyuni chiqarish
-        await state.clear()
-        await command_start_handler(message, state) # Menyu uchun start handlerga qaytish
+        await command_start_handler(message, state, seller) # Menyu uchun start handlerga qaytish
         
     else:
         await message.answer("❌ Parol noto'g'ri. Iltimos, qayta urining yoki adminga murojaat qiling.")
@@ -104,32 +99,25 @@ async def process_password(message: types.Message, state: FSMContext):
 # V. STOK MANTIQI
 # ==============================================================================
 
-@router.message(F.text == "🛍️ Stokni ko'rish")
-async def view_seller_stock(message: types.Message, state: FSMContext):
+@router.message(F.text == "🛍️ Stokni ko'rish", HasRole(ROLE_SELLER))
+async def view_seller_stock(message: types.Message, seller: dict):
     """Sotuvchining o'zidagi mavjud tovarlar ro'yxatini chiqarish."""
-    if not await is_seller_authenticated(message.from_user.id, state):
-        await message.answer("Iltimos, avval tizimga kiring.")
-        return
-        
-    user_data = await state.get_data()
-    seller_id = user_data.get('seller_id')
-    seller_name = user_data.get('seller_name')
-    
-    # Sheets API orqali sotuvchining stokini olish (Admin botida ishlatgan funksiya)
-    stock_data = sheets_api.get_seller_stock(seller_id)
+    seller_id = seller['seller_id']
+    seller_name = seller['seller_name']
     
+    # Sheets API orqali sotuvchining stokini tayyor ko'rinishda olish (Admin botida ishlatgan funksiya)
+    stock_view = await sheets_async.get_seller_stock_view(seller_id)
+
     response_text = f"🛍️ **{seller_name}** dagi Mahsulotlar Ro'yxati:\n\n"
-    
-    if stock_data:
-        # stock_data = {product_id: (quantity, price), ...}
-        for product_id, (quantity, price) in stock_data.items():
-            
+
+    if stock_view and stock_view['items']:
+        # stock_view['items'] = [(product_name, quantity, price), ...]
+        for product_name, quantity, price in stock_view['items']:
+
             # Agar mahsulot miqdori 0 yoki undan kam bo'lsa, ko'rsatmaslik
             if int(quantity) <= 0:
                 continue
-                
-            product_name = sheets_api.get_product_name_by_id(product_id)
-            
+
             response_text += (f"• *{product_name}*: **{quantity}** dona (@ {price} so'm)\n")
         
         await message.answer(response_text, parse_mode="Markdown")
@@ -154,30 +142,33 @@ def setup_seller_handlers(dp: Dispatcher):
 # VI. SAVDO KIRITISH MANTIQI (SaleForm FSM)
 # ==============================================================================
 
-@router.message(F.text == "🛒 Savdo kiritish")
+@router.message(F.text == "🛒 Savdo kiritish", HasRole(ROLE_SELLER))
 async def start_sale_entry(message: types.Message, state: FSMContext):
     """Savdo kiritish jarayonini boshlash."""
-    if not await is_seller_authenticated(message.from_user.id, state):
-        await message.answer("Iltimos, avval tizimga kiring.")
-        return
-        
-    await message.answer("Sotilgan **Mahsulot Nomini** kiriting:")
+    await message.answer("Sotilgan **Mahsulot Nomini** kiriting yoki qidiruvdan tanlang:",
+                         reply_markup=product_search_keyboard())
     await state.set_state(SaleForm.waiting_for_product_name)
 
 
-@router.message(SaleForm.waiting_for_product_name)
-async def process_sale_product_name(message: types.Message, state: FSMContext):
-    """Sotilgan mahsulot nomini qabul qilish."""
-    product_name = message.text.strip()
-    
-    # Mahsulotni Sheets API da tekshirish (narxini olish uchun)
-    product_data = sheets_api.get_product_by_name(product_name)
-    
-    if not product_data:
-        await message.answer(f"❌ '{product_name}' nomli mahsulot bazada topilmadi. Nomni to'g'ri kiritganingizga ishonch hosil qiling:")
-        return
+def product_search_keyboard():
+    """Chat maydoniga "@bot " ni qo'yib, inline qidiruvni ochuvchi tugma."""
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text="🔎 Mahsulotni qidirish", switch_inline_query_current_chat="")]
+    ])
 
+
+def product_suggestions_keyboard(products, prefix):
+    """O'xshash mahsulotlar tugmalari. callback_data: "{prefix}:{mahsulot ID}"."""
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text=f"{row[1]} ({row[2]} so'm)", callback_data=f"{prefix}:{row[0]}")]
+        for row in products if len(row) >= 3
+    ])
+
+
+async def select_sale_product(message: types.Message, state: FSMContext, product_data):
+    """Mahsulot aniqlangach ([ID, Nomi, Narxi]) miqdor so'rash bosqichiga o'tish."""
     product_id = product_data[0]
+    product_name = product_data[1]
     product_price = product_data[2] # Mahsulotning birlik narxi
     
     # Ma'lumotlarni saqlash
@@ -189,8 +180,43 @@ async def process_sale_product_name(message: types.Message, state: FSMContext):
     await state.set_state(SaleForm.waiting_for_quantity)
 
 
-@router.message(SaleForm.waiting_for_quantity)
-async def process_sale_quantity(message: types.Message, state: FSMContext):
+@router.message(SaleForm.waiting_for_product_name)
+async def process_sale_product_name(message: types.Message, state: FSMContext):
+    """Sotilgan mahsulot nomini qabul qilish."""
+    product_name = message.text.strip()
+    
+    # Mahsulotni Sheets API da tekshirish (narxini olish uchun)
+    product_data = await sheets_async.get_product_by_name(product_name)
+    
+    if not product_data:
+        # Nom xato yozilgan bo'lishi mumkin: o'xshash nomlarni bir bosishda tanlash uchun taklif qilish
+        suggestions = await sheets_async.find_similar_products(product_name)
+        if suggestions:
+            await message.answer(f"❌ '{product_name}' nomli mahsulot topilmadi. Shulardan birini tanlang "
+                                 f"yoki nomni qayta kiriting:",
+                                 reply_markup=product_suggestions_keyboard(suggestions, "sale_product"))
+        else:
+            await message.answer(f"❌ '{product_name}' nomli mahsulot bazada topilmadi. Nomni to'g'ri kiritganingizga ishonch hosil qiling:")
+        return
+
+    await select_sale_product(message, state, product_data)
+
+
+@router.callback_query(SaleForm.waiting_for_product_name, F.data.startswith("sale_product:"))
+async def choose_sale_product(callback: types.CallbackQuery, state: FSMContext):
+    """Taklif qilingan mahsulotlardan biri tanlanganda."""
+    product_data = await sheets_async.get_product_by_id(callback.data.split(":")[1])
+    if not product_data:
+        await callback.answer("Mahsulot topilmadi.", show_alert=True)
+        return
+
+    await callback.message.edit_reply_markup(reply_markup=None) # Tugmalar qayta bosilmasligi uchun
+    await select_sale_product(callback.message, state, product_data)
+    await callback.answer()
+
+
+@router.message(SaleForm.waiting_for_quantity, HasRole(ROLE_SELLER))
+async def process_sale_quantity(message: types.Message, state: FSMContext, seller: dict):
     """Sotilgan miqdorni qabul qilish va savdoni Sheetsga yozish."""
     try:
         quantity = int(message.text)
@@ -200,45 +226,76 @@ async def process_sale_quantity(message: types.Message, state: FSMContext):
         return
         
     user_data = await state.get_data()
-    seller_id = user_data.get('seller_id')
+    seller_id = seller['seller_id']
     product_id = user_data.get('current_product_id')
     product_name = user_data.get('current_product_name')
     price = user_data.get('current_product_price')
     
-    # 1. Savdoni "SALES" varag'iga yozish
-    if sheets_api.add_sale(seller_id, product_id, quantity, price):
-        
-        # 2. Stokdan ushbu miqdorni ayirib tashlash (Stok varag'iga manfiy qiymat yoziladi)
-        # add_stock_to_seller funksiyasidan foydalanamiz, lekin manfiy miqdorni beramiz.
-        negative_quantity = -quantity
-        
-        if sheets_api.add_stock_to_seller(seller_id, product_id, negative_quantity, price):
-            total_sale = quantity * float(price)
-            await message.answer(f"✅ Savdo muvaffaqiyatli kiritildi!\n"
-                                 f"Tovar: **{product_name}**\n"
-                                 f"Sotildi: **{quantity}** dona\n"
-                                 f"Jami qiymat: **{total_sale:,.2f}** so'm", parse_mode="Markdown")
-        else:
-            await message.answer("⚠️ Savdo yozildi, lekin stokdan ayirishda xato yuz berdi. Adminga xabar bering.")
-            
+    # Savdoni "SALES" varag'iga yozish va Stokdan ayirish (manfiy qator) bitta so'rovda:
+    # ikkala yozuv birga muvaffaqiyatli bo'ladi yoki birga bekor qilinadi.
+    if await sheets_async.record_sale(seller_id, product_id, quantity, price):
+        total_sale = quantity * float(price)
+        await message.answer(f"✅ Savdo muvaffaqiyatli kiritildi!\n"
+                             f"Tovar: **{product_name}**\n"
+                             f"Sotildi: **{quantity}** dona\n"
+                             f"Jami qiymat: **{total_sale:,.2f}** so'm", parse_mode="Markdown")
     else:
         await message.answer("⚠️ Savdoni Sheetsga yozishda xato yuz berdi. Jarayon bekor qilindi.")
 
-    await state.clear()
-    await command_start_handler(message, state) # Asosiy menyuga qaytish
+    # Savdo holatini tugatish; tizimga kirish ma'lumotlari (seller_id) saqlanib qoladi
+    await state.set_state(None)
+    await state.set_data({'seller_id': seller_id, 'seller_name': seller['seller_name'],
+                          'seller_key': seller.get('seller_key')})
+    await command_start_handler(message, state, seller) # Asosiy menyuga qaytish
 
 
 # ==============================================================================
-# VII. CHIQISH MANTIQI (LOGOUT)
+# VII. INLINE QIDIRUV (@bot <nom>)
+# ==============================================================================
+
+@router.inline_query(HasRole(ROLE_SELLER, ROLE_ADMIN))
+async def product_inline_search(inline_query: types.InlineQuery):
+    """Mahsulot nomini avtoto'ldirish (xotiradagi prefiks indeksidan, narxi bilan).
+    Tanlangan natija mahsulot nomini chatga yuboradi: u nom kutilayotgan bosqichda
+    (savdo yoki tovar berish) aniq moslik bo'lib, to'g'ridan-to'g'ri miqdor so'raladi."""
+    products = await sheets_async.complete_products(inline_query.query, INLINE_RESULTS_LIMIT)
+    results = [
+        types.InlineQueryResultArticle(
+            id=str(row[0]),
+            title=row[1],
+            description=f"{row[2]} so'm",
+            input_message_content=types.InputTextMessageContent(message_text=row[1]),
+        )
+        for row in products if len(row) >= 3
+    ]
+    # Telegram keshi foydalanuvchiga bog'langan: mehmonlar sotuvchilarning natijalarini ko'rmaydi
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+
+@router.inline_query()
+async def guest_inline_search(inline_query: types.InlineQuery):
+    """Tizimga kirmaganlar uchun bo'sh javob."""
+    await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+
+# ==============================================================================
+# VIII. CHIQISH MANTIQI (LOGOUT)
 # ==============================================================================
 
 @router.message(F.text == "🚪 Chiqish")
 async def handle_logout(message: types.Message, state: FSMContext):
     """Sotuvchini tizimdan chiqarish."""
     await state.clear()
+    roles.logout_seller(message.from_user.id)
     
     # Maxfiy (ReplyKeyboardRemove) klaviaturani yuborish
     remove_keyboard = types.ReplyKeyboardRemove()
     
     await message.answer("Siz tizimdan muvaffaqiyatli chiqdingiz. Qayta kirish uchun /start buyrug'ini yuboring.",
                          reply_markup=remove_keyboard)
+
+
+@router.message(F.text.in_({"🛍️ Stokni ko'rish", "🛒 Savdo kiritish"}))
+async def require_login(message: types.Message):
+    """Tizimga kirmagan foydalanuvchi sotuvchi menyusidan foydalanmoqchi bo'lsa."""
+    await message.answer("Iltimos, avval tizimga kiring.")
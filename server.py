@@ -15,6 +15,11 @@ from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_applicati
 from admin_handlers import setup_admin_handlers
 from seller_handlers import setup_seller_handlers
 from sheets_api import setup_gspread_credentials
+from storage import get_backend
+from fsm_storage import create_storage
+from roles import setup_role_middleware
+import sheets_async
+import metrics
 
 # Loglarni sozlash
 logging.basicConfig(level=logging.INFO,
@@ -46,7 +51,8 @@ if not WEBHOOK_SECRET:
 # --- II. BOT VA DISPATCHERNI YARATISH ---
 if BOT_TOKEN:
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    # FSM ombori restartdan keyin ham saqlanadi (sotuvchilar tizimdan chiqib ketmaydi)
+    dp = Dispatcher(storage=create_storage())
 else:
     bot = None
     dp = None
@@ -55,6 +61,10 @@ else:
 if dp:
     setup_admin_handlers(dp)
     setup_seller_handlers(dp)
+    # Foydalanuvchi rolini (admin/sotuvchi) har bir update uchun bir marta aniqlash
+    setup_role_middleware(dp)
+    # Handlerlar ishlash vaqti va bir vaqtdagi updatelar o'lchovlari
+    metrics.setup_dispatcher(dp)
 
 
 # --- IV. WEBHOOK STARTUP VA SHUTDOWN FUNKSIYALARI ---
@@ -68,6 +78,13 @@ async def on_startup(bot: Bot):
         
     logging.info("Credentials muvaffaqiyatli sozlandi.")
 
+    # Event loop kechikishini o'lchashni boshlash (/metrics uchun)
+    metrics.start_event_loop_monitor()
+
+    # Omborni tayyorlash (Sheets: kesh va ID hisoblagichlari; SQLite: import va eksport)
+    # Sheetsni o'qiydi (sinxron): event loop bloklanmasligi uchun thread-pool da
+    await sheets_async.run_sync(get_backend().warm_up)
+
     # 2. Telegramga Webhook URLni o'rnatish
     webhook_url = f"{BASE_WEBHOOK_URL}{WEBHOOK_PATH}"
     
@@ -84,6 +101,10 @@ async def on_shutdown(bot: Bot):
     # Webhookni o'chirish
     await bot.delete_webhook()
     logging.info("Webhook o'chirildi.")
+    # Navbatdagi FSM yozuvlarini saqlash
+    await dp.storage.close()
+    # Sheets thread-pool ni yopish
+    sheets_async.shutdown()
 
 
 # --- V. ASOSIY WEBHOOK ISHGA TUSHIRISH FUNKSIYASI ---
@@ -103,6 +124,7 @@ async def main():
         BotCommand(command="start", description="Botni ishga tushirish"),
         BotCommand(command="mahsulot", description="Admin: Mahsulotlar bo'limi"),
         BotCommand(command="sotuvchi", description="Admin: Sotuvchilar bo'limi"),
+        BotCommand(command="eksport", description="Admin: Stok/Savdolarni CSV qilib olish"),
         BotCommand(command="stok", description="Sotuvchi: Stokni ko'rish"), 
         BotCommand(command="savdo", description="Sotuvchi: Savdo kiritish"), 
     ])
@@ -120,6 +142,11 @@ async def main():
     # Webhook yo'lini o'rnatish 
     webhook_requests_handler.register(app, path=WEBHOOK_PATH)
 
+    # O'lchovlar: GET /metrics (Prometheus formatida, METRICS_TOKEN bilan;
+    # METRICS_PORT berilsa, alohida portda ham)
+    metrics.setup_application(app)
+    await metrics.start_metrics_server()
+
     # Dispatcher va Botni app'ga ulash 
     setup_application(app, dp, bot=bot)
     
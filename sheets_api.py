@@ -1,9 +1,21 @@
 import gspread
+from gspread.utils import absolute_range_name
 import logging
-from datetime import datetime
-import itertools
+from datetime import datetime, date, timedelta
+import bisect
 import os
 import json 
+import re
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import analytics
+import fuzzy
+import metrics
+import paging
+import scheduler
 
 # Logging sozlamalari
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,69 +27,1085 @@ GSPREAD_CREDENTIALS_JSON = os.environ.get('GSPREAD_CREDENTIALS')
 if not SHEET_NAME:
     logging.error("SHEET_NAME atrof-muhit o'zgaruvchisi topilmadi.")
 
+# Jadval keshi sozlamalari: necha soniya yangi hisoblanadi va eskirganda
+# eski nusxani berib, fonda yangilash (stale-while-revalidate) yoqilganmi
+TABLE_CACHE_TTL = float(os.environ.get('TABLE_CACHE_TTL', 300))
+TABLE_CACHE_SWR = os.environ.get('TABLE_CACHE_SWR', '1') == '1'
+
+# Jurnal yozuvlarini to'plash: eng ko'p kutish (soniya), bitta so'rovdagi eng ko'p qator
+# va chaqiruvchining yozilishni kutish muddati
+LEDGER_FLUSH_DELAY = float(os.environ.get('LEDGER_FLUSH_DELAY', 0.2))
+LEDGER_BATCH_SIZE = int(os.environ.get('LEDGER_BATCH_SIZE', 50))
+LEDGER_WRITE_TIMEOUT = float(os.environ.get('LEDGER_WRITE_TIMEOUT', 30))
+# Stok va Savdolarni davrlarga bo'lish: 'month' - har oy alohida varaq (Savdolar_2026_10),
+# 'none' - avvalgidek bitta varaq
+LEDGER_PARTITIONS = os.environ.get('LEDGER_PARTITIONS', 'month')
+
+# Jurnaldan hisoblangan holatlar (qoldiqlar) necha soniyada varaqdan yangilanadi (faqat
+# yangi qo'shilgan qatorlar o'qiladi) va necha soniyada bir marta to'liq qayta o'qiladi
+LEDGER_VIEW_TTL = float(os.environ.get('LEDGER_VIEW_TTL', 60))
+LEDGER_FULL_RELOAD_INTERVAL = float(os.environ.get('LEDGER_FULL_RELOAD_INTERVAL', 3600))
+
 # Sheets nomlari
 SHEET_NAMES = {
     "SELLERS": "Sotuvchilar",
     "PRODUCTS": "Mahsulotlar",
     "STOCK": "Stok",
-    "SALES": "Savdolar"
+    "SALES": "Savdolar",
+    "STOCK_ARCHIVE": "Stok_arxiv" # ixchamlangan (qoldiqqa yig'ilgan) Stok qatorlari
 }
 
-# --- YORDAMCHI FUNKSIYA: JSON FAYLINI YARATISH ---
+# Har bir varaqning bot foydalanadigan ustunlari (faqat shu oraliq o'qiladi)
+SHEET_COLUMNS = {
+    SHEET_NAMES["SELLERS"]: "A:F",  # ID, Ism, Tuman, Telefon, Parol, Sana
+    SHEET_NAMES["PRODUCTS"]: "A:C", # ID, Mahsulot Nomi, Narxi
+    SHEET_NAMES["STOCK"]: "A:G",    # ID, Sotuvchi Ismi, Mahsulot Nomi, Kilogrammi, Narxi, Jami Narx, Sana
+    SHEET_NAMES["SALES"]: "A:G",    # ID, Sotuvchi, Mahsulot ID, Kilogrammi, Narxi, Jami Tushum, Sana
+    SHEET_NAMES["STOCK_ARCHIVE"]: "A:G", # Stok bilan bir xil
+}
+
+# --- YORDAMCHI FUNKSIYA: CREDENTIALSNI TEKSHIRISH ---
 def setup_gspread_credentials():
-    """GSPREAD_CREDENTIALS Env Variablesidan JSON faylini yaratadi."""
+    """Credentials mavjudligini tekshiradi va Sheets ulanishini oldindan ochib qo'yadi.
+    GSPREAD_CREDENTIALS JSON xotirada o'qiladi, diskka yozilmaydi."""
     if GSPREAD_CREDENTIALS_JSON:
         try:
-            # Agar fayl nomi kerak bo'lsa, 'service_account.json' ni ishlatish
-            file_path = 'service_account.json'
-            
-            # JSON stringni faylga yozish
-            with open(file_path, 'w') as f:
-                f.write(GSPREAD_CREDENTIALS_JSON)
-                
-            logging.info("service_account.json fayli ENV orqali yaratildi.")
-            return True
-        except Exception as e:
-            logging.error(f"Credentials JSONni yozishda xato: {e}")
+            json.loads(GSPREAD_CREDENTIALS_JSON)
+        except ValueError as e:
+            logging.error(f"Credentials JSONni o'qishda xato: {e}")
             return False
-    
-    if not os.path.exists('service_account.json'):
+    elif not os.path.exists('service_account.json'):
         logging.warning("GSPREAD_CREDENTIALS ENV va service_account.json fayli topilmadi.")
         return False
+
+    # Ulanishni oldindan ochish (birinchi foydalanuvchi kutib qolmasligi uchun)
+    get_sheets_client()
     return True
 
 # ==============================================================================
 # I. UMUMIY YORDAMCHI FUNKSIYALAR
 # ==============================================================================
 
+# Jarayon davomida bitta marta yaratiladigan ulanish va varaqlar keshi.
+# Har bir chaqiruvda qayta OAuth va open_by_key qilmaslik uchun.
+_client_lock = threading.Lock()
+_spreadsheet = None
+_worksheet_cache = {}
+
+def _load_gspread_client():
+    """gspread klientini yaratadi: avval ENV dagi JSONdan (xotirada), bo'lmasa fayldan."""
+    if GSPREAD_CREDENTIALS_JSON:
+        try:
+            return gspread.service_account_from_dict(json.loads(GSPREAD_CREDENTIALS_JSON))
+        except ValueError as e:
+            logging.error(f"GSPREAD_CREDENTIALS JSONni o'qishda xato: {e}")
+            return None
+
+    if not os.path.exists('service_account.json'):
+        logging.warning("GSPREAD_CREDENTIALS ENV va service_account.json fayli topilmadi.")
+        return None
+    return gspread.service_account(filename='service_account.json')
+
 def get_sheets_client():
-    """Google Sheetsga ulanish. Agar xato bo'lsa None qaytaradi."""
+    """Google Sheetsga ulanish (bir marta, keyin keshdan). Agar xato bo'lsa None qaytaradi."""
+    global _spreadsheet
+    if _spreadsheet is not None: return _spreadsheet
     if not SHEET_NAME: return None
-    
-    # 1. Credentialsni o'rnatishni bir marta tekshirish 
-    if not setup_gspread_credentials():
-        return None
-        
-    try:
-        # Endi gspread.service_account 'service_account.json' ni topadi
-        gc = gspread.service_account(filename='service_account.json')
-        return gc.open_by_key(SHEET_NAME) 
-    except Exception as e:
-        logging.error(f"Google Sheetsga ulanishda xato: {e}")
-        return None
+
+    with _client_lock:
+        if _spreadsheet is not None: return _spreadsheet
+        try:
+            gc = _load_gspread_client()
+            if gc is None: return None
+            _spreadsheet = scheduler.call("open_by_key", gc.open_by_key, SHEET_NAME)
+            return _spreadsheet
+        except Exception as e:
+            logging.error(f"Google Sheetsga ulanishda xato: {e}")
+            return None
+
+def reset_sheets_client():
+    """Keshdagi ulanish va varaqlarni tashlab yuboradi (keyingi chaqiruvda qayta ulanadi)."""
+    global _spreadsheet
+    with _client_lock:
+        _spreadsheet = None
+        _worksheet_cache.clear()
+
+def use_spreadsheet(spreadsheet):
+    """Boshqa jadval obyektiga o'tadi (masalan, fake_sheets.FakeSpreadsheet: sinov va o'lchovlar uchun).
+    Navbatdagi yozuvlar eski jadvalga yoziladi, keyin barcha keshlar va holatlar tozalanadi."""
+    global _spreadsheet
+    flush_ledgers()
+    with _client_lock:
+        _spreadsheet = spreadsheet
+        _worksheet_cache.clear()
+    invalidate_table_cache()
+    for allocator in _id_allocators.values():
+        with allocator._lock:
+            allocator._next_id = None
+    for views in _ledger_views.values():
+        for view in views:
+            with view._lock:
+                view._loaded_at = None
+    with _partition_lock:
+        _partition_periods.clear()
+        _legacy_ledgers.clear()
+
+def get_worksheet(spreadsheet, sheet_name):
+    """Varaq (Worksheet) obyektini keshdan oladi, bo'lmasa bir marta so'raydi.
+    Topilmasa gspread.WorksheetNotFound ko'tariladi."""
+    worksheet = _worksheet_cache.get(sheet_name)
+    if worksheet is None:
+        worksheet = scheduler.call("worksheet", spreadsheet.worksheet, sheet_name)
+        _worksheet_cache[sheet_name] = worksheet
+    return worksheet
         
 def get_or_create_worksheet(spreadsheet, sheet_name, header_row):
     """Varaqni (worksheet) topadi, topilmasa, uni sarlavha qatori bilan yaratadi."""
     try:
-        worksheet = spreadsheet.worksheet(sheet_name)
+        worksheet = get_worksheet(spreadsheet, sheet_name)
     except gspread.WorksheetNotFound:
         # Yangi varaq yaratish
-        worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=100, cols=20)
+        worksheet = scheduler.call("add_worksheet", spreadsheet.add_worksheet, title=sheet_name, rows=100, cols=20)
         # Sarlavhani birinchi qatorga yozish
-        worksheet.append_row(header_row)
+        scheduler.call("append_row", worksheet.append_row, header_row)
+        _worksheet_cache[sheet_name] = worksheet
     return worksheet
 
 
+# --- JADVAL KESHI (Sotuvchilar, Mahsulotlar) ---
+# Har bir varaqning qatorlari (sarlavhasiz) xotirada saqlanadi. Botning o'z yozuvlari
+# keshni darhol yangilaydi, tashqi o'zgarishlar esa TTL tugagach o'qiladi.
+
+def _normalize_name(name):
+    """Mahsulot nomini solishtirish uchun bir xil ko'rinishga keltiradi (fuzzy.normalize)."""
+    return fuzzy.normalize(name)
+
+# Har bir varaq uchun xeshli indekslar: indeks nomi -> qatordan kalit oluvchi funksiya.
+# Sotuvchi qatori: [ID, Ism, Tuman, Telefon, Parol, Sana]; Mahsulot qatori: [ID, Nomi, Narxi]
+_TABLE_INDEXES = {
+    SHEET_NAMES["SELLERS"]: {
+        "id": lambda row: row[0] if row else None,
+        "password": lambda row: row[4] if len(row) >= 5 else None,
+    },
+    SHEET_NAMES["PRODUCTS"]: {
+        "id": lambda row: row[0] if row else None,
+        "name": lambda row: _normalize_name(row[1]) if len(row) >= 2 else None,
+    },
+}
+
+def _name_sort_key(row):
+    """Ro'yxatlar nom bo'yicha (katta-kichik harfsiz), bir xil nomlar ID bo'yicha saralanadi."""
+    row_id = str(row[0]).strip()
+    return (_normalize_name(str(row[1])) if len(row) > 1 else "",
+            int(row_id) if row_id.isdigit() else 0, row_id)
+
+class _CachedTable:
+    """Bitta varaqning xotiradagi nusxasi va uning indekslari."""
+    def __init__(self, sheet_name, rows):
+        self.rows = rows
+        self.loaded_at = time.monotonic()
+        self.refreshing = False
+        self._derived = {} # Saralangan/fuzzy indekslar (birinchi so'rovda quriladi)
+        self.key_funcs = _TABLE_INDEXES.get(sheet_name, {})
+        self.indexes = {name: {} for name in self.key_funcs}
+        for row in rows:
+            self._index_row(row)
+
+    def _index_row(self, row):
+        # Chiziqli qidiruvdagi kabi birinchi mos qator saqlanadi
+        for name, key_func in self.key_funcs.items():
+            key = key_func(row)
+            if key:
+                self.indexes[name].setdefault(key, row)
+
+    def append(self, row):
+        self.rows.append(row)
+        self._index_row(row)
+        self._derived = {} # Jadval o'zgardi - qo'shimcha indekslar keyingi so'rovda qayta quriladi
+
+    def lookup(self, index_name, key):
+        return self.indexes[index_name].get(key)
+
+    def _derived_index(self, kind, build):
+        # Jadval o'zgarmaguncha qayta ishlatiladi
+        index = self._derived.get(kind)
+        if index is None:
+            index = self._derived[kind] = build(self.rows)
+        return index
+
+    def sorted_index(self):
+        """Nom bo'yicha saralangan paging.SortedIndex."""
+        return self._derived_index("sorted", lambda rows: paging.SortedIndex(rows, _name_sort_key))
+
+    def fuzzy_index(self):
+        """Nomlar (1-ustun) bo'yicha fuzzy.FuzzyIndex."""
+        return self._derived_index("fuzzy", fuzzy.FuzzyIndex)
+
+_cache_lock = threading.Lock()
+_table_cache = {}
+_appends_during_load = {} # varaq nomi -> [davom etayotgan har bir o'qish uchun qo'shilgan qatorlar]
+
+def _cell_text(value):
+    """Qiymatni Sheets qaytaradigan ko'rinishdagi matnga aylantiradi (12000.0 -> '12000')."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _data_range(sheet_name, first_row=2, last_row=None):
+    """Varaqning kerakli ustunlari oralig'i, masalan 'A2:G' (sarlavhasiz) yoki 'A2:G1001'."""
+    first_col, last_col = SHEET_COLUMNS[ledger_base(sheet_name)].split(":")
+    return f"{first_col}{first_row}:{last_col}{last_row or ''}"
+
+def _batch_read(spreadsheet, ranges):
+    """Bir yoki bir nechta varaq oralig'ini bitta values:batchGet so'rovi bilan o'qiydi.
+    ranges: [(varaq nomi, 'A2:G'), ...]. Har bir oraliq uchun qatorlar ro'yxatini qaytaradi.
+    Varaq topilmasa gspread.WorksheetNotFound ko'tariladi."""
+    for sheet_name, _ in ranges:
+        get_worksheet(spreadsheet, sheet_name) # Varaq mavjudligini tekshirish (keshdan)
+    response = scheduler.call(
+        "values_batch_get", spreadsheet.values_batch_get,
+        [absolute_range_name(sheet_name, cell_range) for sheet_name, cell_range in ranges]
+    )
+    return [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+
+def _read_values(spreadsheet, sheet_name):
+    """Varaqning faqat kerakli ustunlarini sarlavhasiz o'qiydi."""
+    return _batch_read(spreadsheet, [(sheet_name, _data_range(sheet_name))])[0]
+
+def read_sheet_rows(sheet_names):
+    """Bir nechta varaqning barcha qatorlarini (sarlavhasiz) bitta so'rov bilan o'qiydi.
+    {varaq nomi: qatorlar} qaytaradi; mavjud bo'lmagan varaq uchun bo'sh ro'yxat.
+    Ulanib bo'lmasa None qaytaradi."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return None
+
+    existing = []
+    for sheet_name in sheet_names:
+        try:
+            get_worksheet(spreadsheet, sheet_name)
+            existing.append(sheet_name)
+        except gspread.WorksheetNotFound:
+            continue
+    result = {sheet_name: [] for sheet_name in sheet_names}
+    if existing:
+        all_rows = _batch_read(spreadsheet, [(name, _data_range(name)) for name in existing])
+        result.update(zip(existing, all_rows))
+    return result
+
+def iter_sheet_rows(sheet_name, chunk_size):
+    """Varaq qatorlarini (sarlavhasiz) chunk_size qatorlik oraliqlar bilan ketma-ket o'qiydigan
+    generator. Xotirada bir vaqtda faqat bitta oraliq turadi (katta jurnallarni eksport qilish uchun)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return
+
+    first_row = 2
+    while True:
+        try:
+            chunk = _batch_read(spreadsheet, [(sheet_name, _data_range(sheet_name, first_row, first_row + chunk_size - 1))])[0]
+        except gspread.WorksheetNotFound:
+            return
+        yield from chunk
+        # Sheets oxiridagi bo'sh qatorlarni qaytarmaydi: to'liq bo'lmagan oraliq - varaq oxiri
+        if len(chunk) < chunk_size: return
+        first_row += chunk_size
+
+def iter_ledger_rows(base, chunk_size, start=None, end=None):
+    """Jurnalning (Stok/Savdolar) [start, end] (date) oralig'iga tegishli barcha davr
+    varaqlari qatorlari, eskisidan yangisiga. O'tkazma va qoldiq (QOLDIQ) qatorlari
+    qaytarilmaydi: Stok uchun ixchamlashda yig'ilgan asl qatorlar Stok_arxiv dan,
+    davr varaqlaridan oldin beriladi."""
+    start_day = start.toordinal() if start else None
+    end_day = end.toordinal() if end else None
+    sheet_names = ledger_sheets_for_range(base, start_day, end_day)
+    if base == SHEET_NAMES["STOCK"]:
+        sheet_names = [SHEET_NAMES["STOCK_ARCHIVE"]] + sheet_names
+    for sheet_name in sheet_names:
+        for row in iter_sheet_rows(sheet_name, chunk_size):
+            if not is_carry_row(row) and not is_snapshot_row(row):
+                yield row
+
+def _load_tables(spreadsheet, sheet_names):
+    """Bir nechta varaqni bitta so'rov bilan o'qiydi va keshga yozadi.
+    O'qish davomida bot qo'shgan qatorlar yozib boriladi va yangi nusxaga qayta qo'shiladi
+    (aks holda ular keyingi TTL gacha keshdan yo'qolardi)."""
+    logs = [[] for _ in sheet_names]
+    with _cache_lock:
+        for name, log in zip(sheet_names, logs):
+            _appends_during_load.setdefault(name, []).append(log)
+    try:
+        all_rows = _batch_read(spreadsheet, [(name, _data_range(name)) for name in sheet_names])
+    finally:
+        with _cache_lock:
+            for name, log in zip(sheet_names, logs):
+                _appends_during_load[name].remove(log)
+    return [_cache_rows(name, rows, log) for name, rows, log in zip(sheet_names, all_rows, logs)]
+
+def _load_table(spreadsheet, sheet_name):
+    """Varaqni Sheetsdan o'qiydi va keshga yozadi."""
+    return _load_tables(spreadsheet, [sheet_name])[0]
+
+def _cache_rows(sheet_name, rows, appended=()):
+    """Varaqning yangi o'qilgan qatorlarini (sarlavhasiz) keshga yozadi. appended - o'qish
+    boshlangandan keyin bot qo'shgan qatorlar: o'qilgan nusxada IDsi bo'lmaganlari qo'shiladi."""
+    entry = _CachedTable(sheet_name, rows)
+    with _cache_lock:
+        for row in appended:
+            if "id" in entry.indexes and entry.lookup("id", row[0]) is not None: continue
+            entry.append(row)
+        _table_cache[sheet_name] = entry
+    allocator = _id_allocators.get(sheet_name)
+    if allocator is not None:
+        allocator.observe(rows)
+    return entry
+
+def _refresh_in_background(spreadsheet, sheet_name, entry):
+    """Eskirgan keshni fonda yangilaydi (bir vaqtda faqat bitta yangilash)."""
+    with _cache_lock:
+        if entry.refreshing: return
+        entry.refreshing = True
+
+    def worker():
+        try:
+            with scheduler.priority(scheduler.PRIORITY_BACKGROUND):
+                _load_table(spreadsheet, sheet_name)
+        except Exception as e:
+            logging.error(f"'{sheet_name}' keshini fonda yangilashda xato: {e}")
+        finally:
+            entry.refreshing = False
+
+    threading.Thread(target=worker, name=f"refresh-{sheet_name}", daemon=True).start()
+
+def _get_tables(spreadsheet, *sheet_names):
+    """Varaqlarning keshdagi nusxalarini qaytaradi. Kesh yo'q yoki eskirgan varaqlar
+    birgalikda bitta so'rov bilan o'qiladi.
+    Varaq topilmasa gspread.WorksheetNotFound ko'tariladi."""
+    entries = {}
+    missing = []
+    for sheet_name in sheet_names:
+        entry = _table_cache.get(sheet_name)
+        if entry is not None:
+            if time.monotonic() - entry.loaded_at < TABLE_CACHE_TTL:
+                metrics.record_cache(sheet_name, "hit")
+                entries[sheet_name] = entry
+                continue
+            if TABLE_CACHE_SWR:
+                metrics.record_cache(sheet_name, "stale")
+                _refresh_in_background(spreadsheet, sheet_name, entry)
+                entries[sheet_name] = entry
+                continue
+        metrics.record_cache(sheet_name, "miss")
+        missing.append(sheet_name)
+    if missing:
+        entries.update(zip(missing, _load_tables(spreadsheet, missing)))
+    return [entries[sheet_name] for sheet_name in sheet_names]
+
+def _get_table(spreadsheet, sheet_name):
+    """Bitta varaqning keshdagi nusxasini qaytaradi (_get_tables ga qarang)."""
+    return _get_tables(spreadsheet, sheet_name)[0]
+
+def _prefetch_tables(*sheet_names):
+    """Sotuvchi va mahsulot nomlarini aniqlashdan oldin kerakli jadvallarni bitta
+    so'rov bilan keshga yuklaydi (keyingi qidiruvlar tarmoqqa chiqmaydi)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return
+    try:
+        _get_tables(spreadsheet, *sheet_names)
+    except gspread.WorksheetNotFound:
+        pass
+
+def resolve_names(seller_ids=(), product_ids=()):
+    """Bir nechta sotuvchi va mahsulot IDlarining nomlarini bitta jadval yuklanishidan aniqlaydi.
+    ({sotuvchi_id: ism}, {mahsulot_id: nom}) qaytaradi; topilmagan IDlar uchun
+    get_seller_name_by_id / get_product_name_by_id dagi kabi o'rinbosar matn beriladi."""
+    seller_names = {seller_id: str(seller_id) for seller_id in seller_ids}
+    product_names = {product_id: f"ID: {product_id}" for product_id in product_ids}
+
+    sheet_names = []
+    if seller_names: sheet_names.append(SHEET_NAMES["SELLERS"])
+    if product_names: sheet_names.append(SHEET_NAMES["PRODUCTS"])
+    spreadsheet = get_sheets_client()
+    if not spreadsheet or not sheet_names: return seller_names, product_names
+
+    try:
+        tables = dict(zip(sheet_names, _get_tables(spreadsheet, *sheet_names)))
+    except Exception as e:
+        logging.error(f"Nomlarni aniqlashda xato: {e}")
+        return seller_names, product_names
+
+    # Sotuvchi: [ID, Ism, ...], Mahsulot: [ID, Nomi, Narxi] - nom 1-indeksda
+    for ids_to_names, sheet_name in ((seller_names, SHEET_NAMES["SELLERS"]),
+                                     (product_names, SHEET_NAMES["PRODUCTS"])):
+        if sheet_name not in tables: continue
+        for item_id in ids_to_names:
+            row = tables[sheet_name].lookup("id", str(item_id))
+            if row and len(row) > 1:
+                ids_to_names[item_id] = row[1]
+    return seller_names, product_names
+
+def _read_table(spreadsheet, sheet_name):
+    """Varaq qatorlarini (sarlavhasiz) keshdan qaytaradi."""
+    return _get_table(spreadsheet, sheet_name).rows
+
+def _append_cached_row(sheet_name, row):
+    """Bot yozgan yangi qatorni keshga va indekslarga qo'shadi (kesh bo'lmasa hech narsa qilmaydi).
+    Shu varaq hozir o'qilayotgan bo'lsa, qator o'qish tugagach yangi nusxaga ham qo'shiladi."""
+    row = [_cell_text(v) for v in row]
+    with _cache_lock:
+        entry = _table_cache.get(sheet_name)
+        if entry is not None:
+            entry.append(row)
+        for log in _appends_during_load.get(sheet_name, ()):
+            log.append(row)
+
+def invalidate_table_cache(sheet_name=None):
+    """Bitta varaq (yoki barcha varaqlar) keshini o'chiradi."""
+    with _cache_lock:
+        if sheet_name is None:
+            _table_cache.clear()
+        else:
+            _table_cache.pop(sheet_name, None)
+
+
+# --- ID AJRATUVCHI (Sotuvchilar, Mahsulotlar) ---
+# Yangi ID butun jadvalni o'qib qatorlarni sanash o'rniga xotiradagi hisoblagichdan olinadi.
+# Hisoblagich jadvaldagi eng katta IDdan boshlanadi, jarayon ichida qulf bilan ketma-ket
+# beriladi va jadval har safar qayta o'qilganda undagi eng katta ID bilan solishtiriladi.
+
+class _IdAllocator:
+    """Bitta jadval uchun o'suvchi (monoton) ID hisoblagichi."""
+    def __init__(self, sheet_name):
+        self.sheet_name = sheet_name
+        self._lock = threading.Lock()
+        self._next_id = None
+
+    def observe(self, rows):
+        """Jadvaldagi eng katta IDni hisobga oladi (qo'lda qo'shilgan qatorlar uchun ham)."""
+        max_id = 0
+        for row in rows:
+            try:
+                max_id = max(max_id, int(row[0]))
+            except (ValueError, IndexError):
+                continue
+        with self._lock:
+            if self._next_id is None or self._next_id <= max_id:
+                self._next_id = max_id + 1
+
+    def allocate(self, spreadsheet):
+        """Keyingi bo'sh IDni beradi. Hisoblagich hali yo'q bo'lsa, jadval bir marta o'qiladi."""
+        if self._next_id is None:
+            try:
+                _get_table(spreadsheet, self.sheet_name) # _cache_rows orqali observe() chaqiriladi
+            except gspread.WorksheetNotFound:
+                self.observe([])
+        with self._lock:
+            new_id = self._next_id
+            self._next_id += 1
+            return new_id
+
+_id_allocators = {
+    SHEET_NAMES["SELLERS"]: _IdAllocator(SHEET_NAMES["SELLERS"]),
+    SHEET_NAMES["PRODUCTS"]: _IdAllocator(SHEET_NAMES["PRODUCTS"]),
+}
+
+def warm_up():
+    """Ishga tushganda Sotuvchilar va Mahsulotlarni bitta so'rov bilan o'qiydi:
+    kesh to'ladi va ID hisoblagichlari varaqdagi haqiqiy eng katta ID bilan moslanadi."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return False
+    try:
+        _load_tables(spreadsheet, list(_id_allocators))
+        return True
+    except Exception as e:
+        logging.error(f"Jadvallarni oldindan yuklashda xato: {e}")
+        return False
+
+
+# --- JURNALDAN HISOBLANADIGAN XOTIRADAGI HOLATLAR ---
+# Stok/Savdolar varaqlaridan bir marta hisoblab olinadigan va botning har bir
+# yozuvida joyida yangilanadigan jadvallar (masalan, sotuvchi qoldiqlari).
+
+_ledger_views = {} # varaq nomi -> [_LedgerView, ...]
+
+def _row_key(row):
+    """Qatorni solishtirish uchun kalit (oxiridagi bo'sh kataklar hisobga olinmaydi)."""
+    row = [str(v) for v in row]
+    while row and row[-1] == "":
+        row.pop()
+    return tuple(row)
+
+class _LedgerView:
+    """Jurnal varag'idan hisoblanadigan holat uchun asos klass.
+    Voris klass reset() va apply(rows) ni amalga oshiradi.
+
+    Jurnallar faqat oxiriga qo'shilib boradi, shuning uchun yangilashda faqat oxirgi
+    ko'rilgan qatordan keyingi qismi (A{n+1}:G) o'qiladi. Oxirgi ko'rilgan qator
+    o'zgargan yoki o'chirilgan bo'lsa, varaq to'liq qayta o'qiladi."""
+    def __init__(self, sheet_name):
+        self.sheet_name = sheet_name
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._full_loaded_at = None
+        self._force_full = False
+        self._load_count = 0
+        self._writes_in_flight = 0
+        self._row_count = 0     # ko'rilgan ma'lumot qatorlari soni (sarlavhasiz)
+        self._last_key = None   # oxirgi ko'rilgan qator kaliti
+        self.ttl = LEDGER_VIEW_TTL # yopilgan davr varaqlari uchun uzaytiriladi
+        _ledger_views.setdefault(sheet_name, []).append(self)
+
+    def reset(self):
+        raise NotImplementedError
+
+    def apply(self, rows):
+        raise NotImplementedError
+
+    def _track(self, rows):
+        """Yuqori suv belgisini (ko'rilgan qatorlar soni va oxirgi qator) yangilaydi."""
+        if rows:
+            self._row_count += len(rows)
+            self._last_key = _row_key(rows[-1])
+
+    def _full_reload(self, spreadsheet):
+        try:
+            rows = _read_values(spreadsheet, self.sheet_name)
+        except gspread.WorksheetNotFound:
+            rows = []
+        self.reset()
+        self.apply(rows)
+        self._row_count = 0
+        self._last_key = None
+        self._track(rows)
+        self._loaded_at = self._full_loaded_at = time.monotonic()
+        self._force_full = False
+        self._load_count += 1
+
+    def _sync_tail(self, spreadsheet):
+        """Faqat yangi qatorlarni o'qib qo'shadi. Oxirgi ko'rilgan qator mos kelmasa
+        (yuqoridagi qatorlar tahrirlangan/o'chirilgan) False qaytaradi."""
+        # Ma'lumot qatori i varaqning i+1 qatorida (1-qator sarlavha). Oxirgi ko'rilgan
+        # qator ham o'qiladi, u o'zgarmaganini tekshirish uchun.
+        first_row = self._row_count + 1 if self._row_count else 2
+        tail = _batch_read(spreadsheet, [(self.sheet_name, _data_range(self.sheet_name, first_row))])[0]
+        if self._row_count:
+            if not tail or _row_key(tail[0]) != self._last_key:
+                return False
+            tail = tail[1:]
+        self.apply(tail)
+        self._track(tail)
+        self._loaded_at = time.monotonic()
+        return True
+
+    def ensure_loaded(self, spreadsheet):
+        """Holat yo'q bo'lsa varaqni to'liq o'qiydi; eskirgan bo'lsa faqat yangi qatorlarni o'qiydi.
+        Yozuv davom etayotganda eskirgan holat yangilanmaydi (ikki marta hisoblanmasligi uchun)."""
+        cache_name = type(self).__name__.strip("_")
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is not None:
+                if now - self._loaded_at < self.ttl:
+                    metrics.record_cache(cache_name, "hit")
+                    return
+                if self._writes_in_flight:
+                    metrics.record_cache(cache_name, "stale")
+                    return
+                if not self._force_full and now - self._full_loaded_at < LEDGER_FULL_RELOAD_INTERVAL:
+                    try:
+                        if self._sync_tail(spreadsheet):
+                            metrics.record_cache(cache_name, "tail")
+                            return
+                    except gspread.WorksheetNotFound:
+                        pass
+                    logging.info(f"'{self.sheet_name}' jurnalida oldingi qatorlar o'zgargan, to'liq qayta o'qiladi.")
+            metrics.record_cache(cache_name, "miss")
+            self._full_reload(spreadsheet)
+
+    def refresh(self, spreadsheet):
+        """TTL ni kutmasdan yangi qatorlarni o'qiydi (davr yopilganda)."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._loaded_at = 0
+            self.ensure_loaded(spreadsheet)
+
+    def begin_write(self):
+        with self._lock:
+            self._writes_in_flight += 1
+            return self._load_count
+
+    def end_write(self, token, rows):
+        """Yozuv tugagach chaqiriladi (rows=None bo'lsa, yozuv muvaffaqiyatsiz)."""
+        with self._lock:
+            self._writes_in_flight -= 1
+            if rows is None or self._loaded_at is None: return
+            if token != self._load_count:
+                # Yozuv paytida varaq qayta o'qildi: qator unda bormi-yo'qmi noma'lum,
+                # shuning uchun keyingi o'qishda to'liq qayta hisoblanadi
+                self._loaded_at = 0
+                self._force_full = True
+                return
+            rows = [[_cell_text(v) for v in row] for row in rows]
+            self.apply(rows)
+            self._track(rows)
+
+def _begin_view_writes(sheet_names):
+    """Berilgan varaqlarga yozuv boshlanishini holatlarga bildiradi."""
+    return [(view, view.begin_write()) for name in sheet_names for view in _ledger_views.get(name, [])]
+
+def _end_view_writes(tokens, rows_by_sheet):
+    """Yozuv natijasini holatlarga yetkazadi (rows_by_sheet=None bo'lsa, yozuv muvaffaqiyatsiz)."""
+    for view, token in tokens:
+        rows = None if rows_by_sheet is None else rows_by_sheet.get(view.sheet_name)
+        view.end_write(token, rows)
+
+
+# --- JURNAL (Stok, Savdolar) YOZUVLARINI TO'PLASH ---
+# Bir vaqtda kelgan ko'plab savdo/stok qatorlari qisqa oyna davomida to'planadi
+# va har bir varaqqa bitta append_rows so'rovi bilan yoziladi (yozish kvotasini tejash uchun).
+
+class _LedgerWriter:
+    """Bitta jurnal varag'i uchun yozuvlarni to'plab, birgalikda yozuvchi.
+    Yozuv taymer threadida ham bo'lishi mumkin, shuning uchun ustuvorlik varaq bo'yicha beriladi."""
+    def __init__(self, sheet_name, header_row, priority):
+        self.sheet_name = sheet_name
+        self.header_row = header_row
+        self.priority = priority
+        self._lock = threading.Lock()
+        self._pending = [] # [(qator, Future), ...]
+        self._timer = None
+
+    def submit(self, row):
+        """Qatorni navbatga qo'yadi. Qator yozilganda bajariladigan Future qaytaradi."""
+        future = Future()
+        with self._lock:
+            self._pending.append((row, future))
+            if len(self._pending) >= LEDGER_BATCH_SIZE:
+                batch = self._take_pending()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(LEDGER_FLUSH_DELAY, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._write(batch)
+        return future
+
+    def _take_pending(self):
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def flush(self):
+        """Navbatdagi barcha qatorlarni hozir yozadi."""
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        rows = [row for row, _ in batch]
+        tokens = _begin_view_writes([self.sheet_name])
+        try:
+            spreadsheet = get_sheets_client()
+            if not spreadsheet:
+                raise RuntimeError("Google Sheetsga ulanib bo'lmadi")
+            worksheet = get_or_create_worksheet(spreadsheet, self.sheet_name, self.header_row)
+            with scheduler.priority(self.priority):
+                scheduler.call("append_rows", worksheet.append_rows, rows)
+        except Exception as e:
+            _end_view_writes(tokens, None)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        _end_view_writes(tokens, {self.sheet_name: rows})
+        for _, future in batch:
+            future.set_result(True)
+
+# Stok qatori: [ID, Sotuvchi Ismi, Mahsulot Nomi, Kilogrammi, Narxi, Jami Narx, Sana]
+# YANGILANGAN SARLAVHA: IDlar o'rniga Ism va Nomi
+STOCK_HEADER = ["ID", "Sotuvchi Ismi", "Mahsulot Nomi", "Kilogrammi", "Narxi", "Jami Narx", "Sana"]
+# Mahsulot qatori: [ID, Mahsulot Nomi, Narxi]
+PRODUCTS_HEADER = ["ID", "Mahsulot Nomi", "Narxi"]
+# Savdo qatori: [ID, Sotuvchi ID, Mahsulot ID, Kilogrammi, Narxi, Jami Tushum, Sana]
+# SAVDO VARAG'I IDlar bilan qoldi, chunki u hisobotlar uchun muhim
+SALES_HEADER = ["ID", "Sotuvchi", "Mahsulot ID", "Kilogrammi", "Narxi", "Jami Tushum", "Sana"]
+
+_LEDGER_HEADERS = {SHEET_NAMES["STOCK"]: STOCK_HEADER, SHEET_NAMES["SALES"]: SALES_HEADER}
+_LEDGER_PRIORITIES = {SHEET_NAMES["STOCK"]: scheduler.PRIORITY_ADMIN, SHEET_NAMES["SALES"]: scheduler.PRIORITY_SALE}
+
+_ledger_writers = {} # varaq nomi (davr varag'i) -> _LedgerWriter
+
+def _ledger_writer(sheet_name):
+    """Jurnal varag'i uchun yozuvchi (birinchi murojaatda yaratiladi)."""
+    with _partition_lock:
+        writer = _ledger_writers.get(sheet_name)
+        if writer is None:
+            base = ledger_base(sheet_name)
+            writer = _ledger_writers[sheet_name] = _LedgerWriter(sheet_name, _LEDGER_HEADERS[base],
+                                                                 _LEDGER_PRIORITIES[base])
+        return writer
+
+def flush_ledgers():
+    """Navbatda turgan barcha jurnal qatorlari va savdolarni darhol yozadi (bot to'xtaganda)."""
+    for writer in list(_ledger_writers.values()):
+        writer.flush()
+    _unit_writer.flush()
+
+
+# --- BIRGALIKDAGI YOZUV (UNIT OF WORK) ---
+# Bitta biznes amalining (masalan, savdo + stokdan ayirish) barcha qatorlari bitta
+# spreadsheets.batchUpdate so'rovi bilan yoziladi. Google bu so'rovni atomar bajaradi:
+# yoki hammasi yoziladi, yoki hech biri.
+# Savdolar UnitOfWork.submit() orqali jurnal yozuvlari kabi LEDGER_FLUSH_DELAY oynasida
+# to'planadi: bir vaqtda kelgan savdolar bitta batch_update bo'lib yoziladi (har bir
+# savdoning ikkala qatori baribir bitta so'rovda, ya'ni atomar qoladi).
+
+def _cell_data(value):
+    """Qiymatni appendCells uchun CellData ko'rinishiga keltiradi."""
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+class UnitOfWork:
+    """Bir nechta varaqqa qo'shiladigan qatorlarni to'plab, bitta so'rov bilan yozadi."""
+    def __init__(self):
+        self._appends = {} # varaq nomi -> (sarlavha, [qatorlar])
+
+    def append(self, sheet_name, header_row, row):
+        """Qatorni yozishga tayyorlaydi (commit chaqirilguncha hech narsa yuborilmaydi)."""
+        self._appends.setdefault(sheet_name, (header_row, []))[1].append(row)
+
+    def commit(self):
+        """Barcha qatorlarni bitta batch_update bilan yozadi. Xato bo'lsa istisno ko'taradi."""
+        _commit_units([self])
+
+    def submit(self):
+        """Qatorlarni bir vaqtda kelgan boshqa UnitOfWork lar bilan birga yozish uchun
+        navbatga qo'yadi. Yozuv tugaganda bajariladigan Future qaytaradi."""
+        return _unit_writer.submit(self)
+
+def _commit_units(units):
+    """UnitOfWork lar qatorlarini bitta batch_update bilan yozadi (hammasi yoki hech biri)."""
+    appends = {} # varaq nomi -> (sarlavha, [qatorlar])
+    for unit in units:
+        for sheet_name, (header_row, rows) in unit._appends.items():
+            appends.setdefault(sheet_name, (header_row, []))[1].extend(rows)
+    if not appends: return
+    spreadsheet = get_sheets_client()
+    if not spreadsheet:
+        raise RuntimeError("Google Sheetsga ulanib bo'lmadi")
+
+    tokens = _begin_view_writes(appends)
+    try:
+        requests = []
+        for sheet_name, (header_row, rows) in appends.items():
+            worksheet = get_or_create_worksheet(spreadsheet, sheet_name, header_row)
+            requests.append({
+                "appendCells": {
+                    "sheetId": worksheet.id,
+                    "rows": [{"values": [_cell_data(v) for v in row]} for row in rows],
+                    "fields": "userEnteredValue",
+                }
+            })
+        scheduler.call("batch_update", spreadsheet.batch_update, {"requests": requests})
+    except Exception:
+        _end_view_writes(tokens, None)
+        raise
+
+    # Yozuv muvaffaqiyatli bo'lsa, keshlar va hisoblangan holatlarni yangilash
+    _end_view_writes(tokens, {name: rows for name, (_, rows) in appends.items()})
+    for sheet_name, (_, rows) in appends.items():
+        for row in rows:
+            _append_cached_row(sheet_name, row)
+    for unit in units:
+        unit._appends = {}
+
+class _UnitOfWorkWriter(_LedgerWriter):
+    """_LedgerWriter oynasida qatorlar o'rniga UnitOfWork larni to'plab, bitta so'rov bilan yozadi."""
+    def __init__(self, priority):
+        super().__init__(None, None, priority)
+
+    def _write(self, batch):
+        try:
+            with scheduler.priority(self.priority):
+                _commit_units([unit for unit, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for _, future in batch:
+            future.set_result(True)
+
+_unit_writer = _UnitOfWorkWriter(scheduler.PRIORITY_SALE)
+
+
+# --- DAVRLARGA BO'LINGAN JURNALLAR (Stok_2026_10, Savdolar_2026_10) ---
+# Stok va Savdolar har oy yangi varaqqa yoziladi, shuning uchun o'qishlar faqat so'ralgan
+# sana oralig'iga tegishli varaqlarga tegadi. Bo'linishdan oldingi qatorlar eski
+# (qo'shimchasiz) varaqda qoladi va eng birinchi davr hisoblanadi.
+# Davr yopilganda (yangi oyning birinchi yozuvida) yangi varaq boshiga o'tkazma
+# qatorlari yoziladi (ID ustunida CARRY_MARKER):
+#   - Stok: har bir sotuvchi/mahsulot qoldig'i, shuning uchun qoldiqlar faqat oxirgi
+#     mavjud varaqdan hisoblanadi (o'qishlar davr ochmaydi)
+#   - Savdolar: o'tgan davrning sotuvchi/mahsulot bo'yicha jami savdosi (ma'lumot uchun;
+#     savdo hisobotlari va eksport ularni hisobga olmaydi)
+# Yozuvlar varaqni acquire_ledger / writing_ledgers orqali oladi: davr aniqlanishi va
+# yozuvning shu varaqqa ro'yxatga olinishi bitta qulf ostida bo'ladi. Yangi davr ochilganda
+# eski varaqdagi ro'yxatdagi yozuvlar tugashi kutiladi, keyin o'tkazma qatorlari hisoblanadi
+# (aks holda yo'ldagi qatorlar qoldiqqa kirmay qolardi). Varaq yaratish va o'qishlar qulfdan
+# tashqarida, har bir davr uchun bitta "ochilish" Future orqali bajariladi.
+
+CARRY_MARKER = "O'TKAZMA"
+_PARTITION_SUFFIX = re.compile(r"_(\d{4})_(\d{2})$")
+# Bir nechta jurnalga yozuvda varaqlar shu tartibda olinadi (davr ochilishini kutishda
+# o'zaro bloklanib qolmaslik uchun)
+_LEDGER_ORDER = (SHEET_NAMES["SALES"], SHEET_NAMES["STOCK"])
+
+_partition_lock = threading.RLock() # faqat quyidagi lug'atlar uchun (tarmoq so'rovlari qulfdan tashqarida)
+_partition_drained = threading.Condition(_partition_lock)
+_partition_periods = {} # jurnal nomi -> mavjud davrlar to'plami ('2026_10', ...)
+_legacy_ledgers = set() # eski (bo'linmagan) varag'i mavjud jurnallar
+_partition_views = {}   # (holat klassi, varaq nomi) -> _LedgerView
+_partition_writes = {}  # davr varag'i -> hali tugamagan yozuvlar soni
+_period_openings = {}   # (jurnal nomi, davr) -> Future (davr ochilayotgan paytda)
+
+def is_carry_row(row):
+    """Davr yopilganda o'tkazilgan qatormi (ID ustunida CARRY_MARKER)."""
+    return bool(row) and str(row[0]) == CARRY_MARKER
+
+def ledger_base(sheet_name):
+    """Davr varag'i nomidan jurnal nomini oladi: 'Savdolar_2026_10' -> 'Savdolar'."""
+    return _PARTITION_SUFFIX.sub("", sheet_name)
+
+def _period_of(day):
+    return f"{day.year:04d}_{day.month:02d}"
+
+def _period_start(period):
+    year, month = period.split("_")
+    return date(int(year), int(month), 1)
+
+def _period_end(period):
+    start = _period_start(period)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def _known_periods(spreadsheet, base):
+    """Jurnalning mavjud davrlari (saralangan). Varaqlar ro'yxati bir marta so'raladi."""
+    with _partition_lock:
+        periods = _partition_periods.get(base)
+        if periods is not None: return sorted(periods)
+
+    worksheets = scheduler.call("worksheets", spreadsheet.worksheets)
+    with _partition_lock:
+        periods = _partition_periods.get(base)
+        if periods is None:
+            periods = set()
+            for worksheet in worksheets:
+                if worksheet.title == base:
+                    _legacy_ledgers.add(base)
+                elif ledger_base(worksheet.title) == base:
+                    periods.add(worksheet.title[len(base) + 1:])
+                else:
+                    continue
+                _worksheet_cache.setdefault(worksheet.title, worksheet)
+            _partition_periods[base] = periods
+        return sorted(periods)
+
+def _current_sheet(base, register):
+    """Joriy davr varag'i; register=True bo'lsa, yozuv shu varaqqa ro'yxatga olinadi
+    (release_ledger chaqirilguncha). Davr hali ochilmagan bo'lsa, uni bitta thread ochadi,
+    qolganlari shu davrning Future sini kutadi."""
+    period = _period_of(date.today())
+    sheet_name = f"{base}_{period}"
+    while True:
+        with _partition_lock:
+            if period in _partition_periods.get(base, ()):
+                if register:
+                    _partition_writes[sheet_name] = _partition_writes.get(sheet_name, 0) + 1
+                return sheet_name
+            opening = _period_openings.get((base, period))
+            owner = opening is None
+            if owner:
+                opening = _period_openings[(base, period)] = Future()
+        if owner:
+            try:
+                spreadsheet = get_sheets_client()
+                if not spreadsheet:
+                    raise RuntimeError("Google Sheetsga ulanib bo'lmadi")
+                if period not in _known_periods(spreadsheet, base):
+                    _open_period(spreadsheet, base, period)
+                opening.set_result(True)
+            except Exception as e:
+                opening.set_exception(e)
+            finally:
+                with _partition_lock:
+                    _period_openings.pop((base, period), None)
+        opening.result() # Ochilish xato bilan tugagan bo'lsa, istisno shu yerda ko'tariladi
+
+def ledger_sheet(base):
+    """Joriy holatni o'qish uchun varaq: mavjud davrlarning eng oxirgisi (davr hali
+    bo'lmasa - eski varaq). O'qish yangi davr ochmaydi: buni faqat yozuvlar
+    (acquire_ledger / writing_ledgers) qiladi, oxirgi varaq esa qoldiqlarni o'tkazma
+    qatorlari bilan to'liq saqlaydi."""
+    if LEDGER_PARTITIONS != 'month': return base
+    spreadsheet = get_sheets_client()
+    if not spreadsheet:
+        raise RuntimeError("Google Sheetsga ulanib bo'lmadi")
+    periods = _known_periods(spreadsheet, base)
+    return f"{base}_{periods[-1]}" if periods else base
+
+def acquire_ledger(base):
+    """Yozuv uchun joriy davr varag'ini oladi va yozuvni unga ro'yxatga oladi. Yozuv
+    tugagach (muvaffaqiyatli yoki xato bilan) release_ledger chaqirilishi shart."""
+    if LEDGER_PARTITIONS != 'month': return base
+    return _current_sheet(base, register=True)
+
+def release_ledger(sheet_name):
+    with _partition_drained:
+        count = _partition_writes.get(sheet_name, 0)
+        if count <= 1:
+            _partition_writes.pop(sheet_name, None)
+            _partition_drained.notify_all()
+        else:
+            _partition_writes[sheet_name] = count - 1
+
+@contextmanager
+def writing_ledgers(*bases):
+    """Bir nechta jurnalga birgalikdagi yozuv (UnitOfWork) uchun: {jurnal nomi: davr varag'i}.
+    Varaqlar _LEDGER_ORDER tartibida olinadi va blokdan chiqishda bo'shatiladi."""
+    sheet_names = _acquire_ledgers(bases)
+    try:
+        yield sheet_names
+    finally:
+        _release_ledgers(sheet_names)
+
+def _acquire_ledgers(bases):
+    sheet_names = {}
+    try:
+        for base in sorted(set(bases), key=_LEDGER_ORDER.index):
+            sheet_names[base] = acquire_ledger(base)
+    except Exception:
+        _release_ledgers(sheet_names)
+        raise
+    return sheet_names
+
+def _release_ledgers(sheet_names):
+    for sheet_name in sheet_names.values():
+        release_ledger(sheet_name)
+
+def _submit_ledger_row(base, row):
+    """Jurnal qatorini joriy davr varag'ining yozuvchisiga navbatga qo'yadi (Future qaytaradi)."""
+    sheet_name = acquire_ledger(base)
+    try:
+        future = _ledger_writer(sheet_name).submit(row)
+    except Exception:
+        release_ledger(sheet_name)
+        raise
+    future.add_done_callback(lambda _: release_ledger(sheet_name))
+    return future
+
+def _drain_writes(sheet_name):
+    """Yopilayotgan varaqqa ro'yxatga olingan yozuvlar tugashini kutadi (navbatdagilar darhol yoziladi)."""
+    writer = _ledger_writers.get(sheet_name)
+    if writer is not None:
+        writer.flush()
+    _unit_writer.flush()
+    deadline = time.monotonic() + LEDGER_WRITE_TIMEOUT
+    with _partition_drained:
+        while _partition_writes.get(sheet_name):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.warning(f"'{sheet_name}' ga yozuvlar {LEDGER_WRITE_TIMEOUT} soniyada tugamadi, "
+                                f"davr ularsiz yopiladi.")
+                return
+            _partition_drained.wait(remaining)
+
+def ledger_sheets_for_range(base, start_day=None, end_day=None):
+    """[start_day, end_day] (date.toordinal, None - chegarasiz) oralig'iga tegishli jurnal
+    varaqlari, eskisidan yangisiga."""
+    if LEDGER_PARTITIONS != 'month': return [base]
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return []
+    periods = _known_periods(spreadsheet, base)
+    sheets = []
+    # Eski varaqda birinchi davr ochilgunicha (shu davr ichida) yozilgan qatorlar bo'lishi mumkin
+    if base in _legacy_ledgers and (start_day is None or not periods
+                                    or start_day <= _period_end(periods[0]).toordinal()):
+        sheets.append(base)
+    for period in periods:
+        if end_day is not None and _period_start(period).toordinal() > end_day: continue
+        if start_day is not None and _period_end(period).toordinal() < start_day: continue
+        sheets.append(f"{base}_{period}")
+    return sheets
+
+def _partition_view(view_class, sheet_name):
+    """Davr varag'i uchun hisoblangan holat (birinchi murojaatda yaratiladi). Yopilgan
+    davrlar deyarli o'zgarmaydi, shuning uchun ular kamroq yangilanadi."""
+    with _partition_lock:
+        view = _partition_views.get((view_class, sheet_name))
+        if view is None:
+            view = _partition_views[(view_class, sheet_name)] = view_class(sheet_name)
+    current = LEDGER_PARTITIONS != 'month' or sheet_name.endswith(_period_of(date.today()))
+    view.ttl = LEDGER_VIEW_TTL if current else LEDGER_FULL_RELOAD_INTERVAL
+    return view
+
+def _previous_sheet(base, period):
+    """period dan oldingi eng oxirgi davr varag'i (yoki eski varaq), bo'lmasa None."""
+    earlier = [p for p in _partition_periods.get(base, ()) if p < period]
+    if earlier: return f"{base}_{max(earlier)}"
+    return base if base in _legacy_ledgers else None
+
+def _carry_rows(spreadsheet, base, previous, period):
+    """Yopilayotgan davr varag'idan yangi davrga o'tkaziladigan qatorlar."""
+    _drain_writes(previous) # Yo'ldagi va navbatdagi qatorlar ham hisobga olinsin
+    opened = f"{_period_start(period).isoformat()} 00:00"
+    rows = []
+    if base == SHEET_NAMES["STOCK"]:
+        # Varaq to'g'ridan-to'g'ri o'qiladi: jami narx ham o'zgarmay o'tsin (get_stock_report)
+        totals = _stock_totals(_read_values(spreadsheet, previous))
+        for (seller_name, product_name), (quantity, price, total) in sorted(totals.items()):
+            if quantity == 0 and round(total, 2) == 0: continue
+            rows.append([CARRY_MARKER, seller_name, product_name, quantity, price, round(total, 2), opened])
+    else:
+        sales = _partition_view(_LedgerColumnsView, previous)
+        sales.refresh(spreadsheet)
+        closed = previous[len(base) + 1:].replace("_", "-") if previous != base else "arxiv"
+        for (seller_id, product_id), (quantity, revenue) in sorted(sales.group_by(("seller", "product")).items()):
+            rows.append([CARRY_MARKER, seller_id, product_id, quantity, "", revenue, closed])
+    return rows
+
+def _already_exists(error):
+    """add_worksheet xatosi "bunday nomli varaq bor" (400) ekanmi."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 400 and "already exists" in str(error)
+
+def _open_period(spreadsheet, base, period):
+    """Yangi davr varag'ini sarlavha va o'tkazma qatorlari bilan yaratadi."""
+    previous = _previous_sheet(base, period)
+    carry_rows = _carry_rows(spreadsheet, base, previous, period) if previous else []
+    sheet_name = f"{base}_{period}"
+    try:
+        worksheet = scheduler.call("add_worksheet", spreadsheet.add_worksheet, title=sheet_name, rows=100, cols=20)
+    except gspread.exceptions.APIError as e:
+        if not _already_exists(e): raise
+        # Oldingi urinishda varaq yaratilib, qatorlar yozilmay qolgan bo'lishi mumkin
+        worksheet = get_worksheet(spreadsheet, sheet_name)
+        if _batch_read(spreadsheet, [(sheet_name, "A1:A1")])[0]:
+            carry_rows = None # Varaq allaqachon to'ldirilgan
+    if carry_rows is not None:
+        # Sarlavha va o'tkazma qatorlari bitta so'rovda
+        scheduler.call("append_rows", worksheet.append_rows, [_LEDGER_HEADERS[base]] + carry_rows)
+    _worksheet_cache[sheet_name] = worksheet
+    with _partition_lock:
+        _partition_periods[base].add(period)
+    if carry_rows is None:
+        logging.info(f"'{sheet_name}' davri avvalroq ochilgan ekan.")
+        return
+    logging.info(f"'{sheet_name}' davri ochildi: '{previous}' dan {len(carry_rows)} ta o'tkazma qatori.")
+
+
 # ==============================================================================
 # II. SOTUVCHILAR (SELLERS) FUNKSIYALARI
 # ==============================================================================
@@ -88,28 +1116,39 @@ def get_all_sellers():
     if not spreadsheet: return []
     
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["SELLERS"])
-        # Sarlavhalarni tashlab yuboramiz
-        return worksheet.get_all_values()[1:]  
+        # Sarlavhalarsiz qatorlar (nusxasi, chunki chaqiruvchi uni saralashi mumkin)
+        return list(_read_table(spreadsheet, SHEET_NAMES["SELLERS"]))
     except gspread.WorksheetNotFound:
         return []
     except Exception as e:
         logging.error(f"Sotuvchilarni o'qishda xato: {e}")
         return []
 
+def get_sellers_page(cursor=None, size=paging.LIST_PAGE_SIZE):
+    """Ism bo'yicha saralangan sotuvchilar ro'yxatining bitta sahifasi (paging.Page).
+    cursor - sahifaning birinchi sotuvchisi IDsi (None - birinchi sahifa)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return paging.empty_page()
+
+    try:
+        return _get_table(spreadsheet, SHEET_NAMES["SELLERS"]).sorted_index().page(cursor, size)
+    except gspread.WorksheetNotFound:
+        return paging.empty_page()
+    except Exception as e:
+        logging.error(f"Sotuvchilar sahifasini o'qishda xato: {e}")
+        return paging.empty_page()
+
 def get_seller_name_by_id(seller_id):
     """Sotuvchi IDsi bo'yicha uning Ismini (Name) qaytaradi (Varq sarlavhalari uchun)."""
     spreadsheet = get_sheets_client()
     if not spreadsheet: return str(seller_id)
     
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["SELLERS"])
-        all_sellers = worksheet.get_all_values()[1:] 
-        
+        row = _get_table(spreadsheet, SHEET_NAMES["SELLERS"]).lookup("id", str(seller_id))
+
         # Sotuvchi IDsi 0-indeksda, Ismi 1-indeksda joylashgan: [ID, Ism, Tuman, Telefon, Parol, Sana]
-        for row in all_sellers:
-            if len(row) > 1 and row[0] == str(seller_id):
-                return row[1]
+        if row and len(row) > 1:
+            return row[1]
         return str(seller_id) # Agar topilmasa IDni qaytarish
     except Exception as e:
         logging.error(f"Sotuvchi nomini olishda xato: {e}")
@@ -128,8 +1167,7 @@ def add_seller(seller_data):
             header_row=["ID", "Ism", "Tuman", "Telefon", "Parol", "Sana"] 
         )
         
-        current_rows = worksheet.get_all_values()
-        new_id = len(current_rows) # Yangi IDni aniqlash
+        new_id = _id_allocators[SHEET_NAMES["SELLERS"]].allocate(spreadsheet) # Yangi IDni aniqlash
         current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
         
         # Ma'lumotlar tartibi yangi sarlavhaga moslandi
@@ -142,26 +1180,25 @@ def add_seller(seller_data):
             current_date
         ]
         
-        worksheet.append_row(new_row)
+        scheduler.call("append_row", worksheet.append_row, new_row)
+        _append_cached_row(SHEET_NAMES["SELLERS"], new_row)
         return True
     except Exception as e:
         logging.error(f"Sotuvchini yozishda xato: {e}")
         return False
 
+def find_seller_by_id(seller_id):
+    """get_seller_by_id kabi, lekin jadvalni o'qib bo'lmasa istisno ko'taradi:
+    None faqat sotuvchi haqiqatan yo'qligini bildiradi (sessiyani tekshirish uchun)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: raise ConnectionError("Google Sheetsga ulanib bo'lmadi")
+    # Sotuvchi IDsi 0-indeksda joylashgan
+    return _get_table(spreadsheet, SHEET_NAMES["SELLERS"]).lookup("id", str(seller_id))
+
 def get_seller_by_id(seller_id):
     """ID orqali bitta sotuvchi ma'lumotini (qatorni) oladi (Admin navigatsiya uchun)."""
-    spreadsheet = get_sheets_client()
-    if not spreadsheet: return None
-    
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["SELLERS"])
-        all_sellers = worksheet.get_all_values()[1:] 
-        
-        # Sotuvchi IDsi 0-indeksda joylashgan
-        for row in all_sellers:
-            if len(row) > 0 and row[0] == str(seller_id):
-                return row
-        return None
+        return find_seller_by_id(seller_id)
     except Exception as e:
         logging.error(f"ID {seller_id} bo'yicha sotuvchini topishda xato: {e}")
         return None
@@ -172,14 +1209,8 @@ def get_seller_by_password(password):
     if not spreadsheet: return None
     
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["SELLERS"])
-        all_sellers = worksheet.get_all_values()[1:]
-        
         # Parol 4-indeksda joylashgan: [ID, Ism, Tuman, Telefon, Parol, Sana]
-        for row in all_sellers:
-            if len(row) >= 5 and row[4] == str(password):
-                return row
-        return None
+        return _get_table(spreadsheet, SHEET_NAMES["SELLERS"]).lookup("password", str(password))
     except Exception as e:
         logging.error(f"Parol bo'yicha sotuvchini topishda xato: {e}")
         return None
@@ -195,14 +1226,26 @@ def get_all_products():
     if not spreadsheet: return []
     
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["PRODUCTS"])
-        return worksheet.get_all_values()[1:]
+        return list(_read_table(spreadsheet, SHEET_NAMES["PRODUCTS"]))
     except gspread.WorksheetNotFound:
         return []
     except Exception as e:
         logging.error(f"Mahsulotlarni o'qishda xato: {e}")
         return []
 
+def get_products_page(cursor=None, size=paging.LIST_PAGE_SIZE):
+    """Nomi bo'yicha saralangan mahsulotlar ro'yxatining bitta sahifasi (paging.Page)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return paging.empty_page()
+
+    try:
+        return _get_table(spreadsheet, SHEET_NAMES["PRODUCTS"]).sorted_index().page(cursor, size)
+    except gspread.WorksheetNotFound:
+        return paging.empty_page()
+    except Exception as e:
+        logging.error(f"Mahsulotlar sahifasini o'qishda xato: {e}")
+        return paging.empty_page()
+
 def add_product(name, price):
     """Yangi mahsulotni Sheetsga qo'shadi (Admin FSM)."""
     spreadsheet = get_sheets_client()
@@ -212,13 +1255,13 @@ def add_product(name, price):
         worksheet = get_or_create_worksheet(
             spreadsheet, 
             SHEET_NAMES["PRODUCTS"], 
-            header_row=["ID", "Mahsulot Nomi", "Narxi"]
+            header_row=PRODUCTS_HEADER
         )
         
-        current_rows = worksheet.get_all_values()
-        new_id = len(current_rows)
-        
-        worksheet.append_row([new_id, name, price])
+        new_id = _id_allocators[SHEET_NAMES["PRODUCTS"]].allocate(spreadsheet)
+
+        scheduler.call("append_row", worksheet.append_row, [new_id, name, price])
+        _append_cached_row(SHEET_NAMES["PRODUCTS"], [new_id, name, price])
         return True
     except Exception as e:
         logging.error(f"Mahsulotni qo'shishda xato: {e}")
@@ -230,19 +1273,49 @@ def get_product_by_name(name):
     if not spreadsheet: return None
     
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["PRODUCTS"])
-        all_products = worksheet.get_all_values()[1:]
-        
-        normalized_name = name.strip().lower() 
-        
-        for row in all_products:
-            if len(row) >= 2 and row[1].strip().lower() == normalized_name:
-                return row
-        return None
+        # Normallashtirilgan nom bo'yicha indeksdan qidirish
+        return _get_table(spreadsheet, SHEET_NAMES["PRODUCTS"]).lookup("name", _normalize_name(name))
     except Exception as e:
         logging.error(f"Mahsulotni ism bo'yicha topishda xato: {e}")
         return None
 
+def get_product_by_id(product_id):
+    """Mahsulotni ID bo'yicha topadi va [ID, Nomi, Narxi] ni qaytaradi (taklif tugmalari uchun)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return None
+
+    try:
+        return _get_table(spreadsheet, SHEET_NAMES["PRODUCTS"]).lookup("id", str(product_id))
+    except Exception as e:
+        logging.error(f"Mahsulotni ID bo'yicha topishda xato: {e}")
+        return None
+
+def find_similar_products(name, limit=fuzzy.FUZZY_SUGGESTIONS):
+    """Nomi name ga o'xshash (xato yozilgan yoki boshlanishi mos) mahsulotlar [[ID, Nomi, Narxi], ...]."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return []
+
+    try:
+        return _get_table(spreadsheet, SHEET_NAMES["PRODUCTS"]).fuzzy_index().search(name, limit)
+    except gspread.WorksheetNotFound:
+        return []
+    except Exception as e:
+        logging.error(f"O'xshash mahsulotlarni qidirishda xato: {e}")
+        return []
+
+def complete_products(prefix, limit=fuzzy.FUZZY_SUGGESTIONS):
+    """Inline qidiruv uchun: nomi prefix bilan boshlanadigan (yoki unga o'xshash) mahsulotlar."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return []
+
+    try:
+        return _get_table(spreadsheet, SHEET_NAMES["PRODUCTS"]).fuzzy_index().complete(prefix, limit)
+    except gspread.WorksheetNotFound:
+        return []
+    except Exception as e:
+        logging.error(f"Mahsulotlarni avtoto'ldirishda xato: {e}")
+        return []
+
 def add_product_and_get_id(name, price):
     """Yangi mahsulotni qo'shadi va uning yangi ID sini qaytaradi (Stock Issue FSM uchun)."""
     spreadsheet = get_sheets_client()
@@ -252,13 +1325,13 @@ def add_product_and_get_id(name, price):
         worksheet = get_or_create_worksheet(
             spreadsheet, 
             SHEET_NAMES["PRODUCTS"], 
-            header_row=["ID", "Mahsulot Nomi", "Narxi"]
+            header_row=PRODUCTS_HEADER
         )
         
-        current_rows = worksheet.get_all_values()
-        new_id = len(current_rows)
-        
-        worksheet.append_row([new_id, name, price])
+        new_id = _id_allocators[SHEET_NAMES["PRODUCTS"]].allocate(spreadsheet)
+
+        scheduler.call("append_row", worksheet.append_row, [new_id, name, price])
+        _append_cached_row(SHEET_NAMES["PRODUCTS"], [new_id, name, price])
         return new_id
     except Exception as e:
         logging.error(f"Yangi mahsulot qo'shishda xato: {e}")
@@ -270,13 +1343,11 @@ def get_product_name_by_id(product_id):
     if not spreadsheet: return f"ID: {product_id}" 
     
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["PRODUCTS"])
-        all_products = worksheet.get_all_values()[1:] 
+        row = _get_table(spreadsheet, SHEET_NAMES["PRODUCTS"]).lookup("id", str(product_id))
 
         # ID 0-indeksda, Nomi 1-indeksda
-        for row in all_products:
-            if row and row[0] == str(product_id):
-                return row[1] 
+        if row and len(row) > 1:
+            return row[1]
         return f"ID: {product_id}"
 
     except Exception as e:
@@ -288,126 +1359,329 @@ def get_product_name_by_id(product_id):
 # IV. STOK (STOCK) FUNKSIYALARI
 # ==============================================================================
 
+def build_stock_row(seller_name, product_name, quantity, price):
+    """Stok varag'i uchun yangi qator tuzadi."""
+    total_price = float(price) * int(quantity)
+    current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+    
+    # Qator tuzilishi: [ID, Sotuvchi Ismi (1), Mahsulot Nomi (2), Kilogrammi (3), Narxi (4), Jami Narx (5), Sana (6)]
+    new_row = [
+        "", # ID 
+        seller_name,    # Nom kiritildi
+        product_name,   # Nom kiritildi
+        quantity,  
+        price,     
+        total_price,
+        current_date
+    ]
+    return new_row
+
+def queue_stock_to_seller(seller_id, product_id, quantity, price):
+    """Stok qatorini yozish navbatiga qo'yadi va yozilganda bajariladigan Future qaytaradi."""
+    # Mahsulot va Sotuvchi nomlarini olish (ikkala jadval bitta yuklanishdan)
+    seller_names, product_names = resolve_names([seller_id], [product_id])
+    seller_name, product_name = seller_names[seller_id], product_names[product_id]
+
+    new_row = build_stock_row(seller_name, product_name, quantity, price)
+    return _submit_ledger_row(SHEET_NAMES["STOCK"], new_row)
+
 def add_stock_to_seller(seller_id, product_id, quantity, price):
     """Sotuvchiga berilgan tovarni Sheetsdagi Stok varag'iga yozadi (Stock Issue FSM uchun)."""
-    spreadsheet = get_sheets_client()
-    if not spreadsheet: return False
-    
     try:
-        # Mahsulot va Sotuvchi nomlarini olish
-        seller_name = get_seller_name_by_id(seller_id)
-        product_name = get_product_name_by_id(product_id)
-        
-        worksheet = get_or_create_worksheet(
-            spreadsheet, 
-            SHEET_NAMES["STOCK"], 
-            # YANGILANGAN SARLAVHA: IDlar o'rniga Ism va Nomi
-            header_row=["ID", "Sotuvchi Ismi", "Mahsulot Nomi", "Kilogrammi", "Narxi", "Jami Narx", "Sana"]
-        )
-        
-        total_price = float(price) * int(quantity)
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
-        
-        # Qator tuzilishi: [ID, Sotuvchi Ismi (1), Mahsulot Nomi (2), Kilogrammi (3), Narxi (4), Jami Narx (5), Sana (6)]
-        new_row = [
-            "", # ID 
-            seller_name,    # Nom kiritildi
-            product_name,   # Nom kiritildi
-            quantity,  
-            price,     
-            total_price,
-            current_date
-        ]
-        
-        worksheet.append_row(new_row)
-        return True
+        return queue_stock_to_seller(seller_id, product_id, quantity, price).result(timeout=LEDGER_WRITE_TIMEOUT)
     except Exception as e:
         logging.error(f"Stok ma'lumotini yozishda xato: {e}")
         return False
 
+class _StockBalances(_LedgerView):
+    """Sotuvchi -> {Mahsulot Nomi: [Kilogrammi, oxirgi Narxi]} qoldiqlar jadvali.
+    Stok varag'idan bir marta hisoblanadi va har bir yangi stok qatorida
+    (savdodagi manfiy qatorlar ham) joyida yangilanadi."""
+    def reset(self):
+        self.balances = {}
+
+    def apply(self, rows):
+        # Row formati: [ID(0), Sotuvchi Ismi(1), Mahsulot Nomi(2), Kilogrammi(3), Narxi(4), Jami Narx(5), Sana(6)]
+        for row in rows:
+            if len(row) < 5: continue
+            try:
+                quantity = int(row[3]) # Kilogrammi 3-indeksda
+            except ValueError:
+                continue
+            balance = self.balances.setdefault(row[1], {}).setdefault(row[2], [0, 0])
+            balance[0] += quantity
+            balance[1] = row[4]        # Narxi 4-indeksda (oxirgi qator narxi)
+
+    def seller_stock(self, seller_name):
+        """Sotuvchidagi musbat qoldiqlarni {Mahsulot Nomi: (Kilogrammi, Narxi)} ko'rinishida qaytaradi."""
+        with self._lock:
+            products = self.balances.get(seller_name, {})
+            return {name: (quantity, price)
+                    for name, (quantity, price) in sorted(products.items())
+                    if quantity > 0}
+
+def _current_stock_balances(spreadsheet):
+    """Joriy davr varag'idagi qoldiqlar (davr boshidagi qoldiqlar o'tkazma qatorlarida)."""
+    balances = _partition_view(_StockBalances, ledger_sheet(SHEET_NAMES["STOCK"]))
+    balances.ensure_loaded(spreadsheet)
+    return balances
+
 def get_seller_stock(seller_id):
-    """Sotuvchi IDsi bo'yicha berilgan barcha tovarlarni qaytaradi va guruhlaydi (Stock View uchun)."""
+    """Sotuvchi IDsi bo'yicha undagi tovarlar qoldig'ini qaytaradi (Stock View uchun).
+    Natija xotiradagi qoldiqlar jadvalidan olinadi, butun Stok varag'i qayta o'qilmaydi."""
     spreadsheet = get_sheets_client()
     if not spreadsheet: return None
-    
+
     try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["STOCK"])
-        all_stock = worksheet.get_all_values()[1:] 
-        
         # Sotuvchi IDsi bo'yicha nomni olish
         seller_name = get_seller_name_by_id(seller_id)
         if not seller_name or seller_name == str(seller_id):
-             logging.warning(f"ID {seller_id} uchun sotuvchi nomi topilmadi. Filtrlanmasdan qaytariladi.")
+             logging.warning(f"ID {seller_id} uchun sotuvchi nomi topilmadi.")
              # Agar ism topilmasa, bo'sh qaytarish mantiqiyroq
-             return None 
+             return None
 
-        # Yangi Row formati: [ID(0), Sotuvchi Ismi(1), Mahsulot Nomi(2), Kilogrammi(3), Narxi(4), Jami Narx(5), Sana(6)]
-        
-        # 1. Tanlangan sotuvchining tovarlarini filtrlash (Ism bo'yicha filtrlash)
-        # Sotuvchi Ismi 1-indeksda joylashgan
-        seller_stock = [row for row in all_stock if len(row) > 1 and row[1] == seller_name]
-        
-        if not seller_stock:
-            return None
+        # Faqat musbat qoldiqli tovarlar, kaliti Mahsulot Nomi
+        grouped_stock = _current_stock_balances(spreadsheet).seller_stock(seller_name)
+        return grouped_stock or None
 
-        # 2. Mahsulot Nomi (index 2) bo'yicha guruhlash va Kilogrammini hisoblash
-        seller_stock.sort(key=lambda x: x[2]) 
-        
-        grouped_stock = {}
-        for key, group in itertools.groupby(seller_stock, key=lambda x: x[2]):
-            total_quantity = 0
-            price = 0
-            for item in group:
-                try:
-                    total_quantity += int(item[3])  # Kilogrammi 3-indeksda
-                    price = item[4]                 # Narxi 4-indeksda
-                except ValueError:
-                    continue
-            
-            # Faqat musbat sonli tovarlarni qaytarish
-            if total_quantity > 0:
-                # Key Mahsulot Nomi bo'ladi
-                grouped_stock[key] = (total_quantity, price) 
-            
-        return grouped_stock
-        
     except Exception as e:
         logging.error(f"Sotuvchi stokini olishda xato: {e}")
         return None
 
+def get_seller_stock_view(seller_id):
+    """Stok ko'rinishi uchun tayyor ma'lumot: {'seller_name': Ism, 'items': [(Mahsulot Nomi, Kilogrammi, Narxi), ...]}.
+    Stok varag'ida mahsulot nomlari saqlanadi, shuning uchun har bir qator uchun
+    qo'shimcha nom qidirish kerak emas. Xato bo'lsa None qaytaradi."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return None
+
+    try:
+        seller_names, _ = resolve_names(seller_ids=[str(seller_id)])
+        seller_name = seller_names[str(seller_id)]
+        if seller_name == str(seller_id):
+            logging.warning(f"ID {seller_id} uchun sotuvchi nomi topilmadi.")
+            return {'seller_name': "Noma'lum sotuvchi", 'items': []}
+
+        balances = _current_stock_balances(spreadsheet)
+        items = [(product_name, quantity, price)
+                 for product_name, (quantity, price) in balances.seller_stock(seller_name).items()]
+        return {'seller_name': seller_name, 'items': items}
+    except Exception as e:
+        logging.error(f"Sotuvchi stokini olishda xato: {e}")
+        return None
+
+# --- STOK JURNALINI IXCHAMLASH ---
+# Har bir savdo Stokka manfiy qator qo'shadi, shuning uchun varaq haqiqiy tovar berishdan
+# ikki barobar tez o'sadi. Ixchamlashda cutoff sanasigacha bo'lgan qatorlar har bir
+# sotuvchi/mahsulot uchun bitta qoldiq qatoriga (ID ustunida SNAPSHOT_MARKER) yig'iladi,
+# asl qatorlar esa Stok_arxiv varag'iga ko'chiriladi. Shundan keyin qoldiqlarni o'qish
+# barcha tarixiy yozuvlarga emas, faol tovarlar soniga bog'liq bo'ladi.
+# Davr boshidagi o'tkazma qatorlari joyida qoladi (ular o'zi qoldiq); avvalgi
+# ixchamlashdan qolgan qoldiq qatorlari esa qayta yig'iladi, lekin arxivga ko'chirilmaydi.
+# O'qish va qoldiqlarni hisoblash qulfsiz bajariladi (yangi qatorlar faqat oxiriga
+# qo'shiladi, almashtirish esa bitta atomar so'rov). Arxivga esa Stok almashtirilib,
+# tekshiruvdan o'tgandan keyingina yoziladi, shuning uchun qayta urinish qatorlarni
+# arxivda takrorlamaydi.
+
+SNAPSHOT_MARKER = "QOLDIQ"
+
+_compaction_lock = threading.Lock() # bir vaqtda faqat bitta ixchamlash
+_archive_backlog = []               # arxivga yozilmay qolgan qatorlar (keyingi ixchamlashda yoziladi)
+
+def is_snapshot_row(row):
+    """Ixchamlashda yig'ilgan qoldiq qatorimi (ID ustunida SNAPSHOT_MARKER)."""
+    return bool(row) and str(row[0]) == SNAPSHOT_MARKER
+
+def _cell_number(value):
+    """Varaqdan o'qilgan matnni iloji bo'lsa songa aylantiradi ('12000' -> 12000)."""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            continue
+    return value
+
+def _stock_totals(rows):
+    """Qatorlardan {(Sotuvchi Ismi, Mahsulot Nomi): [Kilogrammi, oxirgi Narxi, Jami Narx]}."""
+    totals = {}
+    for row in rows:
+        if len(row) < 5: continue
+        try:
+            quantity = int(row[3])
+        except ValueError:
+            continue
+        total = totals.setdefault((str(row[1]), str(row[2])), [0, "", 0.0])
+        total[0] += quantity
+        total[1] = str(row[4])
+        try:
+            total[2] += float(row[5]) if len(row) > 5 else 0.0
+        except ValueError:
+            pass
+    return totals
+
+def _balances(rows):
+    """Tekshirish uchun qoldiqlar: {(Sotuvchi Ismi, Mahsulot Nomi): (Kilogrammi, Narxi, Jami Narx)}
+    (kilogrammi ham, jami narxi ham nol bo'lganlarisiz)."""
+    return {key: (quantity, _cell_text(_cell_number(price)), round(total, 2))
+            for key, (quantity, price, total) in _stock_totals(rows).items()
+            if quantity != 0 or round(total, 2) != 0}
+
+def _same_balances(left, right):
+    """Ikki qoldiq jadvali bir xilmi (jami narx qo'shish tartibidagi yaxlitlash farqisiz)."""
+    return left.keys() == right.keys() and all(
+        left[key][:2] == right[key][:2] and abs(left[key][2] - right[key][2]) < 0.01 for key in left)
+
+def _snapshot_rows(rows, cutoff):
+    """Qatorlarni har bir sotuvchi/mahsulot uchun bitta qoldiq qatoriga yig'adi. Kilogrammi ham,
+    jami narxi ham nol bo'lganlari tushib qoladi (get_stock_report jami narxi o'zgarmasin)."""
+    created = f"{cutoff.isoformat()} 23:59"
+    return [[SNAPSHOT_MARKER, seller_name, product_name, quantity, _cell_number(price), round(total, 2), created]
+            for (seller_name, product_name), (quantity, price, total) in sorted(_stock_totals(rows).items())
+            if quantity != 0 or round(total, 2) != 0]
+
+def _grid_rows(rows):
+    return [{"values": [_cell_data(v) for v in row]} for row in rows]
+
+def _replace_rows_requests(sheet_id, first, old_count, new_rows):
+    """Varaqning first-ma'lumot qatoridan boshlanadigan old_count ta qatorini new_rows bilan
+    almashtiradigan batch_update so'rovlari (keyingi qatorlar yuqoriga/pastga suriladi)."""
+    start = first + 1 # 0-qator sarlavha
+    requests = []
+    if len(new_rows) > old_count:
+        requests.append({"insertDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                                       "startIndex": start + old_count,
+                                                       "endIndex": start + len(new_rows)}}})
+    if new_rows:
+        requests.append({"updateCells": {"start": {"sheetId": sheet_id, "rowIndex": start, "columnIndex": 0},
+                                         "rows": _grid_rows(new_rows), "fields": "userEnteredValue"}})
+    if len(new_rows) < old_count:
+        requests.append({"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                                       "startIndex": start + len(new_rows),
+                                                       "endIndex": start + old_count}}})
+    return requests
+
+def _archive_rows(spreadsheet, rows):
+    """Qatorlarni (va avval yozilmay qolganlarini) Stok_arxiv ga qo'shadi. Xato bo'lsa, qatorlar
+    keyingi ixchamlashda qayta yozish uchun saqlab qo'yiladi. _compaction_lock ostida chaqiriladi."""
+    rows = _archive_backlog + rows
+    _archive_backlog.clear()
+    if not rows: return
+    try:
+        archive = get_or_create_worksheet(spreadsheet, SHEET_NAMES["STOCK_ARCHIVE"], STOCK_HEADER)
+        scheduler.call("batch_update", spreadsheet.batch_update,
+                       {"requests": [{"appendCells": {"sheetId": archive.id, "rows": _grid_rows(rows),
+                                                      "fields": "userEnteredValue"}}]})
+    except Exception as e:
+        _archive_backlog.extend(rows)
+        logging.error(f"'{SHEET_NAMES['STOCK_ARCHIVE']}' ga {len(rows)} qator yozishda xato (keyingi "
+                      f"ixchamlashda qayta urinamiz): {e}")
+
+def compact_stock(cutoff, sheet_name=None):
+    """Stok varag'ining (standart: joriy davr) cutoff (date) kunigacha bo'lgan qatorlarini qoldiq
+    qatorlariga yig'adi va asl qatorlarni Stok_arxiv ga ko'chiradi. Qatorlar vaqt bo'yicha
+    qo'shilgani uchun varaq boshidan sanasi cutoff dan keyin (yoki o'qilmaydigan) bo'lgan
+    birinchi qatorgacha yig'iladi. Yozishdan oldin va keyin qoldiqlar solishtiriladi; yozuvdan
+    keyin farq chiqsa, asl qatorlar qaytariladi (arxivga hech narsa yozilmaydi).
+    {'sheet', 'compacted', 'snapshots', 'archived'} qaytaradi, xato bo'lsa None."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return None
+
+    try:
+        sheet_name = sheet_name or ledger_sheet(SHEET_NAMES["STOCK"])
+        with _compaction_lock:
+            writer = _ledger_writers.get(sheet_name)
+            if writer is not None:
+                writer.flush() # Navbatdagi qatorlar ham hisobga olinsin
+            worksheet = get_worksheet(spreadsheet, sheet_name)
+            rows = _read_values(spreadsheet, sheet_name)
+
+            first = 0
+            while first < len(rows) and is_carry_row(rows[first]):
+                first += 1
+            end = first
+            cutoff_day = cutoff.toordinal()
+            while end < len(rows) and len(rows[end]) > 6:
+                day = _parse_day(rows[end][6])
+                if day is None or day > cutoff_day: break
+                end += 1
+
+            folded = rows[first:end]
+            snapshots = _snapshot_rows(folded, cutoff)
+            archived = [row for row in folded if not is_snapshot_row(row)]
+            result = {'sheet': sheet_name, 'compacted': len(folded), 'snapshots': len(snapshots), 'archived': len(archived)}
+            if not archived or len(snapshots) >= len(folded):
+                _archive_rows(spreadsheet, []) # Avval yozilmay qolganlari
+                return dict(result, compacted=0, snapshots=0, archived=0) # Yig'adigan narsa yo'q
+
+            # 1-tekshiruv: qoldiq qatorlari yig'ilgan qatorlar bilan bir xil qoldiq beradimi
+            if not _same_balances(_balances(snapshots), _balances(folded)):
+                raise ValueError("qoldiq qatorlari asl qatorlar qoldig'iga mos kelmadi")
+
+            # Almashtirish bitta atomar so'rovda; shu paytda qo'shilgan qatorlar oxirida qoladi
+            scheduler.call("batch_update", spreadsheet.batch_update,
+                           {"requests": _replace_rows_requests(worksheet.id, first, len(folded), snapshots)})
+
+            # Varaq boshi o'zgardi: hisoblangan holatlar keyingi so'rovda to'liq qayta o'qiladi
+            for view in _ledger_views.get(sheet_name, []):
+                with view._lock:
+                    view._loaded_at = None
+
+            # 2-tekshiruv: varaqni qayta o'qib, qoldiqlarni solishtirish (ayni paytda
+            # qo'shilgan yangi qatorlar ikkala tomonga ham qo'shiladi)
+            after = _read_values(spreadsheet, sheet_name)
+            kept = first + len(snapshots)
+            appended = after[len(rows) - len(folded) + len(snapshots):]
+            prefix_ok = [_row_key(row) for row in after[first:kept]] == \
+                        [_row_key([_cell_text(v) for v in row]) for row in snapshots]
+            if not prefix_ok or not _same_balances(_balances(after), _balances(rows + appended)):
+                scheduler.call("batch_update", spreadsheet.batch_update,
+                               {"requests": _replace_rows_requests(worksheet.id, first, len(snapshots), folded)})
+                for view in _ledger_views.get(sheet_name, []):
+                    with view._lock:
+                        view._loaded_at = None
+                logging.error(f"'{sheet_name}' ixchamlangandan keyin qoldiqlar mos kelmadi, asl qatorlar qaytarildi.")
+                return None
+
+            # Stok almashtirilgandan keyingina arxivga (xato bo'lsa keyinroq qayta yoziladi)
+            _archive_rows(spreadsheet, archived)
+
+        logging.info(f"'{sheet_name}' ixchamlandi: {len(folded)} qator {len(snapshots)} ta qoldiq qatoriga yig'ildi, "
+                     f"{len(archived)} qator arxivga ko'chirildi.")
+        return result
+    except Exception as e:
+        logging.error(f"Stok jurnalini ixchamlashda xato: {e}")
+        return None
+
 # ==============================================================================
 # V. SAVDO (SALES) FUNKSIYALARI (IDlar bilan qoldirildi)
 # ==============================================================================
 
+def build_sale_row(seller_id, product_id, quantity, price):
+    """Savdolar varag'i uchun yangi qator tuzadi."""
+    total_price = float(price) * int(quantity)
+    current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+    
+    # Yangi qator tuzilishi: [ID, Sotuvchi(1), Mahsulot ID(2), Kilogrammi(3), Narxi(4), Jami Tushum(5), Sana(6)]
+    new_row = [
+        "", # ID (Index 0)
+        seller_id, # Sotuvchi ID (Index 1)
+        product_id, # Mahsulot ID (Index 2)
+        quantity, # Kilogrammi (Index 3)
+        price, # Narxi (Index 4)
+        total_price, # Jami Tushum (Index 5)
+        current_date # Sana (Index 6) - Oxiriga ko'chirildi
+    ]
+    return new_row
+
+def queue_sale(seller_id, product_id, quantity, price):
+    """Savdo qatorini yozish navbatiga qo'yadi va yozilganda bajariladigan Future qaytaradi."""
+    new_row = build_sale_row(seller_id, product_id, quantity, price)
+    return _submit_ledger_row(SHEET_NAMES["SALES"], new_row)
+
 def add_sale(seller_id, product_id, quantity, price):
     """Sotilgan tovarni Sheetsdagi SALES varag'iga yozadi."""
-    spreadsheet = get_sheets_client()
-    if not spreadsheet: return False
-    
     try:
-        worksheet = get_or_create_worksheet(
-            spreadsheet, 
-            SHEET_NAMES["SALES"], 
-            # SAVDO VARAG'I IDlar bilan qoldi, chunki u hisobotlar uchun muhim
-            header_row=["ID", "Sotuvchi", "Mahsulot ID", "Kilogrammi", "Narxi", "Jami Tushum", "Sana"]
-        )
-        
-        total_price = float(price) * int(quantity)
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
-        
-        # Yangi qator tuzilishi: [ID, Sotuvchi(1), Mahsulot ID(2), Kilogrammi(3), Narxi(4), Jami Tushum(5), Sana(6)]
-        new_row = [
-            "", # ID (Index 0)
-            seller_id, # Sotuvchi ID (Index 1)
-            product_id, # Mahsulot ID (Index 2)
-            quantity, # Kilogrammi (Index 3)
-            price, # Narxi (Index 4)
-            total_price, # Jami Tushum (Index 5)
-            current_date # Sana (Index 6) - Oxiriga ko'chirildi
-        ]
-        
-        worksheet.append_row(new_row)
-        return True
+        return queue_sale(seller_id, product_id, quantity, price).result(timeout=LEDGER_WRITE_TIMEOUT)
     except Exception as e:
         logging.error(f"Savdo ma'lumotini yozishda xato: {e}")
         return False
@@ -416,76 +1690,230 @@ def add_sale(seller_id, product_id, quantity, price):
 # VI. HISOBOTLAR (REPORTS) FUNKSIYALARI
 # ==============================================================================
 
-def get_seller_sales_summary(seller_id, start_date=None, end_date=None):
-    """
-    Belgilangan sotuvchining (seller_id) savdo natijalarini (jami kilogrammi va tushumi)
-    ko'rsatilgan sanalar oralig'ida hisoblaydi.
-    """
-    spreadsheet = get_sheets_client()
-    if not spreadsheet: return {'total_quantity': 0, 'total_revenue': 0}
+def _parse_day(date_str):
+    """'YYYY-MM-DD' yoki 'YYYY-MM-DD HH:MM' matnidan kun raqamini (date.toordinal) oladi."""
+    try:
+        return date.fromisoformat(date_str.strip().split(' ')[0]).toordinal()
+    except (ValueError, AttributeError):
+        return None
 
-    # Sanani parselash yordamchi funksiyasi
-    def parse_date(date_str):
-        try:
-            return datetime.strptime(date_str, "%Y-%m-%d %H:%M")
-        except ValueError:
-            # Agar format mos kelmasa, vaqtni e'tiborga olmasdan faqat sanani olish
-            try:
-                return datetime.strptime(date_str.split(' ')[0], "%Y-%m-%d")
-            except:
-                return None
-    
-    # Kiritilgan sana oralig'ini tayyorlash
-    start_dt = parse_date(start_date) if start_date else None
-    end_dt = parse_date(end_date) if end_date else None
-    
-    total_quantity = 0
-    total_revenue = 0.0
+class _SellerDailySales:
+    """Bitta sotuvchining kunlik savdolari: saralangan kunlar va ularning yig'indilari."""
+    def __init__(self):
+        self.days = []          # saralangan kun raqamlari
+        self.cum_quantity = [0] # cum_quantity[i] = birinchi i kunning jami kilogrammi
+        self.cum_revenue = [0.0]
+        self.undated = [0, 0.0] # sanasi o'qilmagan qatorlar (har doim hisobga olinadi)
+        self._totals = {}       # kun -> [kilogramm, tushum]
+        self._dirty = False
 
-    try:
-        worksheet = spreadsheet.worksheet(SHEET_NAMES["SALES"])
-        all_sales = worksheet.get_all_values()[1:]
-        
-        # Savdo Row formati IDlar bilan: [ID(0), Sotuvchi ID(1), Mahsulot ID(2), Kilogrammi(3), Narxi(4), Jami Tushum(5), Sana(6)]
-        
-        for row in all_sales:
-            if len(row) < 7: 
-                continue
+    def add(self, day, quantity, revenue):
+        if day is None:
+            self.undated[0] += quantity
+            self.undated[1] += revenue
+            return
+        totals = self._totals.setdefault(day, [0, 0.0])
+        totals[0] += quantity
+        totals[1] += revenue
+        if self._dirty: return
+        if self.days and self.days[-1] == day:
+            # Odatdagi holat: bugungi savdo oxirgi kunga qo'shiladi
+            self.cum_quantity[-1] += quantity
+            self.cum_revenue[-1] += revenue
+        elif not self.days or self.days[-1] < day:
+            self.days.append(day)
+            self.cum_quantity.append(self.cum_quantity[-1] + quantity)
+            self.cum_revenue.append(self.cum_revenue[-1] + revenue)
+        else:
+            # O'tgan kunga qator qo'shildi: yig'indilar keyingi so'rovda qayta quriladi
+            self._dirty = True
 
-            current_seller_id = row[1] # Sotuvchi ID 1-indeksda
-            sale_date_str = row[6]      # Sana 6-indeksda
-            
-            # 1. Sotuvchini filtrlash (ID bo'yicha)
-            if current_seller_id != str(seller_id):
-                continue
+    def _rebuild(self):
+        self.days = sorted(self._totals)
+        self.cum_quantity = [0]
+        self.cum_revenue = [0.0]
+        for day in self.days:
+            quantity, revenue = self._totals[day]
+            self.cum_quantity.append(self.cum_quantity[-1] + quantity)
+            self.cum_revenue.append(self.cum_revenue[-1] + revenue)
+        self._dirty = False
 
-            # 2. Sanani filtrlash
-            sale_dt = parse_date(sale_date_str)
-            if sale_dt:
-                if start_dt and sale_dt < start_dt:
-                    continue
-                if end_dt and sale_dt > end_dt:
-                    continue
-            
-            # 3. Hisoblash
+    def range_totals(self, start_day=None, end_day=None):
+        """[start_day, end_day] oralig'idagi (ikkala chegara ham kiradi) jami kilogramm va tushum."""
+        if self._dirty:
+            self._rebuild()
+        lo = bisect.bisect_left(self.days, start_day) if start_day is not None else 0
+        hi = bisect.bisect_right(self.days, end_day) if end_day is not None else len(self.days)
+        if hi < lo: hi = lo
+        quantity = self.cum_quantity[hi] - self.cum_quantity[lo] + self.undated[0]
+        revenue = self.cum_revenue[hi] - self.cum_revenue[lo] + self.undated[1]
+        return quantity, revenue
+
+class _SalesRollup(_LedgerView):
+    """Savdolar varag'ining sotuvchi va kun bo'yicha yig'indilari.
+    Varaqdan bir marta hisoblanadi va har bir yangi savdo qatorida yangilanadi."""
+    def reset(self):
+        self.sellers = {}
+
+    def apply(self, rows):
+        # Savdo Row formati IDlar bilan: [ID(0), Sotuvchi ID(1), Mahsulot ID(2), Kilogrammi(3), Narxi(4), Jami Tushum(5), Sana(6)]
+        for row in rows:
+            if len(row) < 7 or is_carry_row(row): continue # O'tkazma qatorlari savdo emas
             try:
                 quantity = int(row[3]) # Kilogrammi 3-indeksda
                 revenue = float(row[5]) # Jami Tushum 5-indeksda
-                
-                total_quantity += quantity
-                total_revenue += revenue
             except ValueError:
                 logging.warning(f"Savdo qatoridagi miqdor yoki tushum noto'g'ri formatda: {row}")
                 continue
-                
+            daily = self.sellers.setdefault(row[1], _SellerDailySales())
+            daily.add(_parse_day(row[6]), quantity, revenue)
+
+    def summary(self, seller_id, start_day=None, end_day=None):
+        with self._lock:
+            daily = self.sellers.get(str(seller_id))
+            if daily is None: return 0, 0.0
+            return daily.range_totals(start_day, end_day)
+
+def get_seller_sales_summary(seller_id, start_date=None, end_date=None):
+    """
+    Belgilangan sotuvchining (seller_id) savdo natijalarini (jami kilogrammi va tushumi)
+    ko'rsatilgan sanalar oralig'ida hisoblaydi. Sanalar 'YYYY-MM-DD' (vaqt qismi e'tiborga
+    olinmaydi), ikkala chegaraviy kun ham oraliqqa kiradi.
+    Javob xotiradagi kunlik yig'indilardan olinadi (varaq qayta o'qilmaydi); faqat
+    oraliqqa tegishli davr varaqlari ko'riladi.
+    """
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return {'total_quantity': 0, 'total_revenue': 0}
+
+    # Kiritilgan sana oralig'ini tayyorlash
+    start_day = _parse_day(start_date) if start_date else None
+    end_day = _parse_day(end_date) if end_date else None
+
+    try:
+        total_quantity, total_revenue = 0, 0.0
+        for sheet_name in ledger_sheets_for_range(SHEET_NAMES["SALES"], start_day, end_day):
+            rollup = _partition_view(_SalesRollup, sheet_name)
+            rollup.ensure_loaded(spreadsheet)
+            quantity, revenue = rollup.summary(seller_id, start_day, end_day)
+            total_quantity += quantity
+            total_revenue += revenue
         return {
             'total_quantity': total_quantity,
             'total_revenue': round(total_revenue, 2)
         }
-        
-    except gspread.WorksheetNotFound:
-        logging.warning(f"'{SHEET_NAMES['SALES']}' varag'i topilmadi. Hisobot bo'sh.")
-        return {'total_quantity': 0, 'total_revenue': 0}
     except Exception as e:
         logging.error(f"Savdo hisobotini olishda xato: {e}")
         return {'total_quantity': 0, 'total_revenue': 0}
+
+class _LedgerColumnsView(_LedgerView):
+    """Jurnalning ustunli nusxasi (analytics.LedgerColumns): barcha sotuvchilar bo'yicha
+    hisobotlar shundan bitta o'tishda guruhlanadi. Boshqa jurnal holatlari kabi yangi
+    qatorlar joyida qo'shiladi."""
+    def reset(self):
+        self.columns = analytics.LedgerColumns()
+
+    def apply(self, rows):
+        # Savdolardagi o'tkazma qatorlari faqat ma'lumot uchun, Stokdagilari esa qoldiq
+        if ledger_base(self.sheet_name) == SHEET_NAMES["SALES"]:
+            rows = [row for row in rows if not is_carry_row(row)]
+        self.columns.append_rows(rows)
+
+    def group_by(self, keys, start_day=None, end_day=None):
+        with self._lock:
+            return self.columns.group_by(keys, start_day, end_day)
+
+def get_sales_report(group_by=("seller",), start_date=None, end_date=None):
+    """Barcha savdolarni group_by (analytics.GROUP_KEYS: seller, product, day) bo'yicha guruhlaydi.
+    {(Sotuvchi ID, Mahsulot ID, 'YYYY-MM-DD' - tanlanganlari): (jami kilogramm, jami tushum)} qaytaradi."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return {}
+
+    start_day = analytics.epoch_day(start_date) if start_date else None
+    end_day = analytics.epoch_day(end_date) if end_date else None
+
+    try:
+        sheet_names = ledger_sheets_for_range(SHEET_NAMES["SALES"], _parse_day(start_date) if start_date else None,
+                                              _parse_day(end_date) if end_date else None)
+        report = {}
+        for sheet_name in sheet_names:
+            columns = _partition_view(_LedgerColumnsView, sheet_name)
+            columns.ensure_loaded(spreadsheet)
+            for key, (quantity, amount) in columns.group_by(group_by, start_day, end_day).items():
+                total = report.get(key, (0, 0.0))
+                report[key] = (total[0] + quantity, round(total[1] + amount, 2))
+        return report
+    except Exception as e:
+        logging.error(f"Umumiy savdo hisobotini olishda xato: {e}")
+        return {}
+
+def get_stock_report(group_by=("seller", "product")):
+    """Barcha sotuvchilarning stok qoldiqlari: {(Sotuvchi Ismi, Mahsulot Nomi): (kilogramm, jami narx)}."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return {}
+
+    try:
+        # Joriy davr varag'i o'tkazma qatorlari bilan barcha qoldiqlarni o'z ichiga oladi
+        columns = _partition_view(_LedgerColumnsView, ledger_sheet(SHEET_NAMES["STOCK"]))
+        columns.ensure_loaded(spreadsheet)
+        return columns.group_by(group_by)
+    except Exception as e:
+        logging.error(f"Umumiy stok hisobotini olishda xato: {e}")
+        return {}
+
+
+# ==============================================================================
+# VII. BIRGALIKDAGI AMALLAR (Bitta so'rovda bir nechta varaqqa yozish)
+# ==============================================================================
+
+def queue_record_sale(seller_id, product_id, quantity, price):
+    """record_sale qatorlarini yozish navbatiga qo'yadi va yozilganda bajariladigan Future
+    qaytaradi. Bir vaqtda kelgan savdolar bitta batch_update ga birlashtiriladi."""
+    seller_names, product_names = resolve_names([seller_id], [product_id])
+    seller_name, product_name = seller_names[seller_id], product_names[product_id]
+
+    sheets = _acquire_ledgers((SHEET_NAMES["SALES"], SHEET_NAMES["STOCK"]))
+    try:
+        uow = UnitOfWork()
+        uow.append(sheets[SHEET_NAMES["SALES"]], SALES_HEADER,
+                   build_sale_row(seller_id, product_id, quantity, price))
+        uow.append(sheets[SHEET_NAMES["STOCK"]], STOCK_HEADER,
+                   build_stock_row(seller_name, product_name, -int(quantity), price))
+        future = uow.submit()
+    except Exception:
+        _release_ledgers(sheets)
+        raise
+    future.add_done_callback(lambda _: _release_ledgers(sheets))
+    return future
+
+def record_sale(seller_id, product_id, quantity, price):
+    """Savdoni Savdolar varag'iga yozadi va shu miqdorni Stokdan ayiradi (manfiy qator).
+    Ikkala qator bitta so'rovda yoziladi: yoki ikkalasi ham, yoki hech biri."""
+    try:
+        return queue_record_sale(seller_id, product_id, quantity, price).result(timeout=LEDGER_WRITE_TIMEOUT)
+    except Exception as e:
+        logging.error(f"Savdoni yozishda xato: {e}")
+        return False
+
+def issue_new_product_stock(seller_id, product_name, price, quantity):
+    """Yangi mahsulotni Mahsulotlar varag'iga qo'shadi va uni sotuvchiga beradi (Stok).
+    Ikkala qator bitta so'rovda yoziladi. Yangi mahsulot ID sini qaytaradi (xatoda None)."""
+    spreadsheet = get_sheets_client()
+    if not spreadsheet: return None
+
+    try:
+        get_or_create_worksheet(spreadsheet, SHEET_NAMES["PRODUCTS"], PRODUCTS_HEADER)
+        _prefetch_tables(SHEET_NAMES["SELLERS"], SHEET_NAMES["PRODUCTS"])
+        new_id = _id_allocators[SHEET_NAMES["PRODUCTS"]].allocate(spreadsheet)
+
+        seller_name = get_seller_name_by_id(seller_id)
+
+        with writing_ledgers(SHEET_NAMES["STOCK"]) as sheets:
+            uow = UnitOfWork()
+            uow.append(SHEET_NAMES["PRODUCTS"], PRODUCTS_HEADER, [new_id, product_name, price])
+            uow.append(sheets[SHEET_NAMES["STOCK"]], STOCK_HEADER,
+                       build_stock_row(seller_name, product_name, quantity, price))
+            uow.commit()
+        return new_id
+    except Exception as e:
+        logging.error(f"Yangi mahsulotni sotuvchiga berishda xato: {e}")
+        return None
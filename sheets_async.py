@@ -0,0 +1,111 @@
+# sheets_async.py
+# Ma'lumotlar ombori (storage.get_backend()) funksiyalarining asinxron (async) qobig'i.
+# gspread va sqlite3 sinxron chaqiruvlar qiladi; ularni to'g'ridan-to'g'ri handler ichida
+# chaqirish butun event loopni to'xtatib qo'yadi. Shuning uchun har bir chaqiruv
+# cheklangan thread-pool da bajariladi va handlerlar uni `await` qiladi.
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import scheduler
+from storage import get_backend
+
+# Bir vaqtda Sheetsga ketadigan so'rovlar soni (thread-pool hajmi)
+SHEETS_WORKERS = int(os.environ.get('SHEETS_WORKERS', 8))
+
+_executor = ThreadPoolExecutor(max_workers=SHEETS_WORKERS, thread_name_prefix="sheets")
+
+
+async def run_sync(func, *args, **kwargs):
+    """Sinxron funksiyani thread-pool da bajaradi va natijasini qaytaradi."""
+    loop = asyncio.get_running_loop()
+    # contextvars (masalan, so'rov ustuvorligi) thread ichiga ham o'tishi uchun
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+def _async(name, priority=None):
+    """Tanlangan ombordagi shu nomli metodni async funksiyaga aylantiradi.
+    priority berilsa, uning Sheets so'rovlari shu ustuvorlik bilan navbatga turadi."""
+    async def wrapper(*args, **kwargs):
+        if priority is None:
+            return await run_sync(metrics.track_storage_call, name, getattr(get_backend(), name), *args, **kwargs)
+        with scheduler.priority(priority):
+            return await run_sync(metrics.track_storage_call, name, getattr(get_backend(), name), *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+
+async def _await_ledger_write(function, queue_func, error_text, *args):
+    """Jurnal qatorini navbatga qo'yadi va u yozilguncha kutadi.
+    Kutish paytida thread band qilinmaydi, shuning uchun bir vaqtdagi ko'p
+    so'rovlar bitta append_rows ga birlashadi."""
+    with metrics.storage_seconds.time(function=function):
+        try:
+            future = await run_sync(queue_func, *args)
+            result = await asyncio.wrap_future(future)
+        except Exception as e:
+            logging.error(f"{error_text}: {e}")
+            result = False
+    metrics.storage_calls.inc(function=function, status="ok" if result else "error")
+    return result
+
+
+def shutdown():
+    """Navbatdagi yozuvlarni yakunlaydi va thread-pool ni yopadi (bot to'xtaganda)."""
+    get_backend().shutdown()
+    _executor.shutdown(wait=False)
+
+
+# --- SOTUVCHILAR ---
+get_all_sellers = _async('get_all_sellers', scheduler.PRIORITY_ADMIN)
+get_sellers_page = _async('get_sellers_page', scheduler.PRIORITY_ADMIN)
+get_seller_name_by_id = _async('get_seller_name_by_id')
+add_seller = _async('add_seller')
+get_seller_by_id = _async('get_seller_by_id')
+find_seller_by_id = _async('find_seller_by_id')
+get_seller_by_password = _async('get_seller_by_password')
+
+# --- MAHSULOTLAR ---
+get_all_products = _async('get_all_products', scheduler.PRIORITY_ADMIN)
+get_products_page = _async('get_products_page', scheduler.PRIORITY_ADMIN)
+add_product = _async('add_product')
+get_product_by_name = _async('get_product_by_name')
+get_product_by_id = _async('get_product_by_id')
+find_similar_products = _async('find_similar_products')
+complete_products = _async('complete_products')
+add_product_and_get_id = _async('add_product_and_get_id')
+get_product_name_by_id = _async('get_product_name_by_id')
+
+# --- STOK ---
+async def add_stock_to_seller(seller_id, product_id, quantity, price):
+    return await _await_ledger_write("add_stock_to_seller", get_backend().queue_stock_to_seller,
+                                     "Stok ma'lumotini yozishda xato", seller_id, product_id, quantity, price)
+
+get_seller_stock = _async('get_seller_stock')
+get_seller_stock_view = _async('get_seller_stock_view')
+resolve_names = _async('resolve_names')
+
+# --- SAVDO VA HISOBOTLAR ---
+async def add_sale(seller_id, product_id, quantity, price):
+    with scheduler.priority(scheduler.PRIORITY_SALE):
+        return await _await_ledger_write("add_sale", get_backend().queue_sale,
+                                         "Savdo ma'lumotini yozishda xato", seller_id, product_id, quantity, price)
+
+get_seller_sales_summary = _async('get_seller_sales_summary')
+get_sales_report = _async('get_sales_report', scheduler.PRIORITY_ADMIN)
+get_stock_report = _async('get_stock_report', scheduler.PRIORITY_ADMIN)
+
+# --- BIRGALIKDAGI AMALLAR ---
+async def record_sale(seller_id, product_id, quantity, price):
+    with scheduler.priority(scheduler.PRIORITY_SALE):
+        return await _await_ledger_write("record_sale", get_backend().queue_record_sale,
+                                         "Savdoni yozishda xato", seller_id, product_id, quantity, price)
+
+issue_new_product_stock = _async('issue_new_product_stock')
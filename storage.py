@@ -0,0 +1,875 @@
+# storage.py
+# Ma'lumotlar ombori (storage backend) interfeysi va uning ikki amalga oshirilishi:
+#   - SheetsBackend: hozirgi holat, Google Sheets asosiy baza (sheets_api orqali)
+#   - SqliteBackend: mahalliy SQLite (WAL rejimi) asosiy baza; Google Sheets esa
+#     fonda yangilanib boradigan hisobot (Sotuvchilar/Mahsulotlar/Stok/Savdolar varaqlari)
+# Qaysi biri ishlatilishi STORAGE_BACKEND ENV o'zgaruvchisi bilan tanlanadi.
+
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+
+import fuzzy
+import paging
+import scheduler
+import sheets_api
+
+# --- ENV VARIABLES dan yuklash ---
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sheets') # 'sheets' yoki 'sqlite'
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'sellerbot.db')
+# Eksport navbatini Sheetsga necha soniyada bir yuborish
+SHEETS_EXPORT_INTERVAL = float(os.environ.get('SHEETS_EXPORT_INTERVAL', 5))
+SHEETS_EXPORT_BATCH_SIZE = int(os.environ.get('SHEETS_EXPORT_BATCH_SIZE', 500))
+# Stok jurnalini ixchamlash (standart: o'chirilgan). Yoqilsa, Stok varag'ining
+# STOCK_COMPACT_AGE_DAYS kundan eski qatorlari har STOCK_COMPACT_INTERVAL soatda QOLDIQ
+# qatorlariga yig'iladi va asl qatorlar Stok_arxiv varag'iga ko'chiriladi (varaq qayta
+# yoziladi). Masalan: STOCK_COMPACT_INTERVAL=24 STOCK_COMPACT_AGE_DAYS=7
+STOCK_COMPACT_INTERVAL = float(os.environ.get('STOCK_COMPACT_INTERVAL', 0))
+STOCK_COMPACT_AGE_DAYS = int(os.environ.get('STOCK_COMPACT_AGE_DAYS', 7))
+
+SHEET_NAMES = sheets_api.SHEET_NAMES
+
+
+# ==============================================================================
+# I. INTERFEYS
+# ==============================================================================
+
+class StorageBackend(abc.ABC):
+    """Bot foydalanadigan barcha ma'lumot amallari. Qatorlar sheets_api dagi kabi
+    matnlar ro'yxati ko'rinishida qaytariladi, shuning uchun handlerlar qaysi baza
+    ishlatilayotganini bilmaydi."""
+
+    def warm_up(self):
+        """Ishga tushganda bir marta chaqiriladi."""
+        return True
+
+    def shutdown(self):
+        """Bot to'xtaganda chaqiriladi (navbatdagi yozuvlarni yakunlash uchun)."""
+
+    # --- SOTUVCHILAR ---
+    @abc.abstractmethod
+    def get_all_sellers(self): ...
+    @abc.abstractmethod
+    def get_sellers_page(self, cursor=None, size=paging.LIST_PAGE_SIZE): ...
+    @abc.abstractmethod
+    def get_seller_name_by_id(self, seller_id): ...
+    @abc.abstractmethod
+    def add_seller(self, seller_data): ...
+    @abc.abstractmethod
+    def get_seller_by_id(self, seller_id): ...
+    # get_seller_by_id kabi, lekin o'qish xatosida istisno ko'taradi (None - sotuvchi yo'q)
+    @abc.abstractmethod
+    def find_seller_by_id(self, seller_id): ...
+    @abc.abstractmethod
+    def get_seller_by_password(self, password): ...
+
+    # --- MAHSULOTLAR ---
+    @abc.abstractmethod
+    def get_all_products(self): ...
+    @abc.abstractmethod
+    def get_products_page(self, cursor=None, size=paging.LIST_PAGE_SIZE): ...
+    @abc.abstractmethod
+    def add_product(self, name, price): ...
+    @abc.abstractmethod
+    def get_product_by_name(self, name): ...
+    @abc.abstractmethod
+    def get_product_by_id(self, product_id): ...
+    @abc.abstractmethod
+    def find_similar_products(self, name, limit=fuzzy.FUZZY_SUGGESTIONS): ...
+    @abc.abstractmethod
+    def complete_products(self, prefix, limit=fuzzy.FUZZY_SUGGESTIONS): ...
+    @abc.abstractmethod
+    def add_product_and_get_id(self, name, price): ...
+    @abc.abstractmethod
+    def get_product_name_by_id(self, product_id): ...
+    @abc.abstractmethod
+    def resolve_names(self, seller_ids=(), product_ids=()): ...
+
+    # --- STOK ---
+    @abc.abstractmethod
+    def add_stock_to_seller(self, seller_id, product_id, quantity, price): ...
+    @abc.abstractmethod
+    def get_seller_stock(self, seller_id): ...
+    @abc.abstractmethod
+    def get_seller_stock_view(self, seller_id): ...
+    @abc.abstractmethod
+    def compact_stock(self, cutoff):
+        """Stok varag'ining cutoff (date) gacha bo'lgan qatorlarini sotuvchi/mahsulot bo'yicha
+        qoldiq qatorlariga yig'adi (sheets_api.compact_stock). Natija lug'ati, xatoda None."""
+
+    # --- SAVDO VA HISOBOTLAR ---
+    @abc.abstractmethod
+    def add_sale(self, seller_id, product_id, quantity, price): ...
+    @abc.abstractmethod
+    def get_seller_sales_summary(self, seller_id, start_date=None, end_date=None): ...
+
+    @abc.abstractmethod
+    def get_sales_report(self, group_by=("seller",), start_date=None, end_date=None): ...
+    @abc.abstractmethod
+    def get_stock_report(self, group_by=("seller", "product")): ...
+    @abc.abstractmethod
+    def iter_ledger_rows(self, sheet_name, chunk_size, start=None, end=None):
+        """Stok/Savdolar qatorlarini varaqdagi ko'rinishda chunk_size lik bo'laklab o'qiydigan generator.
+        start/end (date) berilsa, oraliqqa tegishli bo'lmagan davrlar o'qilmasligi mumkin
+        (qatorlarni aniq filtrlash chaqiruvchida)."""
+
+    # --- BIRGALIKDAGI AMALLAR ---
+    @abc.abstractmethod
+    def record_sale(self, seller_id, product_id, quantity, price): ...
+    @abc.abstractmethod
+    def issue_new_product_stock(self, seller_id, product_name, price, quantity): ...
+
+    # Jurnal yozuvlari natijasini Future orqali beradi. Oddiy holatda yozuv darhol
+    # bajariladi; SheetsBackend esa yozuvlarni to'plab yuboradi.
+    def queue_stock_to_seller(self, seller_id, product_id, quantity, price):
+        future = Future()
+        future.set_result(self.add_stock_to_seller(seller_id, product_id, quantity, price))
+        return future
+
+    def queue_sale(self, seller_id, product_id, quantity, price):
+        future = Future()
+        future.set_result(self.add_sale(seller_id, product_id, quantity, price))
+        return future
+
+    def queue_record_sale(self, seller_id, product_id, quantity, price):
+        future = Future()
+        future.set_result(self.record_sale(seller_id, product_id, quantity, price))
+        return future
+
+
+# ==============================================================================
+# II. GOOGLE SHEETS (hozirgi asosiy baza)
+# ==============================================================================
+
+class SheetsBackend(StorageBackend):
+    """Barcha amallarni to'g'ridan-to'g'ri sheets_api ga uzatadi."""
+
+    def __init__(self):
+        self.compactor = StockCompactor(self)
+
+    def warm_up(self):
+        self.compactor.start()
+        return sheets_api.warm_up()
+
+    def shutdown(self):
+        self.compactor.stop()
+        sheets_api.flush_ledgers()
+
+    def get_all_sellers(self): return sheets_api.get_all_sellers()
+    def get_sellers_page(self, cursor=None, size=paging.LIST_PAGE_SIZE): return sheets_api.get_sellers_page(cursor, size)
+    def get_seller_name_by_id(self, seller_id): return sheets_api.get_seller_name_by_id(seller_id)
+    def add_seller(self, seller_data): return sheets_api.add_seller(seller_data)
+    def get_seller_by_id(self, seller_id): return sheets_api.get_seller_by_id(seller_id)
+    def find_seller_by_id(self, seller_id): return sheets_api.find_seller_by_id(seller_id)
+    def get_seller_by_password(self, password): return sheets_api.get_seller_by_password(password)
+
+    def get_all_products(self): return sheets_api.get_all_products()
+    def get_products_page(self, cursor=None, size=paging.LIST_PAGE_SIZE): return sheets_api.get_products_page(cursor, size)
+    def add_product(self, name, price): return sheets_api.add_product(name, price)
+    def get_product_by_name(self, name): return sheets_api.get_product_by_name(name)
+    def get_product_by_id(self, product_id): return sheets_api.get_product_by_id(product_id)
+    def find_similar_products(self, name, limit=fuzzy.FUZZY_SUGGESTIONS): return sheets_api.find_similar_products(name, limit)
+    def complete_products(self, prefix, limit=fuzzy.FUZZY_SUGGESTIONS): return sheets_api.complete_products(prefix, limit)
+    def add_product_and_get_id(self, name, price): return sheets_api.add_product_and_get_id(name, price)
+    def get_product_name_by_id(self, product_id): return sheets_api.get_product_name_by_id(product_id)
+    def resolve_names(self, seller_ids=(), product_ids=()): return sheets_api.resolve_names(seller_ids, product_ids)
+    def add_stock_to_seller(self, seller_id, product_id, quantity, price):
+        return sheets_api.add_stock_to_seller(seller_id, product_id, quantity, price)
+    def get_seller_stock(self, seller_id): return sheets_api.get_seller_stock(seller_id)
+    def get_seller_stock_view(self, seller_id): return sheets_api.get_seller_stock_view(seller_id)
+    def compact_stock(self, cutoff): return sheets_api.compact_stock(cutoff)
+
+    def add_sale(self, seller_id, product_id, quantity, price):
+        return sheets_api.add_sale(seller_id, product_id, quantity, price)
+    def get_seller_sales_summary(self, seller_id, start_date=None, end_date=None):
+        return sheets_api.get_seller_sales_summary(seller_id, start_date, end_date)
+    def get_sales_report(self, group_by=("seller",), start_date=None, end_date=None):
+        return sheets_api.get_sales_report(group_by, start_date, end_date)
+    def get_stock_report(self, group_by=("seller", "product")):
+        return sheets_api.get_stock_report(group_by)
+    def iter_ledger_rows(self, sheet_name, chunk_size, start=None, end=None):
+        sheets_api.flush_ledgers() # Navbatdagi yozuvlar ham eksportga tushsin
+        return sheets_api.iter_ledger_rows(sheet_name, chunk_size, start, end)
+
+    def record_sale(self, seller_id, product_id, quantity, price):
+        return sheets_api.record_sale(seller_id, product_id, quantity, price)
+    def issue_new_product_stock(self, seller_id, product_name, price, quantity):
+        return sheets_api.issue_new_product_stock(seller_id, product_name, price, quantity)
+
+    def queue_stock_to_seller(self, seller_id, product_id, quantity, price):
+        return sheets_api.queue_stock_to_seller(seller_id, product_id, quantity, price)
+    def queue_sale(self, seller_id, product_id, quantity, price):
+        return sheets_api.queue_sale(seller_id, product_id, quantity, price)
+    def queue_record_sale(self, seller_id, product_id, quantity, price):
+        return sheets_api.queue_record_sale(seller_id, product_id, quantity, price)
+
+
+# ==============================================================================
+# III. SQLITE (mahalliy asosiy baza) VA SHEETSGA EKSPORT
+# ==============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sellers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    region TEXT,
+    phone TEXT,
+    password TEXT,
+    created TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sellers_password ON sellers(password);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_norm TEXT NOT NULL,
+    price TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_name ON products(name_norm);
+
+CREATE TABLE IF NOT EXISTS stock (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    seller_name TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price TEXT,
+    total REAL,
+    created TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stock_seller_product ON stock(seller_name, product_name, id);
+CREATE INDEX IF NOT EXISTS idx_stock_created ON stock(created);
+
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    seller_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price TEXT,
+    total REAL NOT NULL,
+    created TEXT,
+    day TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sales_seller_day ON sales(seller_id, day);
+CREATE INDEX IF NOT EXISTS idx_sales_day ON sales(day);
+
+-- Sheetsga hali yuborilmagan qatorlar (har bir yozuv bilan bitta tranzaksiyada qo'shiladi)
+CREATE TABLE IF NOT EXISTS export_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheet_name TEXT NOT NULL,
+    row_json TEXT NOT NULL
+);
+"""
+
+_SHEET_HEADERS = {
+    SHEET_NAMES["SELLERS"]: ["ID", "Ism", "Tuman", "Telefon", "Parol", "Sana"],
+    SHEET_NAMES["PRODUCTS"]: sheets_api.PRODUCTS_HEADER,
+    SHEET_NAMES["STOCK"]: sheets_api.STOCK_HEADER,
+    SHEET_NAMES["SALES"]: sheets_api.SALES_HEADER,
+}
+
+def _text(value):
+    """Qiymatni Sheets qaytaradigan ko'rinishdagi matnga aylantiradi (12000.0 -> '12000')."""
+    if value is None: return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _row_day(date_str):
+    """'YYYY-MM-DD HH:MM' matnidan 'YYYY-MM-DD' kunini ajratadi (o'qib bo'lmasa None)."""
+    try:
+        return date.fromisoformat(str(date_str).strip().split(' ')[0]).isoformat()
+    except ValueError:
+        return None
+
+def _to_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _to_float(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite asosidagi ombor. Har bir yozuv bilan birga Sheetsga yuboriladigan qator
+    export_queue jadvaliga yoziladi; SheetsExporter ularni fonda varaqlarga qo'shadi."""
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Xotiradagi indekslar (sahifalash, fuzzy): (jadval, tur) -> (versiya, indeks).
+        # Versiya jadvalga yozuv tushganda oshadi va indeks keyingi so'rovda qayta quriladi.
+        self._table_versions = {"sellers": 0, "products": 0}
+        self._derived_indexes = {}
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+            # name_norm avvalgi normallashtirish bilan yozilgan bo'lishi mumkin: yangilash
+            conn.create_function("normalize_name", 1, sheets_api._normalize_name)
+            conn.execute("UPDATE products SET name_norm = normalize_name(name) WHERE name_norm != normalize_name(name)")
+        self.exporter = SheetsExporter(self)
+        self.compactor = StockCompactor(self)
+
+    def _connection(self):
+        """Har bir thread uchun alohida ulanish (SQLite ulanishlari threadlar orasida bo'lishilmaydi)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    def _write(self, func, changed=()):
+        """func(conn) ni bitta tranzaksiyada bajaradi (yozuvlar ketma-ket). changed dagi
+        jadvallarning versiyasi tranzaksiya tugagach, shu qulf ostida oshiriladi."""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                result = func(conn)
+            for table in changed:
+                self._table_versions[table] += 1
+            return result
+
+    def _derived_index(self, table, kind, sql, build):
+        """sql natijasidan build(qatorlar) bilan quriladigan indeks (jadval o'zgarmaguncha keshda)."""
+        version = self._table_versions[table]
+        cached = self._derived_indexes.get((table, kind))
+        if cached is None or cached[0] != version:
+            rows = [[_text(v) for v in r] for r in self._query(sql)]
+            cached = self._derived_indexes[(table, kind)] = (version, build(rows))
+        return cached[1]
+
+    def _sorted_page(self, table, sql, cursor, size):
+        """Nom bo'yicha saralangan indeksning bitta sahifasi."""
+        index = self._derived_index(table, "sorted", sql,
+                                    lambda rows: paging.SortedIndex(rows, sheets_api._name_sort_key))
+        return index.page(cursor, size)
+
+    @staticmethod
+    def _enqueue(conn, sheet_name, row):
+        conn.execute("INSERT INTO export_queue (sheet_name, row_json) VALUES (?, ?)",
+                     (sheet_name, json.dumps(row, ensure_ascii=False)))
+
+    # --- ISHGA TUSHIRISH ---
+    def warm_up(self):
+        """Baza bo'sh bo'lsa, mavjud ma'lumotlarni Sheetsdan import qiladi va eksportni boshlaydi."""
+        try:
+            if not any(self._query(f"SELECT 1 FROM {table} LIMIT 1")
+                       for table in ("sellers", "products", "stock", "sales")):
+                self.import_from_sheets()
+        except Exception as e:
+            logging.error(f"Sheetsdan SQLitega import qilishda xato: {e}")
+        self.exporter.start()
+        self.compactor.start()
+        return True
+
+    def shutdown(self):
+        self.compactor.stop()
+        self.exporter.stop()
+
+    def import_from_sheets(self):
+        """Sotuvchilar, Mahsulotlar, Stok va Savdolar varaqlarini bitta so'rov bilan o'qib,
+        SQLitega yozadi (faqat bo'sh bazaga, bir marta). Eksport navbatiga qo'shilmaydi."""
+        # Stok va Savdolar barcha davr varaqlaridan o'qiladi (o'tkazma qatorlarisiz)
+        ledgers = {base: sheets_api.ledger_sheets_for_range(base)
+                   for base in (SHEET_NAMES["STOCK"], SHEET_NAMES["SALES"])}
+        tables = sheets_api.read_sheet_rows([SHEET_NAMES["SELLERS"], SHEET_NAMES["PRODUCTS"]]
+                                            + ledgers[SHEET_NAMES["STOCK"]] + ledgers[SHEET_NAMES["SALES"]])
+        if tables is None:
+            logging.warning("Sheetsga ulanib bo'lmadi, SQLite bo'sh holda ishga tushdi.")
+            return
+
+        def pad(row, size):
+            return list(row) + [""] * (size - len(row))
+
+        def ledger_rows(base):
+            for sheet_name in ledgers[base]:
+                for row in tables[sheet_name]:
+                    if not sheets_api.is_carry_row(row):
+                        yield row
+
+        def do_import(conn):
+            for row in tables[SHEET_NAMES["SELLERS"]]:
+                seller_id = _to_int(row[0] if row else None)
+                if seller_id is None: continue
+                conn.execute("INSERT OR IGNORE INTO sellers VALUES (?, ?, ?, ?, ?, ?)",
+                             [seller_id] + pad(row, 6)[1:6])
+            for row in tables[SHEET_NAMES["PRODUCTS"]]:
+                product_id = _to_int(row[0] if row else None)
+                if product_id is None or len(row) < 2: continue
+                row = pad(row, 3)
+                conn.execute("INSERT OR IGNORE INTO products VALUES (?, ?, ?, ?)",
+                             (product_id, row[1], sheets_api._normalize_name(row[1]), row[2]))
+            for row in ledger_rows(SHEET_NAMES["STOCK"]):
+                row = pad(row, 7)
+                quantity = _to_int(row[3])
+                if quantity is None: continue
+                conn.execute("INSERT INTO stock (seller_name, product_name, quantity, price, total, created) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (row[1], row[2], quantity, row[4], _to_float(row[5]), row[6]))
+            for row in ledger_rows(SHEET_NAMES["SALES"]):
+                row = pad(row, 7)
+                quantity, total = _to_int(row[3]), _to_float(row[5])
+                if quantity is None or total is None: continue
+                conn.execute("INSERT INTO sales (seller_id, product_id, quantity, price, total, created, day) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (row[1], row[2], quantity, row[4], total, row[6], _row_day(row[6])))
+
+        self._write(do_import, changed=("sellers", "products"))
+        logging.info("Sheets ma'lumotlari SQLitega import qilindi.")
+
+    # --- SOTUVCHILAR ---
+    @staticmethod
+    def _seller_row(record):
+        # [ID, Ism, Tuman, Telefon, Parol, Sana]
+        return [_text(v) for v in record]
+
+    def get_all_sellers(self):
+        try:
+            return [self._seller_row(r) for r in self._query(
+                "SELECT id, name, region, phone, password, created FROM sellers ORDER BY id")]
+        except Exception as e:
+            logging.error(f"Sotuvchilarni o'qishda xato: {e}")
+            return []
+
+    def get_sellers_page(self, cursor=None, size=paging.LIST_PAGE_SIZE):
+        try:
+            return self._sorted_page("sellers", "SELECT id, name, region, phone, password, created FROM sellers",
+                                     cursor, size)
+        except Exception as e:
+            logging.error(f"Sotuvchilar sahifasini o'qishda xato: {e}")
+            return paging.empty_page()
+
+    def find_seller_by_id(self, seller_id):
+        rows = self._query("SELECT id, name, region, phone, password, created FROM sellers WHERE id = ?",
+                           (_to_int(seller_id),))
+        return self._seller_row(rows[0]) if rows else None
+
+    def get_seller_by_id(self, seller_id):
+        try:
+            return self.find_seller_by_id(seller_id)
+        except Exception as e:
+            logging.error(f"ID {seller_id} bo'yicha sotuvchini topishda xato: {e}")
+            return None
+
+    def get_seller_by_password(self, password):
+        try:
+            rows = self._query("SELECT id, name, region, phone, password, created FROM sellers "
+                               "WHERE password = ? ORDER BY id LIMIT 1", (str(password),))
+            return self._seller_row(rows[0]) if rows else None
+        except Exception as e:
+            logging.error(f"Parol bo'yicha sotuvchini topishda xato: {e}")
+            return None
+
+    def get_seller_name_by_id(self, seller_id):
+        row = self.get_seller_by_id(seller_id)
+        return row[1] if row else str(seller_id)
+
+    def add_seller(self, seller_data):
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        def insert(conn):
+            cursor = conn.execute(
+                "INSERT INTO sellers (name, region, phone, password, created) VALUES (?, ?, ?, ?, ?)",
+                (seller_data['seller_name'], seller_data['seller_region'], seller_data['seller_phone'],
+                 seller_data['seller_password'], current_date))
+            self._enqueue(conn, SHEET_NAMES["SELLERS"], [
+                cursor.lastrowid, seller_data['seller_name'], seller_data['seller_region'],
+                seller_data['seller_phone'], seller_data['seller_password'], current_date])
+
+        try:
+            self._write(insert, changed=("sellers",))
+            return True
+        except Exception as e:
+            logging.error(f"Sotuvchini yozishda xato: {e}")
+            return False
+
+    # --- MAHSULOTLAR ---
+    def get_all_products(self):
+        try:
+            return [[_text(v) for v in r] for r in self._query("SELECT id, name, price FROM products ORDER BY id")]
+        except Exception as e:
+            logging.error(f"Mahsulotlarni o'qishda xato: {e}")
+            return []
+
+    def get_products_page(self, cursor=None, size=paging.LIST_PAGE_SIZE):
+        try:
+            return self._sorted_page("products", "SELECT id, name, price FROM products", cursor, size)
+        except Exception as e:
+            logging.error(f"Mahsulotlar sahifasini o'qishda xato: {e}")
+            return paging.empty_page()
+
+    def get_product_by_name(self, name):
+        try:
+            rows = self._query("SELECT id, name, price FROM products WHERE name_norm = ? ORDER BY id LIMIT 1",
+                               (sheets_api._normalize_name(name),))
+            return [_text(v) for v in rows[0]] if rows else None
+        except Exception as e:
+            logging.error(f"Mahsulotni ism bo'yicha topishda xato: {e}")
+            return None
+
+    def get_product_by_id(self, product_id):
+        try:
+            rows = self._query("SELECT id, name, price FROM products WHERE id = ?", (_to_int(product_id),))
+            return [_text(v) for v in rows[0]] if rows else None
+        except Exception as e:
+            logging.error(f"Mahsulotni ID bo'yicha topishda xato: {e}")
+            return None
+
+    def _fuzzy_index(self):
+        return self._derived_index("products", "fuzzy", "SELECT id, name, price FROM products ORDER BY id",
+                                   fuzzy.FuzzyIndex)
+
+    def find_similar_products(self, name, limit=fuzzy.FUZZY_SUGGESTIONS):
+        try:
+            return self._fuzzy_index().search(name, limit)
+        except Exception as e:
+            logging.error(f"O'xshash mahsulotlarni qidirishda xato: {e}")
+            return []
+
+    def complete_products(self, prefix, limit=fuzzy.FUZZY_SUGGESTIONS):
+        try:
+            return self._fuzzy_index().complete(prefix, limit)
+        except Exception as e:
+            logging.error(f"Mahsulotlarni avtoto'ldirishda xato: {e}")
+            return []
+
+    @staticmethod
+    def _insert_product(conn, name, price):
+        cursor = conn.execute("INSERT INTO products (name, name_norm, price) VALUES (?, ?, ?)",
+                              (name, sheets_api._normalize_name(name), _text(price)))
+        SqliteBackend._enqueue(conn, SHEET_NAMES["PRODUCTS"], [cursor.lastrowid, name, price])
+        return cursor.lastrowid
+
+    def add_product_and_get_id(self, name, price):
+        try:
+            new_id = self._write(lambda conn: self._insert_product(conn, name, price), changed=("products",))
+            return new_id
+        except Exception as e:
+            logging.error(f"Yangi mahsulot qo'shishda xato: {e}")
+            return None
+
+    def add_product(self, name, price):
+        return self.add_product_and_get_id(name, price) is not None
+
+    def resolve_names(self, seller_ids=(), product_ids=()):
+        seller_names = {seller_id: str(seller_id) for seller_id in seller_ids}
+        product_names = {product_id: f"ID: {product_id}" for product_id in product_ids}
+        try:
+            for ids_to_names, table in ((seller_names, "sellers"), (product_names, "products")):
+                if not ids_to_names: continue
+                keys = {_to_int(item_id): item_id for item_id in ids_to_names}
+                placeholders = ",".join("?" * len(keys))
+                for record_id, name in self._query(
+                        f"SELECT id, name FROM {table} WHERE id IN ({placeholders})", list(keys)):
+                    ids_to_names[keys[record_id]] = name
+        except Exception as e:
+            logging.error(f"Nomlarni aniqlashda xato: {e}")
+        return seller_names, product_names
+
+    def get_product_name_by_id(self, product_id):
+        return self.resolve_names(product_ids=[product_id])[1][product_id]
+
+    # --- STOK ---
+    @staticmethod
+    def _insert_stock(conn, seller_name, product_name, quantity, price):
+        row = sheets_api.build_stock_row(seller_name, product_name, quantity, price)
+        conn.execute("INSERT INTO stock (seller_name, product_name, quantity, price, total, created) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (seller_name, product_name, int(quantity), _text(price), row[5], row[6]))
+        SqliteBackend._enqueue(conn, SHEET_NAMES["STOCK"], row)
+
+    def add_stock_to_seller(self, seller_id, product_id, quantity, price):
+        try:
+            seller_names, product_names = self.resolve_names([seller_id], [product_id])
+            self._write(lambda conn: self._insert_stock(
+                conn, seller_names[seller_id], product_names[product_id], quantity, price))
+            return True
+        except Exception as e:
+            logging.error(f"Stok ma'lumotini yozishda xato: {e}")
+            return False
+
+    def _stock_items(self, seller_name):
+        # Har bir mahsulot bo'yicha jami miqdor va oxirgi qator narxi
+        return self._query(
+            "SELECT product_name, SUM(quantity) AS total, "
+            "       (SELECT s2.price FROM stock s2 WHERE s2.seller_name = s.seller_name "
+            "        AND s2.product_name = s.product_name ORDER BY s2.id DESC LIMIT 1) "
+            "FROM stock s WHERE seller_name = ? GROUP BY product_name HAVING total > 0 "
+            "ORDER BY product_name", (seller_name,))
+
+    def get_seller_stock(self, seller_id):
+        try:
+            seller_name = self.get_seller_name_by_id(seller_id)
+            if seller_name == str(seller_id):
+                logging.warning(f"ID {seller_id} uchun sotuvchi nomi topilmadi.")
+                return None
+            return {name: (quantity, _text(price)) for name, quantity, price in self._stock_items(seller_name)} or None
+        except Exception as e:
+            logging.error(f"Sotuvchi stokini olishda xato: {e}")
+            return None
+
+    def get_seller_stock_view(self, seller_id):
+        try:
+            seller_name = self.get_seller_name_by_id(seller_id)
+            if seller_name == str(seller_id):
+                logging.warning(f"ID {seller_id} uchun sotuvchi nomi topilmadi.")
+                return {'seller_name': "Noma'lum sotuvchi", 'items': []}
+            items = [(name, quantity, _text(price)) for name, quantity, price in self._stock_items(seller_name)]
+            return {'seller_name': seller_name, 'items': items}
+        except Exception as e:
+            logging.error(f"Sotuvchi stokini olishda xato: {e}")
+            return None
+
+    def compact_stock(self, cutoff):
+        # Qoldiqlar SQLitedagi indeks bo'yicha hisoblanadi; ixchamlanadigani Sheetsdagi
+        # hisobot nusxasi (eksport qatorlari varaq oxiriga qo'shiladi, ixchamlash esa boshini o'zgartiradi)
+        return sheets_api.compact_stock(cutoff)
+
+    # --- SAVDO VA HISOBOTLAR ---
+    @staticmethod
+    def _insert_sale(conn, seller_id, product_id, quantity, price):
+        row = sheets_api.build_sale_row(seller_id, product_id, quantity, price)
+        conn.execute("INSERT INTO sales (seller_id, product_id, quantity, price, total, created, day) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (str(seller_id), str(product_id), int(quantity), _text(price), row[5], row[6], _row_day(row[6])))
+        SqliteBackend._enqueue(conn, SHEET_NAMES["SALES"], row)
+
+    def add_sale(self, seller_id, product_id, quantity, price):
+        try:
+            self._write(lambda conn: self._insert_sale(conn, seller_id, product_id, quantity, price))
+            return True
+        except Exception as e:
+            logging.error(f"Savdo ma'lumotini yozishda xato: {e}")
+            return False
+
+    def get_seller_sales_summary(self, seller_id, start_date=None, end_date=None):
+        # Sheets versiyasidagi kabi: sanasi o'qilmagan qatorlar har doim hisobga olinadi
+        sql = ("SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0) FROM sales "
+               "WHERE seller_id = ? AND (day IS NULL OR (day >= ? AND day <= ?))")
+        start_day = _row_day(start_date) if start_date else None
+        end_day = _row_day(end_date) if end_date else None
+        try:
+            quantity, revenue = self._query(sql, (str(seller_id), start_day or "0000-00-00", end_day or "9999-99-99"))[0]
+            return {'total_quantity': quantity, 'total_revenue': round(revenue, 2)}
+        except Exception as e:
+            logging.error(f"Savdo hisobotini olishda xato: {e}")
+            return {'total_quantity': 0, 'total_revenue': 0}
+
+    # Guruhlash kalitlari (analytics.GROUP_KEYS) -> ustunlar
+    _SALES_GROUP_COLUMNS = {"seller": "seller_id", "product": "product_id", "day": "day"}
+    _STOCK_GROUP_COLUMNS = {"seller": "seller_name", "product": "product_name", "day": "substr(created, 1, 10)"}
+
+    def _group_report(self, table, columns, quantity_sql, amount_sql, where="", params=()):
+        select = ", ".join(columns + [quantity_sql, amount_sql])
+        group = f" GROUP BY {', '.join(columns)}" if columns else ""
+        report = {}
+        for record in self._query(f"SELECT {select} FROM {table}{where}{group}", params):
+            key = tuple(_text(v) if v is not None else None for v in record[:len(columns)])
+            report[key] = (record[-2], round(record[-1], 2))
+        return report
+
+    def get_sales_report(self, group_by=("seller",), start_date=None, end_date=None):
+        # SQLiteda guruhlashni baza o'zi (indeks bilan) bajaradi
+        start_day = _row_day(start_date) if start_date else None
+        end_day = _row_day(end_date) if end_date else None
+        try:
+            return self._group_report("sales", [self._SALES_GROUP_COLUMNS[key] for key in group_by],
+                                      "COALESCE(SUM(quantity), 0)", "COALESCE(SUM(total), 0)",
+                                      " WHERE day IS NULL OR (day >= ? AND day <= ?)",
+                                      (start_day or "0000-00-00", end_day or "9999-99-99"))
+        except Exception as e:
+            logging.error(f"Umumiy savdo hisobotini olishda xato: {e}")
+            return {}
+
+    def get_stock_report(self, group_by=("seller", "product")):
+        try:
+            return self._group_report("stock", [self._STOCK_GROUP_COLUMNS[key] for key in group_by],
+                                      "COALESCE(SUM(quantity), 0)", "COALESCE(SUM(total), 0)")
+        except Exception as e:
+            logging.error(f"Umumiy stok hisobotini olishda xato: {e}")
+            return {}
+
+    # Jurnal -> (so'rov, indeksli sana ustuni). Stokda sana 'YYYY-MM-DD HH:MM' matni
+    # bo'lgani uchun oraliq [start, end + 1 kun) ko'rinishida solishtiriladi
+    _LEDGER_QUERIES = {
+        SHEET_NAMES["STOCK"]: ("SELECT id, seller_name, product_name, quantity, price, total, created FROM stock", "created"),
+        SHEET_NAMES["SALES"]: ("SELECT id, seller_id, product_id, quantity, price, total, created FROM sales", "day"),
+    }
+
+    def iter_ledger_rows(self, sheet_name, chunk_size, start=None, end=None):
+        sql, day_column = self._LEDGER_QUERIES[sheet_name]
+        conditions, params = [], []
+        if start:
+            conditions.append(f"{day_column} >= ?")
+            params.append(start.isoformat())
+        if end:
+            conditions.append(f"{day_column} < ?")
+            params.append((end + timedelta(days=1)).isoformat())
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # Alohida ulanish: generator boshqa threadda davom etishi mumkin
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute(sql + " ORDER BY id", params)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk: return
+                for record in chunk:
+                    yield [_text(v) for v in record]
+        finally:
+            conn.close()
+
+    # --- BIRGALIKDAGI AMALLAR ---
+    def record_sale(self, seller_id, product_id, quantity, price):
+        try:
+            seller_names, product_names = self.resolve_names([seller_id], [product_id])
+
+            def write(conn):
+                self._insert_sale(conn, seller_id, product_id, quantity, price)
+                self._insert_stock(conn, seller_names[seller_id], product_names[product_id], -int(quantity), price)
+
+            self._write(write)
+            return True
+        except Exception as e:
+            logging.error(f"Savdoni yozishda xato: {e}")
+            return False
+
+    def issue_new_product_stock(self, seller_id, product_name, price, quantity):
+        try:
+            seller_name = self.get_seller_name_by_id(seller_id)
+
+            def write(conn):
+                new_id = self._insert_product(conn, product_name, price)
+                self._insert_stock(conn, seller_name, product_name, quantity, price)
+                return new_id
+
+            new_id = self._write(write, changed=("products",))
+            return new_id
+        except Exception as e:
+            logging.error(f"Yangi mahsulotni sotuvchiga berishda xato: {e}")
+            return None
+
+
+class SheetsExporter:
+    """export_queue dagi qatorlarni fonda Google Sheets varaqlariga yuboradi.
+    Har bir yuborish bitta batch_update (UnitOfWork) bo'ladi; xato bo'lsa qatorlar
+    navbatda qoladi va keyingi urinishda qayta yuboriladi."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None: return
+        self._thread = threading.Thread(target=self._run, name="sheets-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Eksportni to'xtatadi va navbatda qolganlarini oxirgi marta yuborishga urinadi."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SHEETS_EXPORT_INTERVAL * 2)
+            self._thread = None
+        self.export_pending()
+
+    def _run(self):
+        with scheduler.priority(scheduler.PRIORITY_BACKGROUND):
+            while not self._stop.wait(SHEETS_EXPORT_INTERVAL):
+                self.export_pending()
+
+    def export_pending(self):
+        """Navbatdagi qatorlarni yuboradi. Yuborilgan qatorlar sonini qaytaradi."""
+        exported = 0
+        while True:
+            pending = self.backend._query(
+                "SELECT id, sheet_name, row_json FROM export_queue ORDER BY id LIMIT ?",
+                (SHEETS_EXPORT_BATCH_SIZE,))
+            if not pending: return exported
+
+            ledgers = [sheet_name for _, sheet_name, _ in pending if sheet_name in sheets_api._LEDGER_HEADERS]
+            try:
+                # Stok/Savdolar qatorlari joriy davr varag'iga yoziladi
+                with sheets_api.writing_ledgers(*ledgers) as targets:
+                    uow = sheets_api.UnitOfWork()
+                    for _, sheet_name, row_json in pending:
+                        uow.append(targets.get(sheet_name, sheet_name), _SHEET_HEADERS[sheet_name], json.loads(row_json))
+                    uow.commit()
+            except Exception as e:
+                logging.error(f"Sheetsga eksport qilishda xato (keyinroq qayta urinamiz): {e}")
+                return exported
+
+            last_id = pending[-1][0]
+            self.backend._write(lambda conn: conn.execute("DELETE FROM export_queue WHERE id <= ?", (last_id,)))
+            exported += len(pending)
+
+
+# ==============================================================================
+# IV. STOK JURNALINI IXCHAMLASH
+# ==============================================================================
+
+class StockCompactor:
+    """Stok jurnalini fonda ixchamlaydi (faqat STOCK_COMPACT_INTERVAL > 0 bo'lsa): ishga
+    tushgandan bir daqiqa o'tib, keyin har STOCK_COMPACT_INTERVAL soatda STOCK_COMPACT_AGE_DAYS
+    kundan eski qatorlar qoldiq qatorlariga yig'iladi (bot tez-tez qayta ishga tushsa ham
+    ixchamlash bajarilsin)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or STOCK_COMPACT_INTERVAL <= 0: return
+        self._thread = threading.Thread(target=self._run, name="stock-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """To'xtatadi; boshlangan ixchamlash (varaqni almashtirish va arxivlash) tugashini kutadi."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=sheets_api.LEDGER_WRITE_TIMEOUT * 2)
+            self._thread = None
+
+    def _run(self):
+        with scheduler.priority(scheduler.PRIORITY_BACKGROUND):
+            delay = 60
+            while not self._stop.wait(delay):
+                self.backend.compact_stock(date.today() - timedelta(days=STOCK_COMPACT_AGE_DAYS))
+                delay = STOCK_COMPACT_INTERVAL * 3600
+
+
+# ==============================================================================
+# V. TANLANGAN OMBOR
+# ==============================================================================
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """STORAGE_BACKEND bo'yicha tanlangan omborni (bir marta yaratib) qaytaradi."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if STORAGE_BACKEND == 'sqlite':
+                    _backend = SqliteBackend()
+                else:
+                    if STORAGE_BACKEND != 'sheets':
+                        logging.warning(f"Noma'lum STORAGE_BACKEND='{STORAGE_BACKEND}', Google Sheets ishlatiladi.")
+                    _backend = SheetsBackend()
+    return _backend
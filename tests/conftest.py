@@ -0,0 +1,33 @@
+# tests/conftest.py
+# Sinovlar fake_sheets dagi soxta jadval ustida ishlaydi (internet va kvotasiz).
+import os
+import sys
+
+# Kvota cheklovlari o'chiriladi (scheduler import qilinishidan oldin)
+os.environ["SHEETS_READ_QUOTA"] = "0"
+os.environ["SHEETS_WRITE_QUOTA"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import fake_sheets
+import scheduler
+import sheets_api
+
+
+@pytest.fixture
+def make_client():
+    """Berilgan hajmdagi soxta jadvalni yaratib, sheets_api ni unga ulaydi."""
+    def make(**sizes):
+        sizes = {"sellers": 5, "products": 10, "stock_rows": 200, "sales_rows": 200, **sizes}
+        client = fake_sheets.FakeClient(fake_sheets.seed_data(**sizes))
+        sheets_api.use_spreadsheet(client.open_by_key("fake"))
+        return client
+    scheduler.configure(read_quota=0, write_quota=0)
+    yield make
+    sheets_api.flush_ledgers()
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
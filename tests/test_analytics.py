@@ -0,0 +1,76 @@
+# Ustunli jurnal nusxasi sinovlari: lug'at kodlash va guruhlash natijalari
+import datetime
+from collections import defaultdict
+
+import pytest
+
+import analytics
+import fake_sheets
+
+ROWS = [
+    ["", "Ali", "Olma", 3, 1000, 3000, "2026-02-01 09:00"],
+    ["", "Vali", "Olma", 2, 1000, 2000, "2026-02-01 10:00"],
+    ["", "Ali", "Nok", 1, 500, 500.5, "2026-02-03 11:00"],
+    ["", "Ali", "Olma", -1, 1000, -1000, "2026-02-05"],
+    ["", "Vali", "Nok", 4, 500, 2000, "sana yo'q"],
+    ["", "Ali", "Olma", "xato", 1000, 0, "2026-02-05"], # Miqdori o'qilmaydi: tashlab yuboriladi
+]
+
+
+@pytest.fixture
+def columns():
+    columns = analytics.LedgerColumns()
+    columns.append_rows(ROWS)
+    return columns
+
+
+def test_dictionary_encoding(columns):
+    assert len(columns) == 5
+    assert columns.sellers.values == ["Ali", "Vali"]
+    assert columns.products.values == ["Olma", "Nok"]
+    assert list(columns.seller) == [0, 1, 0, 0, 1]
+    assert list(columns.product) == [0, 0, 1, 0, 1]
+    assert columns.sellers.encode("Vali") == 1 and columns.sellers.encode("Gani") == 2
+
+
+def test_epoch_days():
+    day = analytics.epoch_day("2026-02-01 09:00")
+    assert day == (datetime.date(2026, 2, 1) - datetime.date(1970, 1, 1)).days
+    assert analytics.day_text(day) == "2026-02-01"
+    assert analytics.epoch_day("sana yo'q") == analytics.NO_DAY
+    assert analytics.day_text(analytics.NO_DAY) is None
+
+
+def test_group_by_results(columns):
+    assert columns.group_by(("seller",)) == {("Ali",): (3, 2500.5), ("Vali",): (6, 4000)}
+    assert columns.group_by(()) == {(): (9, 6500.5)}
+    assert columns.group_by(("product", "seller"))[("Olma", "Ali")] == (2, 2000)
+    by_day = columns.group_by(("day",))
+    assert by_day[("2026-02-01",)] == (5, 5000) and by_day[(None,)] == (4, 2000)
+
+
+def test_group_by_day_range_keeps_undated_rows(columns):
+    day = analytics.epoch_day
+    report = columns.group_by(("seller",), start_day=day("2026-02-02"), end_day=day("2026-02-04"))
+    assert report == {("Ali",): (1, 500.5), ("Vali",): (4, 2000)}
+
+
+@pytest.mark.parametrize("keys", [("seller",), ("seller", "product"), ("product", "day"), analytics.GROUP_KEYS])
+def test_group_by_matches_row_wise_totals(keys):
+    data = fake_sheets.seed_data(sellers=7, products=15, stock_rows=10, sales_rows=3000)
+    rows = [rows for name, rows in data.items() if name.startswith("Savdo")][0][1:]
+    columns = analytics.LedgerColumns()
+    columns.append_rows(rows)
+    start, end = analytics.epoch_day("2026-02-01"), analytics.epoch_day("2026-02-28")
+
+    expected = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        day = analytics.epoch_day(row[6])
+        if not start <= day <= end: continue
+        values = {"seller": str(row[1]), "product": str(row[2]), "day": analytics.day_text(day)}
+        total = expected[tuple(values[key] for key in keys)]
+        total[0] += int(row[3])
+        total[1] += float(row[5])
+
+    report = columns.group_by(keys, start, end)
+    assert report == {key: (quantity, pytest.approx(amount)) for key, (quantity, amount) in expected.items()}
@@ -0,0 +1,153 @@
+# Stok jurnalini ixchamlash sinovlari: qoldiqlar saqlanadi, qayta ishga tushirish xavfsiz
+import csv
+import datetime
+import os
+
+import pytest
+
+import export
+import sheets_api
+import storage
+
+STOCK = sheets_api.SHEET_NAMES["STOCK"]
+ARCHIVE = sheets_api.SHEET_NAMES["STOCK_ARCHIVE"]
+CUTOFF = datetime.date(2026, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def single_stock_sheet(monkeypatch):
+    # Hisobotlar bevosita Stok varag'idan o'qiladi
+    monkeypatch.setattr(sheets_api, "LEDGER_PARTITIONS", "none")
+
+
+def _rows(client, sheet_name):
+    worksheet = client.spreadsheet._worksheets.get(sheet_name)
+    return [] if worksheet is None else [list(row) for row in worksheet._rows]
+
+
+def _state(seller_ids=("1", "2", "3")):
+    report = sheets_api.get_stock_report()
+    return ({key: (quantity, pytest.approx(amount)) for key, (quantity, amount) in report.items()},
+            {seller_id: sheets_api.get_seller_stock(seller_id) for seller_id in seller_ids})
+
+
+def _folded(rows):
+    """Sarlavhasiz qatorlardan cutoff gacha bo'lgan boshlang'ich qismi."""
+    end = 1
+    while end < len(rows) and rows[end][6] <= f"{CUTOFF.isoformat()} 23:59":
+        end += 1
+    return rows[1:end]
+
+
+def test_compaction_keeps_balances_and_archives_folded_rows(client):
+    before_rows = _rows(client, STOCK)
+    before = _state()
+
+    result = sheets_api.compact_stock(CUTOFF)
+
+    folded = _folded(before_rows)
+    assert result == {"sheet": STOCK, "compacted": len(folded), "snapshots": result["snapshots"],
+                      "archived": len(folded)}
+    assert len(_rows(client, STOCK)) == len(before_rows) - len(folded) + result["snapshots"]
+    assert _state() == before
+    archive = _rows(client, ARCHIVE)
+    assert archive[0] == sheets_api.STOCK_HEADER
+    assert [sheets_api._row_key(row) for row in archive[1:]] == [sheets_api._row_key(row) for row in folded]
+
+
+def test_second_run_is_a_no_op(client):
+    sheets_api.compact_stock(CUTOFF)
+    stock, archive = _rows(client, STOCK), _rows(client, ARCHIVE)
+
+    result = sheets_api.compact_stock(CUTOFF)
+
+    assert result == {"sheet": STOCK, "compacted": 0, "snapshots": 0, "archived": 0}
+    assert _rows(client, STOCK) == stock
+    assert _rows(client, ARCHIVE) == archive
+
+
+def test_zero_quantity_with_nonzero_amount_is_kept(client):
+    worksheet = client.spreadsheet._worksheets[STOCK]
+    # Narx o'zgargan: kilogrammi nolga tushdi, lekin jami narxda farq qoldi
+    worksheet._rows[1:1] = [["", "Sotuvchi 1", "Noyob", 5, 1000, 5000, "2026-01-01 08:00"],
+                            ["", "Sotuvchi 1", "Noyob", -5, 1200, -6000, "2026-01-01 08:30"]]
+    before = _state()
+
+    sheets_api.compact_stock(CUTOFF)
+
+    assert _state() == before
+    assert sheets_api.get_stock_report()[("Sotuvchi 1", "Noyob")] == (0, -1000.0)
+
+
+def test_failed_rewrite_does_not_duplicate_archive_on_retry(client):
+    before_rows = _rows(client, STOCK)
+    real_batch_update = client.spreadsheet.batch_update
+    failures = []
+    def failing_rewrite(body):
+        if not failures and not any("appendCells" in request for request in body["requests"]):
+            failures.append(body)
+            raise RuntimeError("batch_update xatosi")
+        return real_batch_update(body)
+    client.spreadsheet.batch_update = failing_rewrite
+
+    assert sheets_api.compact_stock(CUTOFF) is None
+    assert _rows(client, STOCK) == before_rows
+    assert ARCHIVE not in client.spreadsheet._worksheets
+
+    assert sheets_api.compact_stock(CUTOFF)["archived"] == len(_folded(before_rows))
+    assert len(_rows(client, ARCHIVE)) == 1 + len(_folded(before_rows))
+
+
+def test_failed_archive_append_is_retried_once(client):
+    before_rows = _rows(client, STOCK)
+    real_batch_update = client.spreadsheet.batch_update
+    failures = []
+    def failing_archive(body):
+        if not failures and any("appendCells" in request for request in body["requests"]):
+            failures.append(body)
+            raise RuntimeError("batch_update xatosi")
+        return real_batch_update(body)
+    client.spreadsheet.batch_update = failing_archive
+
+    assert sheets_api.compact_stock(CUTOFF) is not None # Stok ixchamlandi, arxiv keyinga qoldi
+    assert len(_rows(client, ARCHIVE)) == 1
+
+    sheets_api.compact_stock(CUTOFF) # Yig'adigan narsa yo'q, lekin qolgan arxiv yoziladi
+    sheets_api.compact_stock(CUTOFF)
+    assert len(_rows(client, ARCHIVE)) == 1 + len(_folded(before_rows))
+
+
+def test_background_compaction_is_opt_in(monkeypatch):
+    compactor = storage.StockCompactor(backend=None)
+    compactor.start()
+    assert compactor._thread is None # Standart: STOCK_COMPACT_INTERVAL=0
+
+    monkeypatch.setattr(storage, "STOCK_COMPACT_INTERVAL", 24)
+    compactor.start()
+    thread = compactor._thread
+    compactor.stop()
+    assert not thread.is_alive() # stop() thread tugashini kutadi
+
+
+def _export(kind, start=None, end=None):
+    path, _, count = export.export_ledger(kind, start=start, end=end)
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            rows = list(csv.reader(file))
+    finally:
+        os.remove(path)
+    assert len(rows) == count + 1
+    return rows[1:]
+
+
+def test_export_after_compaction_returns_original_rows(client):
+    original = sorted(sheets_api._row_key(row) for row in _rows(client, STOCK)[1:])
+    early = sorted(sheets_api._row_key(row) for row in _folded(_rows(client, STOCK)))
+    sheets_api.compact_stock(CUTOFF)
+
+    exported = _export("stok")
+    assert not any(sheets_api.is_snapshot_row(row) for row in exported)
+    assert sorted(sheets_api._row_key(row) for row in exported) == original
+    # Ixchamlash sanasigacha bo'lgan tarix arxivdan olinadi
+    before_cutoff = _export("stok", end=CUTOFF)
+    assert sorted(sheets_api._row_key(row) for row in before_cutoff) == early
@@ -0,0 +1,60 @@
+# Jurnal eksporti sinovlari: sana oralig'i, sotuvchi bo'yicha filtr va gzip fayl
+import csv
+import datetime
+import gzip
+import os
+
+import export
+import sheets_api
+
+START, END = datetime.date(2026, 2, 1), datetime.date(2026, 2, 14)
+
+
+def _read(path, compress):
+    opener = gzip.open if compress else open
+    try:
+        with opener(path, "rt", encoding="utf-8-sig", newline="") as file:
+            return list(csv.reader(file))
+    finally:
+        os.remove(path)
+
+
+def _expected(client, sheet_name, seller_key):
+    rows = client.spreadsheet._worksheets[sheet_name]._rows[1:]
+    return [[str(v) for v in row] for row in rows
+            if str(row[1]) == seller_key and START.isoformat() <= str(row[6])[:10] <= END.isoformat()]
+
+
+def test_filter_rows_bounds_and_seller():
+    rows = [
+        ["", "1", "", 1, "", 1, "2026-01-31 23:59"],
+        ["", "1", "", 1, "", 1, "2026-02-01 00:00"],
+        ["", " 1 ", "", 1, "", 1, "2026-02-14 23:59"],
+        ["", "2", "", 1, "", 1, "2026-02-05"],
+        ["", "1", "", 1, "", 1, "sana yo'q"],
+        [],
+    ]
+    assert list(export.filter_rows(rows, "1", START, END)) == rows[1:3]
+    assert list(export.filter_rows(rows, None, START)) == rows[1:4]
+    # Oraliq berilmasa sanasiz qatorlar ham olinadi
+    assert list(export.filter_rows(rows, "1")) == [rows[0], rows[1], rows[2], rows[4]]
+
+
+def test_export_sales_for_seller_and_range_gzip(client):
+    path, filename, count = export.export_ledger("savdo", seller_id="2", start=START, end=END, compress=True)
+
+    assert filename == f"savdo_sotuvchi2_{START}_{END}.csv.gz"
+    rows = _read(path, compress=True)
+    assert rows[0] == sheets_api.SALES_HEADER
+    expected = _expected(client, sheets_api.SHEET_NAMES["SALES"], "2")
+    assert rows[1:] == expected and count == len(expected) > 0
+
+
+def test_export_stock_filters_by_seller_name(client):
+    path, filename, count = export.export_ledger("stok", seller_id="3", start=START, end=END)
+
+    assert filename.endswith(".csv")
+    rows = _read(path, compress=False)
+    assert rows[0] == sheets_api.STOCK_HEADER
+    expected = _expected(client, sheets_api.SHEET_NAMES["STOCK"], "Sotuvchi 3")
+    assert rows[1:] == expected and count == len(expected) > 0
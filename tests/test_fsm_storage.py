@@ -0,0 +1,120 @@
+# FSM ombori sinovlari: xotira qatlami (LRU, dirty/flushing kalitlar) va SQLite orqali qayta o'qish
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from fsm_storage import CoalescingStorage, SqliteStorage
+
+
+def _key(user_id):
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+class GatedStorage:
+    """read_record/write_records ni sinov ochguncha ushlab turadigan ombor."""
+    def __init__(self):
+        self.records = {}
+        self.reads = []
+        self.writes = []
+        self.read_gate = asyncio.Event()
+        self.write_gate = asyncio.Event()
+        self.read_gate.set()
+        self.write_gate.set()
+
+    async def read_record(self, key):
+        self.reads.append(key)
+        await self.read_gate.wait()
+        return self.records.get(key, (None, {}))
+
+    async def write_records(self, records):
+        await self.write_gate.wait()
+        for key, state, data in records:
+            self.records[key] = (state, data)
+        self.writes.append([key for key, _, _ in records])
+
+    async def close(self):
+        pass
+
+
+def test_concurrent_first_access_reads_once():
+    async def scenario():
+        inner = GatedStorage()
+        inner.records[_key(1)] = ("holat", {"seller_id": "7"})
+        storage = CoalescingStorage(inner, flush_delay=60, cache_size=1)
+        inner.read_gate.clear()
+        waiters = [asyncio.ensure_future(storage.get_data(_key(1))) for _ in range(3)]
+        # Boshqa kalit ham bir vaqtda o'qiladi va keshdan joy talab qiladi
+        waiters.append(asyncio.ensure_future(storage.get_data(_key(2))))
+        await asyncio.sleep(0)
+        inner.read_gate.set()
+        results = await asyncio.gather(*waiters)
+        return inner, results
+
+    inner, results = asyncio.run(scenario())
+    assert results[:3] == [{"seller_id": "7"}] * 3
+    assert results[3] == {}
+    assert inner.reads.count(_key(1)) == 1
+
+
+def test_eviction_keeps_dirty_keys():
+    async def scenario():
+        inner = GatedStorage()
+        storage = CoalescingStorage(inner, flush_delay=60, cache_size=2)
+        await storage.set_data(_key(1), {"a": 1}) # dirty: hali yozilmagan
+        await storage.get_data(_key(2))
+        await storage.get_data(_key(3))
+        cached = list(storage._records)
+        await storage.close()
+        return cached
+
+    cached = asyncio.run(scenario())
+    assert _key(1) in cached and _key(2) not in cached and _key(3) in cached
+
+
+def test_eviction_keeps_keys_being_flushed():
+    async def scenario():
+        inner = GatedStorage()
+        storage = CoalescingStorage(inner, flush_delay=60, cache_size=1)
+        await storage.set_data(_key(1), {"a": 1})
+        inner.write_gate.clear()
+        flush = asyncio.ensure_future(storage.flush())
+        await asyncio.sleep(0)
+        await storage.get_data(_key(2)) # _key(1) yozilmoqda: keshda qolishi kerak
+        during = list(storage._records)
+        inner.write_gate.set()
+        await flush
+        await storage.get_data(_key(3)) # Endi yozib bo'lingan: chiqarilishi mumkin
+        after = list(storage._records)
+        return inner, during, after
+
+    inner, during, after = asyncio.run(scenario())
+    assert _key(1) in during
+    assert _key(1) not in after
+    assert inner.records[_key(1)] == (None, {"a": 1})
+
+
+def test_flush_and_reload_round_trip(tmp_path):
+    path = str(tmp_path / "fsm.db")
+
+    async def write():
+        storage = CoalescingStorage(SqliteStorage(path), flush_delay=60, cache_size=1)
+        await storage.set_state(_key(1), "Sotuvchi:savdo")
+        await storage.update_data(_key(1), {"seller_id": "3"})
+        await storage.update_data(_key(1), {"seller_key": "abc"})
+        await storage.flush()
+        # Keshdan chiqarilgan kalit ombordan qayta o'qiladi
+        await storage.get_data(_key(2))
+        assert _key(1) not in storage._records
+        reloaded = (await storage.get_state(_key(1)), await storage.get_data(_key(1)))
+        await storage.close()
+        return reloaded
+
+    async def read():
+        storage = CoalescingStorage(SqliteStorage(path), flush_delay=60)
+        result = (await storage.get_state(_key(1)), await storage.get_data(_key(1)))
+        await storage.close()
+        return result
+
+    expected = ("Sotuvchi:savdo", {"seller_id": "3", "seller_key": "abc"})
+    assert asyncio.run(write()) == expected
+    assert asyncio.run(read()) == expected # Bot qayta ishga tushgandan keyin
@@ -0,0 +1,67 @@
+# Noaniq qidiruv sinovlari: xato yozilgan nomlar va tutuq belgisining turli yozilishlari
+import pytest
+
+import fuzzy
+import sheets_api
+
+PRODUCTS = [
+    ["1", "Olma", "1000"],
+    ["2", "O'rik", "2000"],
+    ["3", "Shaftoli", "3000"],
+    ["4", "Tarvuz", "4000"],
+    ["5", "G'o'za yog'i", "5000"],
+    ["6", "olma", "9999"], # Takror nom: birinchisi olinadi
+]
+
+
+@pytest.fixture
+def index():
+    return fuzzy.FuzzyIndex(PRODUCTS)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Shaftli", "Shaftoli"),
+    ("tarvus", "Tarvuz"),
+    ("OLMA", "Olma"),
+    ("O‘rik", "O'rik"),
+    ("gʻoʻza yog’i", "G'o'za yog'i"),
+])
+def test_search_finds_typos_and_apostrophe_variants(index, query, expected):
+    assert index.search(query)[0][1] == expected
+
+
+def test_normalize_unifies_apostrophes_case_and_spaces():
+    assert fuzzy.normalize("  GʻO‘ZA   yog`i ") == "g'o'za yog'i"
+
+
+def test_search_skips_duplicates_and_unrelated_names(index):
+    assert [row[0] for row in index.search("olma")] == ["1"]
+    assert index.search("xyz") == []
+    assert index.search("   ") == []
+
+
+def test_lookup_miss_suggests_similar_products(client):
+    name = sheets_api.get_all_products()[0][1]
+    assert sheets_api.get_product_by_name(name + "q") is None
+    assert sheets_api.find_similar_products(name + "q")[0][1] == name
+    # Aniq qidiruv ham xuddi shu normallashtirishdan foydalanadi
+    assert sheets_api.get_product_by_name(name.upper())[1] == name
+
+
+def test_complete_prefers_prefix_matches_then_similar(index):
+    assert [row[1] for row in index.complete("o")] == ["O'rik", "Olma"] # alifbo tartibida
+    assert index.complete("o‘r", limit=1)[0][1] == "O'rik"
+    assert index.complete("Shaftli")[0][1] == "Shaftoli"
+
+
+def test_complete_is_memoized_per_prefix(index):
+    first = index.complete("ta")
+    assert index.complete("TA") is first
+    assert ("ta", fuzzy.FUZZY_SUGGESTIONS) in index._completions
+
+
+def test_completions_follow_product_changes(client):
+    assert sheets_api.complete_products("Yangi") == []
+    assert sheets_api.add_product("Yangi mahsulot", 1500)
+    # Mahsulotlar o'zgargach indeks (va uning avtoto'ldirish keshi) qayta quriladi
+    assert [row[1] for row in sheets_api.complete_products("Yangi")] == ["Yangi mahsulot"]
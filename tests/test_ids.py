@@ -0,0 +1,50 @@
+# ID ajratuvchi sinovlari: bir vaqtdagi qo'shishlarda takrorlanmaydigan va o'suvchi IDlar
+from concurrent.futures import ThreadPoolExecutor
+
+import sheets_api
+
+
+def _ids(client, sheet_name):
+    return [int(row[0]) for row in client.spreadsheet._worksheets[sheet_name]._rows[1:]]
+
+
+def test_concurrent_inserts_get_unique_monotonic_ids(client):
+    products = sheets_api.SHEET_NAMES["PRODUCTS"]
+    start = max(_ids(client, products)) + 1
+
+    def work(i):
+        # Savdolar yangi mahsulot qo'shishlar bilan aralash bajariladi
+        if i % 3 == 0:
+            assert sheets_api.record_sale("1", "1", 1, 1000)
+            return None
+        if i % 3 == 1:
+            return sheets_api.add_product_and_get_id(f"Yangi {i}", 1000)
+        return sheets_api.issue_new_product_stock("2", f"Berilgan {i}", 2000, 5)
+
+    with ThreadPoolExecutor(8) as executor:
+        issued = [new_id for new_id in executor.map(work, range(60)) if new_id is not None]
+
+    assert sorted(issued) == list(range(start, start + 40))
+    assert sorted(_ids(client, products)) == list(range(1, start + 40))
+
+
+def test_concurrent_sellers_get_unique_ids(client):
+    sellers = sheets_api.SHEET_NAMES["SELLERS"]
+    start = max(_ids(client, sellers)) + 1
+    seller = {"seller_name": "Yangi", "seller_region": "Tuman", "seller_phone": "+998", "seller_password": "p"}
+
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(lambda _: sheets_api.add_seller(seller), range(20)))
+
+    assert sorted(_ids(client, sellers)) == list(range(1, start + 20))
+
+
+def test_ids_reconcile_with_rows_added_outside_the_bot(client):
+    products = sheets_api.SHEET_NAMES["PRODUCTS"]
+    first = sheets_api.add_product_and_get_id("Birinchi", 1000)
+    # Jadvalga qo'lda kattaroq ID bilan qator qo'shildi, keyin jadval qayta o'qildi
+    client.spreadsheet._worksheets[products]._rows.append([first + 50, "Qo'lda", 500])
+    sheets_api.invalidate_table_cache(products)
+    assert sheets_api.warm_up()
+
+    assert sheets_api.add_product_and_get_id("Keyingi", 1000) == first + 51
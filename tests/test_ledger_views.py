@@ -0,0 +1,113 @@
+# Jurnal holatlarini faqat oxirgi qatorlardan yangilash va yozuvlarni to'plash sinovlari
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from gspread.exceptions import APIError
+
+import sheets_api
+
+
+def _open_period(base):
+    """Joriy davr varag'ini yozuvchi sifatida oldindan ochadi (o'qishlar davr ochmaydi)."""
+    with sheets_api.writing_ledgers(base) as sheet_names:
+        return sheet_names[base]
+
+
+def _view(client):
+    """TTL siz (har murojaatda yangilanadigan) Stok ustunli nusxasi."""
+    view = sheets_api._LedgerColumnsView(sheets_api.ledger_sheet(sheets_api.SHEET_NAMES["STOCK"]))
+    view.ttl = 0
+    view.ensure_loaded(client.spreadsheet)
+    return view
+
+
+def _expected(client, sheet_name):
+    """Varaqni to'liq qayta o'qib hisoblangan natija."""
+    fresh = sheets_api._LedgerColumnsView(sheet_name)
+    fresh.ensure_loaded(client.spreadsheet)
+    return fresh.group_by(("seller", "product"))
+
+
+def _record_ranges(monkeypatch, client):
+    ranges = []
+    read = client.spreadsheet.values_batch_get
+    def recording(requested, params=None):
+        ranges.extend(requested)
+        return read(requested, params)
+    monkeypatch.setattr(client.spreadsheet, "values_batch_get", recording)
+    return ranges
+
+
+def test_tail_sync_reads_only_appended_rows(client, monkeypatch):
+    view = _view(client)
+    worksheet = client.spreadsheet._worksheets[view.sheet_name]
+    seen = len(worksheet._rows) - 1
+    worksheet.append_rows([["", "Sotuvchi 1", "Mahsulot 1", 7, 1000, 7000, "2026-10-18 10:00"],
+                           ["", "Sotuvchi 9", "Mahsulot 9", 3, 500, 1500, "2026-10-18 10:05"]])
+
+    ranges = _record_ranges(monkeypatch, client)
+    view.ensure_loaded(client.spreadsheet)
+
+    # Oxirgi ko'rilgan qator (tekshirish uchun) va undan keyingilari o'qiladi
+    assert ranges == [f"'{view.sheet_name}'!A{seen + 1}:G"]
+    assert view.group_by(("seller", "product")) == _expected(client, view.sheet_name)
+    assert view.group_by(("seller", "product"))[("Sotuvchi 9", "Mahsulot 9")] == (3, 1500.0)
+
+
+@pytest.mark.parametrize("edit", ["change_last", "delete_earlier"])
+def test_edit_above_high_water_mark_falls_back_to_full_reload(client, monkeypatch, edit):
+    view = _view(client)
+    worksheet = client.spreadsheet._worksheets[view.sheet_name]
+    if edit == "change_last":
+        worksheet._rows[-1][3] = int(worksheet._rows[-1][3]) + 100
+        worksheet._rows[-1][5] = ""
+    else:
+        del worksheet._rows[len(worksheet._rows) // 2]
+    worksheet.append_rows([["", "Sotuvchi 1", "Mahsulot 1", 7, 1000, 7000, "2026-10-18 10:00"]])
+
+    ranges = _record_ranges(monkeypatch, client)
+    view.ensure_loaded(client.spreadsheet)
+
+    assert len(ranges) == 2 # Oxirgi qatorlar, keyin butun varaq
+    assert ranges[1] == f"'{view.sheet_name}'!A2:G"
+    assert view.group_by(("seller", "product")) == _expected(client, view.sheet_name)
+
+
+def test_coalesced_writes_resolve_every_future(client):
+    _open_period(sheets_api.SHEET_NAMES["SALES"])
+    client.reset_stats()
+
+    futures = [sheets_api.queue_sale(str(i % 5 + 1), str(i % 10 + 1), 1, 1000) for i in range(20)]
+
+    assert all(future.result(timeout=10) is True for future in futures)
+    assert client.calls.get("append_rows") == 1
+    rows = client.spreadsheet._worksheets[sheets_api.ledger_sheet(sheets_api.SHEET_NAMES["SALES"])]._rows
+    assert sum(1 for row in rows if row[4] == 1000 and row[3] == 1) >= 20
+
+
+def test_failed_coalesced_write_fails_every_future(client):
+    _open_period(sheets_api.SHEET_NAMES["SALES"])
+    client.reset_stats()
+    client.fail_next(1, status_code=500) # Yozuvlar 5xx da qayta yuborilmaydi
+
+    futures = [sheets_api.queue_sale("1", "1", 1, 1000) for _ in range(5)]
+
+    for future in futures:
+        assert isinstance(future.exception(timeout=10), APIError)
+    assert client.calls.get("append_rows") == 1
+
+
+def test_concurrent_sales_share_one_batch_update(client):
+    sales_sheet = _open_period(sheets_api.SHEET_NAMES["SALES"])
+    stock_sheet = _open_period(sheets_api.SHEET_NAMES["STOCK"])
+    sheets_api.resolve_names(["1"], ["1"]) # Nomlar oldindan keshga olinadi
+    sales_before = len(client.spreadsheet._worksheets[sales_sheet]._rows)
+    stock_before = len(client.spreadsheet._worksheets[stock_sheet]._rows)
+    client.reset_stats()
+
+    with ThreadPoolExecutor(20) as executor:
+        assert all(executor.map(lambda _: sheets_api.record_sale("1", "1", 1, 1000), range(20)))
+
+    assert client.calls.get("batch_update", 0) < 5
+    assert len(client.spreadsheet._worksheets[sales_sheet]._rows) == sales_before + 20
+    assert len(client.spreadsheet._worksheets[stock_sheet]._rows) == stock_before + 20
@@ -0,0 +1,89 @@
+# O'lchovlar sinovlari: Prometheus matn formati, API so'rovlarini o'lchash va /metrics himoyasi
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from gspread.exceptions import APIError
+
+import fake_sheets
+import metrics
+
+
+@pytest.fixture
+def registered():
+    """Sinov davomida yaratilgan o'lchovlar umumiy ro'yxatdan keyin olib tashlanadi."""
+    created = []
+
+    def register(metric):
+        created.append(metric)
+        return metric
+    yield register
+    for metric in created:
+        metrics._registry.remove(metric)
+
+
+def test_counter_exposition(registered):
+    counter = registered(metrics.Counter("test_calls_total", "Sinov chaqiruvlari", ("call", "status")))
+    counter.inc(call="read", status="ok")
+    counter.inc(2, call="read", status="ok")
+    counter.inc(call='a"b', status="429")
+
+    assert counter.render() == [
+        "# HELP test_calls_total Sinov chaqiruvlari",
+        "# TYPE test_calls_total counter",
+        'test_calls_total{call="a\\"b",status="429"} 1',
+        'test_calls_total{call="read",status="ok"} 3',
+    ]
+
+
+def test_histogram_exposition(registered):
+    histogram = registered(metrics.Histogram("test_seconds", "Sinov davomiyligi", ("call",), buckets=(0.1, 1)))
+    histogram.observe(0.05, call="read")
+    histogram.observe(0.5, call="read")
+    histogram.observe(3, call="read")
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{call="read",le="0.1"} 1',
+        'test_seconds_bucket{call="read",le="1"} 2',
+        'test_seconds_bucket{call="read",le="+Inf"} 3',
+        'test_seconds_sum{call="read"} 3.55',
+        'test_seconds_count{call="read"} 3',
+    ]
+    assert "test_seconds_count{call=\"read\"} 3" in metrics.render()
+
+
+def test_track_api_call_records_status_and_duration():
+    calls_before = metrics.google_api_calls.value(call="test_call", status="ok")
+    errors_before = metrics.google_api_calls.value(call="test_call", status="429")
+    count_before = metrics.google_api_seconds.value(call="test_call")[0]
+
+    with metrics.track_api_call("test_call"):
+        pass
+    with pytest.raises(APIError):
+        with metrics.track_api_call("test_call"):
+            raise APIError(fake_sheets._FakeResponse(429, "Quota exceeded", "RESOURCE_EXHAUSTED"))
+
+    assert metrics.google_api_calls.value(call="test_call", status="ok") == calls_before + 1
+    assert metrics.google_api_calls.value(call="test_call", status="429") == errors_before + 1
+    assert metrics.google_api_seconds.value(call="test_call")[0] == count_before + 2
+
+
+def _get_metrics(headers=None):
+    request = make_mocked_request("GET", "/metrics", headers=headers or {})
+    return asyncio.run(metrics.metrics_handler(request))
+
+
+def test_metrics_endpoint_requires_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "maxfiy")
+    assert _get_metrics().status == 401
+    assert _get_metrics({"Authorization": "Bearer boshqa"}).status == 401
+    response = _get_metrics({"Authorization": "Bearer maxfiy"})
+    assert response.status == 200 and "sellerbot_updates_in_flight" in response.text
+
+
+def test_webhook_app_has_no_metrics_without_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    app = web.Application()
+    metrics.setup_application(app)
+    assert not [route for route in app.router.routes() if route.resource.canonical == "/metrics"]
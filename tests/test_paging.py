@@ -0,0 +1,55 @@
+# Sahifalash sinovlari: kursor ro'yxat o'zgarganda ham o'sha qatorga bog'liq qoladi
+import paging
+import sheets_api
+
+
+def _index(names):
+    return paging.SortedIndex([[str(i), name] for i, name in names], sort_key=lambda row: row[1])
+
+
+NAMES = [(i, f"Nom {i:02d}") for i in range(1, 26)]
+
+
+def test_pages_cover_every_row_once():
+    index = _index(NAMES)
+    cursor, seen = None, []
+    while True:
+        page = index.page(cursor, size=10)
+        seen += [row[0] for row in page.rows]
+        if page.next_cursor is None: break
+        cursor = page.next_cursor
+    assert seen == [str(i) for i, _ in NAMES]
+    assert (page.number, page.pages, page.prev_cursor) == (3, 3, "11")
+
+
+def test_cursor_survives_insert_before_it():
+    second = _index(NAMES).page(_index(NAMES).page(size=10).next_cursor, size=10)
+    # Kursordan oldin yangi qator qo'shildi: sahifa o'sha qatordan boshlanadi
+    page = _index(NAMES + [(99, "Aaa")]).page(second.rows[0][0], size=10)
+    assert page.rows == second.rows
+    assert page.next_cursor == second.next_cursor
+
+
+def test_cursor_survives_delete_before_it():
+    cursor = _index(NAMES).page(size=10).next_cursor
+    page = _index([(i, name) for i, name in NAMES if i != 3]).page(cursor, size=10)
+    assert page.rows[0] == [cursor, f"Nom {int(cursor):02d}"]
+    assert page.prev_cursor == "1"
+
+
+def test_unknown_cursor_falls_back_to_first_page():
+    page = _index(NAMES).page("404", size=10)
+    assert page.number == 1 and page.rows[0][0] == "1"
+    assert paging.empty_page().rows == []
+
+
+def test_sellers_page_cursor_after_add_seller(make_client):
+    make_client(sellers=25)
+    second = sheets_api.get_sellers_page(sheets_api.get_sellers_page(size=10).next_cursor, size=10)
+
+    assert sheets_api.add_seller({'seller_name': "Aaa Sotuvchi", 'seller_region': "Tuman 1",
+                                  'seller_phone': "+998900000000", 'seller_password': "yangi"})
+
+    first = sheets_api.get_sellers_page(size=10)
+    assert first.rows[0][1] == "Aaa Sotuvchi" # Indeks yangi qator bilan qayta qurildi
+    assert sheets_api.get_sellers_page(second.rows[0][0], size=10).rows == second.rows
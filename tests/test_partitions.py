@@ -0,0 +1,120 @@
+# Oy almashganda (davr yopilganda) hisobotlar o'zgarmasligi va o'tkazma qatorlari sinovlari
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from gspread.exceptions import APIError
+
+import fake_sheets
+import sheets_api
+
+STOCK = sheets_api.SHEET_NAMES["STOCK"]
+SALES = sheets_api.SHEET_NAMES["SALES"]
+
+
+@pytest.fixture
+def today(monkeypatch):
+    """sheets_api dagi date.today() ni boshqariladigan qiymatga almashtiradi."""
+    current = {"day": datetime.date(2026, 10, 31)}
+
+    class FakeDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return cls.fromordinal(current["day"].toordinal())
+
+    monkeypatch.setattr(sheets_api, "LEDGER_PARTITIONS", "month")
+    monkeypatch.setattr(sheets_api, "date", FakeDate)
+    return current
+
+
+def _approx_report(report):
+    return {key: (quantity, pytest.approx(amount)) for key, (quantity, amount) in report.items()}
+
+
+def _snapshot(seller_ids):
+    return {
+        "stock": _approx_report(sheets_api.get_stock_report()),
+        "seller_stock": {seller_id: sheets_api.get_seller_stock(seller_id) for seller_id in seller_ids},
+        "sales": _approx_report(sheets_api.get_sales_report(("seller", "product"))),
+        "summaries": {seller_id: sheets_api.get_seller_sales_summary(seller_id, "2026-01-01", "2026-12-31")
+                      for seller_id in seller_ids},
+    }
+
+
+def _open_period(base):
+    with sheets_api.writing_ledgers(base) as sheet_names:
+        return sheet_names[base]
+
+
+def _titles(client):
+    return [worksheet.title for worksheet in client.spreadsheet.worksheets()]
+
+
+def _carry_rows(client, sheet_name):
+    return [row for row in client.spreadsheet._worksheets[sheet_name]._rows if sheets_api.is_carry_row(row)]
+
+
+def test_month_boundary_keeps_reports_and_carries_once(client, today):
+    seller_ids = ["1", "2", "3"]
+    assert sheets_api.record_sale("2", "3", 1, 100)
+    before = _snapshot(seller_ids)
+
+    today["day"] = datetime.date(2026, 11, 1)
+    # O'qishlar yangi davrni ochmaydi: oxirgi mavjud varaqdan o'qiladi
+    assert _snapshot(seller_ids) == before
+    assert f"{STOCK}_2026_11" not in _titles(client) and f"{SALES}_2026_11" not in _titles(client)
+    # Yangi davrning birinchi yozuvlari bir vaqtda keladi
+    with ThreadPoolExecutor(8) as executor:
+        opened = set(executor.map(lambda i: _open_period((STOCK, SALES)[i % 2]), range(16)))
+    after = _snapshot(seller_ids)
+    _snapshot(seller_ids) # Qayta murojaat davrni qayta ochmaydi
+
+    assert opened == {f"{STOCK}_2026_11", f"{SALES}_2026_11"}
+    assert after == before
+    titles = _titles(client)
+    assert titles.count(f"{STOCK}_2026_11") == 1 and titles.count(f"{SALES}_2026_11") == 1
+    # Har bir sotuvchi/mahsulot uchun bitta o'tkazma qatori
+    stock_keys = [(row[1], row[2]) for row in _carry_rows(client, f"{STOCK}_2026_11")]
+    assert len(stock_keys) == len(set(stock_keys)) == len(sheets_api.get_stock_report())
+    sales_keys = [(row[1], row[2]) for row in _carry_rows(client, f"{SALES}_2026_11")]
+    assert len(sales_keys) == len(set(sales_keys))
+
+
+def test_writes_in_flight_at_the_boundary_reach_the_new_month(client, today):
+    before = sheets_api.get_stock_report(("seller",))[("Sotuvchi 2",)]
+
+    def work(i):
+        if i == 40:
+            today["day"] = datetime.date(2026, 11, 1)
+        if i % 2:
+            assert sheets_api.record_sale("2", "3", 1, 100)
+        else:
+            assert sheets_api.queue_stock_to_seller("2", "3", 2, 100).result(timeout=30)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(work, range(80)))
+    sheets_api.flush_ledgers()
+
+    after = sheets_api.get_stock_report(("seller",))[("Sotuvchi 2",)]
+    assert after[0] == before[0] + 40 * 2 - 40
+    assert after[1] == pytest.approx(before[1] + 40 * 200 - 40 * 100)
+    assert sheets_api.ledger_sheet(STOCK) == f"{STOCK}_2026_11"
+
+
+def test_open_period_reraises_errors_other_than_already_exists(client, today, monkeypatch):
+    today["day"] = datetime.date(2026, 11, 1)
+    add_worksheet = client.spreadsheet.add_worksheet
+
+    def forbidden(*args, **kwargs):
+        raise APIError(fake_sheets._FakeResponse(403, "The caller does not have permission", "PERMISSION_DENIED"))
+
+    monkeypatch.setattr(client.spreadsheet, "add_worksheet", forbidden)
+    with pytest.raises(APIError):
+        _open_period(STOCK)
+    assert sheets_api.ledger_sheet(STOCK) == STOCK
+
+    # Varaq oldingi urinishda yaratilgan, lekin to'ldirilmagan: "already exists" dan keyin to'ldiriladi
+    add_worksheet(title=f"{STOCK}_2026_11")
+    monkeypatch.setattr(client.spreadsheet, "add_worksheet", add_worksheet)
+    assert _open_period(STOCK) == f"{STOCK}_2026_11"
+    assert _carry_rows(client, f"{STOCK}_2026_11")
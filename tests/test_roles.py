@@ -0,0 +1,37 @@
+# Sotuvchi sessiyasini qayta tekshirish sinovlari
+import asyncio
+
+import pytest
+
+import roles
+import sheets_api
+
+
+def _check(seller_id, password):
+    session = {'seller_id': seller_id, 'seller_name': None, 'seller_key': roles.password_key(password)}
+    return asyncio.run(roles._check_session(session)), session
+
+
+def test_password_key_is_keyed_by_server_secret(monkeypatch):
+    key = roles.password_key("parol1")
+    monkeypatch.setattr(roles, "SESSION_SECRET", b"boshqa sir")
+    assert roles.password_key("parol1") != key
+    assert len(key) == 64
+
+
+def test_valid_session_is_kept(client):
+    valid, session = _check("1", "parol1")
+    assert valid
+    assert session['seller_name'] == "Sotuvchi 1"
+
+
+@pytest.mark.parametrize("seller_id, password", [("1", "eski parol"), ("999", "parol1")])
+def test_changed_password_or_removed_seller_revokes(client, seller_id, password):
+    assert _check(seller_id, password)[0] is False
+
+
+def test_read_failure_keeps_session(client, monkeypatch):
+    def fail(seller_id):
+        raise ConnectionError("Google Sheetsga ulanib bo'lmadi")
+    monkeypatch.setattr(sheets_api, "find_seller_by_id", fail)
+    assert _check("999", "parol1")[0] is True
@@ -0,0 +1,99 @@
+# So'rovlar navbati sinovlari: 429 da kutish, 5xx faqat o'qishlarda, ustuvorlik tartibi
+import threading
+import time
+
+import pytest
+from gspread.exceptions import APIError
+
+import fake_sheets
+import scheduler
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "SHEETS_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(scheduler, "SHEETS_BACKOFF_MAX", 0.2)
+    monkeypatch.setattr(scheduler, "SHEETS_MAX_RETRIES", 3)
+    scheduler.configure(read_quota=0, write_quota=0)
+    yield
+    scheduler.configure(read_quota=0, write_quota=0)
+
+
+def _failing(*statuses):
+    """Avval berilgan HTTP xatolarni, keyin 'ok' ni qaytaradigan funksiya."""
+    errors = list(statuses)
+    calls = []
+    def func():
+        calls.append(time.monotonic())
+        if errors:
+            status = errors.pop(0)
+            raise APIError(fake_sheets._FakeResponse(status, "Injected error", "UNAVAILABLE"))
+        return "ok"
+    return func, calls
+
+
+@pytest.mark.parametrize("name", ["values_batch_get", "append_rows"])
+def test_429_is_retried_with_backoff(name):
+    func, calls = _failing(429, 429)
+
+    assert scheduler.call(name, func) == "ok"
+
+    assert len(calls) == 3
+    # Eksponensial kutish: 0.05..0.075, keyin 0.1..0.15 soniya
+    assert calls[1] - calls[0] >= 0.05
+    assert calls[2] - calls[1] >= 0.1
+
+
+def test_429_pauses_other_calls_of_the_same_kind():
+    func, _ = _failing(429)
+    started = time.monotonic()
+    scheduler.call("append_rows", func)
+    paused_until = scheduler._buckets["write"].paused_until
+
+    assert paused_until > started
+    assert scheduler._buckets["read"].paused_until <= started
+
+
+def test_5xx_is_retried_only_for_reads():
+    func, calls = _failing(503)
+    assert scheduler.call("values_batch_get", func) == "ok"
+    assert len(calls) == 2
+
+    func, calls = _failing(503)
+    with pytest.raises(APIError):
+        scheduler.call("append_rows", func) # Yozuv bajarilgan bo'lishi mumkin: qayta yuborilmaydi
+    assert len(calls) == 1
+
+
+def test_retries_stop_after_max_attempts():
+    func, calls = _failing(*[429] * 10)
+    with pytest.raises(APIError):
+        scheduler.call("values_batch_get", func)
+    assert len(calls) == scheduler.SHEETS_MAX_RETRIES + 1
+
+
+def test_interactive_calls_run_ahead_of_queued_background_calls():
+    # Soniyasiga 2 ta token, bucket sig'imi 1: so'rovlar navbatda kutadi
+    scheduler.configure(read_quota=120, write_quota=0, burst=1)
+    bucket = scheduler._buckets["read"]
+    scheduler.call("values_batch_get", lambda: None) # Yagona token ishlatiladi
+    order = []
+
+    def run(label, level):
+        with scheduler.priority(level):
+            scheduler.call("values_batch_get", order.append, label)
+
+    def start(label, level, queued):
+        thread = threading.Thread(target=run, args=(label, level))
+        thread.start()
+        deadline = time.monotonic() + 2
+        while len(bucket._waiting) < queued and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return thread
+
+    threads = [start(f"fon {i}", scheduler.PRIORITY_BACKGROUND, i + 1) for i in range(3)]
+    threads.append(start("sotuvchi", scheduler.PRIORITY_INTERACTIVE, 4))
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["sotuvchi", "fon 0", "fon 1", "fon 2"]
@@ -0,0 +1,91 @@
+# SQLite ombori sinovlari: birgalikdagi amallar, jurnal oralig'i va Sheetsga eksport
+import datetime
+
+import pytest
+
+import sheets_api
+import storage
+
+STOCK = sheets_api.SHEET_NAMES["STOCK"]
+SALES = sheets_api.SHEET_NAMES["SALES"]
+
+
+@pytest.fixture(autouse=True)
+def single_ledger_sheets(monkeypatch):
+    # Eksport qatorlari bevosita Stok/Savdolar varaqlariga tushadi
+    monkeypatch.setattr(sheets_api, "LEDGER_PARTITIONS", "none")
+
+
+@pytest.fixture
+def backend(client, tmp_path):
+    backend = storage.SqliteBackend(str(tmp_path / "sellerbot.db"))
+    backend.import_from_sheets()
+    backend._write(lambda conn: conn.execute("DELETE FROM export_queue"))
+    return backend
+
+
+def _queue(backend):
+    return backend._query("SELECT sheet_name FROM export_queue ORDER BY id")
+
+
+def _stock(backend, seller_id, product_name):
+    return (backend.get_seller_stock(seller_id) or {}).get(product_name, (0, None))[0]
+
+
+def test_record_sale_round_trip(backend):
+    product_id = backend.add_product_and_get_id("Sinov mahsuloti", 1000)
+    assert backend.add_stock_to_seller("1", product_id, 10, 1000)
+    before = backend.get_seller_sales_summary("1")
+
+    assert backend.record_sale("1", product_id, 3, 1000)
+
+    assert _stock(backend, "1", "Sinov mahsuloti") == 7
+    after = backend.get_seller_sales_summary("1")
+    assert after["total_quantity"] == before["total_quantity"] + 3
+    assert after["total_revenue"] == pytest.approx(before["total_revenue"] + 3000)
+    # Mahsulot + stok + (savdo, stok) qatorlari eksport navbatida
+    assert [sheet for (sheet,) in _queue(backend)][-2:] == [SALES, STOCK]
+
+
+def test_issue_new_product_stock_round_trip(backend):
+    new_id = backend.issue_new_product_stock("2", "Yangi mahsulot", 2500, 4)
+
+    assert new_id is not None
+    assert backend.get_product_by_id(new_id)[1] == "Yangi mahsulot"
+    assert backend.get_product_by_name("yangi  mahsulot")[0] == str(new_id)
+    assert _stock(backend, "2", "Yangi mahsulot") == 4
+    # Mahsulotlar indeksi (sahifalash, fuzzy) yangi yozuvni ko'radi
+    names = [row[1] for row in backend.get_products_page(size=1000).rows]
+    assert "Yangi mahsulot" in names
+    assert backend.find_similar_products("Yangi mahsulod")[0][1] == "Yangi mahsulot"
+
+
+def test_iter_ledger_rows_filters_in_sql(backend):
+    start, end = datetime.date(2026, 2, 1), datetime.date(2026, 2, 10)
+    every = list(backend.iter_ledger_rows(SALES, 50))
+    ranged = list(backend.iter_ledger_rows(SALES, 50, start=start, end=end))
+
+    expected = [row for row in every if start.isoformat() <= row[6][:10] <= end.isoformat()]
+    assert ranged == expected and 0 < len(ranged) < len(every)
+    stock = list(backend.iter_ledger_rows(STOCK, 50, end=end))
+    assert stock and all(row[6][:10] <= end.isoformat() for row in stock)
+
+
+def test_failed_export_keeps_queue_and_retries(backend, client):
+    product_id = backend.add_product_and_get_id("Eksport mahsuloti", 500)
+    backend.add_stock_to_seller("3", product_id, 5, 500)
+    backend.record_sale("3", product_id, 2, 500)
+    queued = len(_queue(backend))
+    sales_before = len(client.spreadsheet._worksheets[SALES]._rows)
+
+    # Yozuvlar 5xx da qayta urinilmaydi: eksport xato bilan tugaydi
+    client.fail_next(1, status_code=503)
+    assert backend.exporter.export_pending() == 0
+    assert len(_queue(backend)) == queued
+    assert len(client.spreadsheet._worksheets[SALES]._rows) == sales_before
+
+    assert backend.exporter.export_pending() == queued
+    assert _queue(backend) == []
+    sales_rows = client.spreadsheet._worksheets[SALES]._rows
+    assert len(sales_rows) == sales_before + 1
+    assert [str(v) for v in sales_rows[-1][1:4]] == ["3", str(product_id), "2"]
@@ -0,0 +1,91 @@
+# Sotuvchilar/Mahsulotlar jadval keshi sinovlari: eskirgan nusxani berish (SWR) va
+# o'qish davomida qo'shilgan qatorlarni yangi nusxaga qayta qo'shish
+import threading
+
+import pytest
+
+import sheets_api
+
+SELLERS = sheets_api.SHEET_NAMES["SELLERS"]
+
+
+def _add_external_seller(client, seller_id):
+    """Varaqqa botdan tashqarida (qo'lda) sotuvchi qo'shadi."""
+    client.spreadsheet._worksheets[SELLERS]._rows.append(
+        [seller_id, f"Sotuvchi {seller_id}", "Tuman 1", "+998900000000", f"parol{seller_id}", "2026-01-01 09:00"])
+
+
+def _wait_for_refresh():
+    for thread in threading.enumerate():
+        if thread.name.startswith("refresh-"):
+            thread.join(timeout=10)
+
+
+def _ids():
+    return [row[0] for row in sheets_api.get_all_sellers()]
+
+
+def test_stale_table_is_served_while_refreshing(client, monkeypatch):
+    before = _ids()
+    _add_external_seller(client, "50")
+    monkeypatch.setattr(sheets_api, "TABLE_CACHE_TTL", 0)
+
+    # Eskirgan nusxa darhol qaytadi, yangilash fonda
+    assert _ids() == before
+    _wait_for_refresh()
+    monkeypatch.setattr(sheets_api, "TABLE_CACHE_TTL", 300)
+    assert _ids() == before + ["50"]
+
+
+def test_stale_table_is_reloaded_inline_without_swr(client, monkeypatch):
+    before = _ids()
+    _add_external_seller(client, "50")
+    monkeypatch.setattr(sheets_api, "TABLE_CACHE_TTL", 0)
+    monkeypatch.setattr(sheets_api, "TABLE_CACHE_SWR", False)
+
+    assert _ids() == before + ["50"]
+
+
+def test_only_one_background_refresh_per_table(client, monkeypatch):
+    _ids()
+    monkeypatch.setattr(sheets_api, "TABLE_CACHE_TTL", 0)
+    gate = threading.Event()
+    batch_read = sheets_api._batch_read
+
+    def slow_read(spreadsheet, ranges):
+        gate.wait(timeout=10)
+        return batch_read(spreadsheet, ranges)
+
+    monkeypatch.setattr(sheets_api, "_batch_read", slow_read)
+    client.reset_stats()
+    for _ in range(5):
+        _ids()
+    gate.set()
+    _wait_for_refresh()
+    assert client.calls.get("values_batch_get") == 1
+
+
+@pytest.mark.parametrize("existing", [False, True])
+def test_rows_appended_during_load_are_replayed(client, monkeypatch, existing):
+    _ids()
+    _add_external_seller(client, "50")
+    appended = ["50" if existing else "60", "Bot qo'shgan", "Tuman 2", "+998901111111", "yangi", "2026-02-01 10:00"]
+    batch_read = sheets_api._batch_read
+
+    def read_with_append(spreadsheet, ranges):
+        rows = batch_read(spreadsheet, ranges)
+        # O'qish javobi kelgunicha bot yangi qator yozdi (eski keshga ham tushadi)
+        sheets_api._append_cached_row(SELLERS, appended)
+        return rows
+
+    monkeypatch.setattr(sheets_api, "_batch_read", read_with_append)
+    entry = sheets_api._load_table(client.spreadsheet, SELLERS)
+
+    ids = [row[0] for row in entry.rows]
+    if existing:
+        # O'qilgan nusxada shu ID bor: takrorlanmaydi
+        assert ids.count("50") == 1
+    else:
+        assert ids[-2:] == ["50", "60"]
+        assert entry.lookup("password", "yangi")[0] == "60"
+    assert sheets_api._appends_during_load[SELLERS] == []
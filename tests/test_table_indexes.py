@@ -0,0 +1,44 @@
+# Sotuvchilar/Mahsulotlar xeshli indekslari sinovlari: bot yozuvlari va qayta o'qishdan keyin
+import sheets_api
+
+SELLERS = sheets_api.SHEET_NAMES["SELLERS"]
+PRODUCTS = sheets_api.SHEET_NAMES["PRODUCTS"]
+
+
+def test_lookups_use_indexes_after_bot_append(client):
+    sheets_api.warm_up()
+    client.reset_stats()
+
+    assert sheets_api.add_seller({'seller_name': "Yangi Sotuvchi", 'seller_region': "Tuman 3",
+                                  'seller_phone': "+998902222222", 'seller_password': "maxfiy"})
+    product_id = sheets_api.add_product_and_get_id("  G‘isht   Qizil ", 700)
+
+    seller = sheets_api.get_seller_by_password("maxfiy")
+    assert seller[1] == "Yangi Sotuvchi"
+    assert sheets_api.get_seller_by_id(seller[0]) == seller
+    assert sheets_api.get_product_by_name("g'isht qizil")[0] == str(product_id)
+    assert sheets_api.get_product_by_id(product_id)[1] == "  G‘isht   Qizil "
+    # Indekslar yozuv bilan birga yangilandi: jadval qayta o'qilmadi
+    assert client.calls.get("values_batch_get", 0) == 0
+
+
+def test_indexes_are_rebuilt_on_reload(client):
+    sheets_api.warm_up()
+    rows = client.spreadsheet._worksheets[SELLERS]._rows
+    rows[1][4] = "almashgan" # Sotuvchi 1 ning paroli varaqda qo'lda o'zgartirildi
+    assert sheets_api.get_seller_by_password("almashgan") is None
+
+    sheets_api.invalidate_table_cache(SELLERS)
+    assert sheets_api.get_seller_by_password("almashgan")[0] == "1"
+    assert sheets_api.get_seller_by_password("parol1") is None
+
+
+def test_duplicate_keys_keep_the_first_row(client):
+    sheets_api.warm_up()
+    first = sheets_api.get_product_by_id("1")
+    sheets_api._append_cached_row(PRODUCTS, ["99", first[1].upper(), "1"])
+    sheets_api._append_cached_row(SELLERS, ["98", "Ikkinchi", "", "", "parol2", ""])
+
+    assert sheets_api.get_product_by_name(first[1])[0] == "1"
+    assert sheets_api.get_seller_by_password("parol2")[0] == "2"
+    assert sheets_api.get_product_by_id("99")[1] == first[1].upper()